@@ -0,0 +1,227 @@
+"""
+GHOSTLY+ Layered Analysis Cache
+===============================
+
+Content-addressed cache of the three stages of processing an uploaded C3D file,
+so that a request only recomputes the stages whose inputs changed.
+
+LAYERS:
+=======
+1. signals:      sha256(file content)
+                 -> parsed EMG channels (raw EMG store) and C3D metadata
+2. contractions: signals key + detection parameters + analysis registry
+                 -> per-channel metrics, detected contractions and contraction tables
+3. scores:       contractions key + complete session parameters + identifiers
+                 -> path and SHA-256 of the scored result JSON
+
+Each key is the SHA-256 of a canonical JSON fingerprint (sorted keys, no
+whitespace) of everything the stage depends on, including the key of the stage
+before it and CACHE_VERSION. Re-uploading a file with different MVC or
+expected-count parameters therefore reuses layers 1 and 2 and only rescores;
+changing a detection parameter reuses layer 1 and skips the C3D parse.
+
+A result file can be rewritten after it was scored (/recalculate-scores), so a
+scores entry is only a hit while the file still has the SHA-256 recorded with
+it; a rescored result no longer matches its score key and is a miss.
+
+LAYOUT:
+=======
+    {cache_dir}/signals/{key}_raw_emg.bin + {key}_metadata.json
+    {cache_dir}/contractions/{signals key}/{key}.json + {key}.npz
+    {cache_dir}/scores/{signals key}/{key}    (JSON: result path and SHA-256)
+
+Entries of layers 2 and 3 live under the signals key they derive from, so
+discard_content() drops everything cached for a file once the last result
+computed from it is deleted.
+"""
+
+import os
+import json
+import shutil
+import hashlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .emg_store import RawEMGStore, save_contraction_tables, load_contraction_tables, temporary_path
+
+# Bump when detection or scoring logic changes, to invalidate every cached layer
+CACHE_VERSION = 2
+
+
+def fingerprint(layer: str, **parts: Any) -> str:
+    """SHA-256 of the canonical JSON form of a layer name and its inputs."""
+    canonical = json.dumps({'layer': layer, 'version': CACHE_VERSION, **parts},
+                           sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def _write_text_atomic(path: Path, text: str) -> None:
+    tmp_path = temporary_path(path)
+    tmp_path.write_text(text)
+    os.replace(tmp_path, path)
+
+
+class AnalysisCache:
+    """Layered, content-addressed cache of parsed signals, detections and scored results."""
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = Path(cache_dir)
+        self.signals_dir = self.cache_dir / "signals"
+        self.contractions_dir = self.cache_dir / "contractions"
+        self.scores_dir = self.cache_dir / "scores"
+        for directory in (self.signals_dir, self.contractions_dir, self.scores_dir):
+            directory.mkdir(parents=True, exist_ok=True)
+        self._remove_unkeyed_entries()
+
+    def _remove_unkeyed_entries(self) -> None:
+        """Drop layer 2 and 3 entries of the version 1 layout (not grouped by signals key)."""
+        for directory in (self.contractions_dir, self.scores_dir):
+            for entry in os.scandir(directory):
+                if entry.is_file():
+                    os.unlink(entry.path)
+
+    # --- Keys ---
+
+    @staticmethod
+    def signals_key(file_hash: str) -> str:
+        return fingerprint('signals', file_sha256=file_hash)
+
+    @staticmethod
+    def detection_key(signals_key: str, threshold_factor: float, min_duration_ms: int,
+                      smoothing_window: int, analysis_functions: List[str]) -> str:
+        return fingerprint('contractions', signals=signals_key,
+                           threshold_factor=float(threshold_factor),
+                           min_duration_ms=int(min_duration_ms),
+                           smoothing_window=int(smoothing_window),
+                           analysis_functions=sorted(analysis_functions))
+
+    @staticmethod
+    def score_key(detection_key: str, session_params: Dict, **identifiers: Optional[str]) -> str:
+        return fingerprint('scores', contractions=detection_key,
+                           session_params=session_params, identifiers=identifiers)
+
+    def keys_for(self, file_hash: str, processing_opts, session_params, analysis_functions: List[str],
+                 **identifiers: Optional[str]) -> Dict[str, str]:
+        """
+        Keys of all three layers for one request.
+
+        Args:
+            file_hash: SHA-256 hex digest of the uploaded file content.
+            processing_opts: ProcessingOptions (detection parameters).
+            session_params: GameSessionParameters as received, before processing fills in defaults.
+            analysis_functions: Names of the registered analysis functions.
+            identifiers: patient_id, user_id, session_id stored in the result.
+        """
+        signals_key = self.signals_key(file_hash)
+        detection_key = self.detection_key(signals_key, processing_opts.threshold_factor,
+                                           processing_opts.min_duration_ms, processing_opts.smoothing_window,
+                                           analysis_functions)
+        return {
+            'signals': signals_key,
+            'contractions': detection_key,
+            'scores': self.score_key(detection_key, session_params.model_dump(mode='json'), **identifiers),
+        }
+
+    # --- Layer 1: parsed signals ---
+
+    def _signals_paths(self, key: str) -> Tuple[Path, Path]:
+        return self.signals_dir / f"{key}_raw_emg.bin", self.signals_dir / f"{key}_metadata.json"
+
+    def load_signals(self, key: str) -> Optional[Tuple[RawEMGStore, Dict]]:
+        """Return (raw EMG store, C3D metadata) of a parsed file, or None."""
+        store_path, metadata_path = self._signals_paths(key)
+        if not (store_path.exists() and metadata_path.exists()):
+            return None
+        try:
+            with open(metadata_path, "r") as f:
+                metadata = json.load(f)
+            store = RawEMGStore(store_path)
+            store.channels  # validate the header
+            return store, metadata
+        except (OSError, ValueError) as e:
+            print(f"Warning: Ignoring unreadable cached signals {key}: {e}")
+            return None
+
+    def save_signals(self, key: str, emg_data: Dict[str, Dict], metadata: Dict) -> RawEMGStore:
+        store_path, metadata_path = self._signals_paths(key)
+        store = RawEMGStore.write(store_path, emg_data)
+        _write_text_atomic(metadata_path, json.dumps(metadata))
+        return store
+
+    # --- Layer 2: detected contractions ---
+
+    def _contractions_paths(self, key: str, signals_key: str) -> Tuple[Path, Path]:
+        directory = self.contractions_dir / signals_key
+        return directory / f"{key}.json", directory / f"{key}.npz"
+
+    def load_detections(self, key: str, signals_key: str) -> Optional[Tuple[Dict[str, Dict], Dict]]:
+        """Return (per-channel detections, contraction tables), or None."""
+        detections_path, tables_path = self._contractions_paths(key, signals_key)
+        if not (detections_path.exists() and tables_path.exists()):
+            return None
+        try:
+            with open(detections_path, "r") as f:
+                detections = json.load(f)
+            return detections, load_contraction_tables(tables_path)
+        except (OSError, ValueError) as e:
+            print(f"Warning: Ignoring unreadable cached contractions {key}: {e}")
+            return None
+
+    def save_detections(self, key: str, signals_key: str, detections: Dict[str, Dict], tables: Dict) -> None:
+        detections_path, tables_path = self._contractions_paths(key, signals_key)
+        detections_path.parent.mkdir(exist_ok=True)
+        # Tables first: the JSON file marks the entry complete
+        save_contraction_tables(tables_path, tables)
+        _write_text_atomic(detections_path, json.dumps(detections))
+
+    # --- Layer 3: scored results ---
+
+    def _marker_path(self, key: str, signals_key: str) -> Path:
+        return self.scores_dir / signals_key / key
+
+    def load_result(self, key: str, signals_key: str) -> Optional[Dict]:
+        """Return the stored result JSON for a score key, or None (dropping stale entries)."""
+        body = self.load_result_bytes(key, signals_key)
+        try:
+            return json.loads(body) if body is not None else None
+        except ValueError:
+            return None  # Treat unreadable entries as a cache miss
+
+    def load_result_bytes(self, key: str, signals_key: str) -> Optional[bytes]:
+        """
+        Return the stored result file of a score key as is (serialized JSON), or None.
+
+        Entries whose result was deleted, or rewritten since it was scored, are dropped.
+        """
+        marker_path = self._marker_path(key, signals_key)
+        if not marker_path.exists():
+            return None
+        try:
+            marker = json.loads(marker_path.read_text())
+            result_path = Path(marker['result_path'])
+            if result_path.exists():
+                body = result_path.read_bytes()
+                if hashlib.sha256(body).hexdigest() == marker['result_sha256']:
+                    return body
+            # Stale marker: the result was deleted or rescored
+            marker_path.unlink()
+        except (OSError, ValueError, KeyError, TypeError):
+            pass  # Treat unreadable entries as a cache miss
+        return None
+
+    def save_result(self, key: str, signals_key: str, result_path: Path, result_sha256: str) -> None:
+        """Point a score key at a result file holding JSON with the given SHA-256."""
+        marker_path = self._marker_path(key, signals_key)
+        marker_path.parent.mkdir(exist_ok=True)
+        _write_text_atomic(marker_path, json.dumps({'result_path': str(Path(result_path).resolve()),
+                                                    'result_sha256': result_sha256}))
+
+    # --- Cleanup ---
+
+    def discard_content(self, file_hash: str) -> None:
+        """Remove every entry derived from a file's content (e.g. once its last result is deleted)."""
+        signals_key = self.signals_key(file_hash)
+        for path in self._signals_paths(signals_key):
+            path.unlink(missing_ok=True)
+        for directory in (self.contractions_dir, self.scores_dir):
+            shutil.rmtree(directory / signals_key, ignore_errors=True)
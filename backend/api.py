@@ -8,37 +8,69 @@ extracting EMG data, and providing analytics for rehabilitation monitoring.
 ENDPOINTS:
 ==========
 - GET / - Root endpoint with API information
-- POST /upload - Upload and process C3D file
+- POST /upload - Upload and process C3D file (?async=true returns a job ID immediately)
+- POST /upload/batch - Upload and process many C3D files, streaming results as NDJSON
+- GET /jobs/{job_id} - State, stage timings and result of an asynchronous upload
 - GET /recalculate-scores - Recalculate scores for an existing result with updated parameters
 - GET /results - List all available result files
+- GET /results/query - Filter, sort and page through results (with field projection)
 - GET /results/{result_id} - Get processing results for a specific file
-- GET /raw-data/{result_id}/{channel} - Get raw EMG data for a specific channel
+- GET /raw-data/{result_id}/{channel} - Get raw EMG data for a specific channel (optionally a decimated window, or .npy / Arrow)
+- POST /sweep/{result_id} - Evaluate contraction detection over a grid of parameters
 - GET /plot/{result_id}/{channel} - Generate and return a plot image for a specific channel
 - GET /report/{result_id} - Generate and return a full report image
 - GET /patients - List all patient IDs
-- GET /patients/{patient_id}/results - Get all results for a specific patient
+- GET /patients/{patient_id}/results - Get all results for a specific patient (optionally streamed as NDJSON)
+- GET /patients/{patient_id}/trends - Daily or weekly per-channel trends of a patient's sessions
 - DELETE /results/{result_id} - Delete a specific result
+- GET /debug/parsed-c3d-cache - Hit/miss statistics of the parsed C3D cache
 """
 
 import os
+import re
 import json
+import time
+import asyncio
 import uuid
 import shutil
 import hashlib
+import logging
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
-from fastapi import FastAPI, UploadFile, File, HTTPException, Query, Form
+import anyio
+import numpy as np
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query, Form, Request
 from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse, Response
 from fastapi.staticfiles import StaticFiles
 
-from .processor import GHOSTLYC3DProcessor
+from .processor import GHOSTLYC3DProcessor, SignalContextCache, ParsedC3DCache
+from .channel_executor import shutdown_process_pool
+from .analysis_cache import AnalysisCache
+from .upload_store import UploadStore
+from .job_queue import JobQueue, JobQueueFull
+from .single_flight import SingleFlight
+from . import async_storage as storage
+from .results_index import (
+    ResultsIndex, row_from_result, project_result, encode_cursor, decode_cursor, INDEXED_RESULT_FIELDS
+)
+from .waveform_pyramid import WaveformPyramid, waveform_pyramid_path, write_waveform_pyramid, decimate_window
+from .http_caching import (
+    CompressionMiddleware, EncodedETagMiddleware, REVALIDATE, IMMUTABLE, result_version, make_etag, matches, cache_headers, not_modified
+)
+from .wire_formats import MEDIA_TYPES, negotiate, npy_body, arrow_body, binary_response, pa
+from .emg_analysis import ANALYSIS_FUNCTIONS
+from .emg_store import (
+    RawEMGStore, RAW_EMG_BINARY_SUFFIX, raw_emg_paths, contraction_table_path,
+    save_contraction_tables, load_contraction_tables
+)
 from .models import (
     EMGAnalysisResult, EMGRawData, ProcessingOptions, GameMetadata, ChannelAnalytics,
-    GameSessionParameters, DEFAULT_THRESHOLD_FACTOR, DEFAULT_MIN_DURATION_MS,
+    GameSessionParameters, SweepRequest, SweepResult, ResultQueryPage, PatientTrends, JobStatus, DEFAULT_THRESHOLD_FACTOR, DEFAULT_MIN_DURATION_MS,
     DEFAULT_SMOOTHING_WINDOW, DEFAULT_MVC_THRESHOLD_PERCENTAGE
 )
 
@@ -47,10 +79,75 @@ UPLOAD_DIR = Path("./data/uploads")
 RESULTS_DIR = Path("./data/results")
 PLOTS_DIR = Path("./data/plots")
 CACHE_DIR = Path("./data/cache")
+RESULTS_INDEX_PATH = Path("./data/results_index.sqlite3")
+
+# Upper bound on (threshold x min_duration x window) combinations per sweep request
+MAX_SWEEP_GRID_POINTS = 5000
+
+# Page size limits of GET /results/query
+DEFAULT_QUERY_LIMIT = 50
+MAX_QUERY_LIMIT = 500
+
+# Upper bound on max_points of a decimated /raw-data window
+MAX_RAW_DATA_POINTS = 20000
+# Responses sent uncompressed: already compressed, or streamed line by line
+UNCOMPRESSED_MEDIA_TYPES = ("image/png", "application/x-ndjson", "text/event-stream")
+# /raw-data negotiates its format (JSON, .npy, Arrow) from the Accept header
+VARY_ACCEPT = {"Vary": "Accept"}
+
+# Streamed patient histories read the index this many results at a time
+HISTORY_PAGE_SIZE = 100
+# Paths dropped from each result of a summary-only history
+HISTORY_SUMMARY_EXCLUDE = ["analytics.*.contractions"]
+
+# Opt-in parallel channel analytics: set GHOSTLY_ANALYTICS_EXECUTOR=process to analyze
+# the channels of each upload in a shared pool of worker processes
+ANALYTICS_EXECUTOR = os.environ.get("GHOSTLY_ANALYTICS_EXECUTOR", "serial")
+ANALYTICS_WORKERS = int(os.environ.get("GHOSTLY_ANALYTICS_WORKERS", "0")) or None
+
+# Batch uploads: files of all /upload/batch requests share one bounded pool of workers
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # bytes read per chunk when spooling uploads to disk
+MAX_BATCH_FILES = 200
+BATCH_UPLOAD_WORKERS = int(os.environ.get("GHOSTLY_BATCH_UPLOAD_WORKERS", "4"))
+BATCH_EXECUTOR = ThreadPoolExecutor(max_workers=BATCH_UPLOAD_WORKERS, thread_name_prefix="ghostly-batch")
+
+# Asynchronous uploads (/upload?async=true): a bounded queue processed by local workers
+JOB_WORKERS = int(os.environ.get("GHOSTLY_JOB_WORKERS", "2"))
+JOB_QUEUE_SIZE = int(os.environ.get("GHOSTLY_JOB_QUEUE_SIZE", "32"))
+JOBS = JobQueue(max_workers=JOB_WORKERS, max_queued=JOB_QUEUE_SIZE)
+
+# Concurrent identical uploads (same scores cache key) and plot/report renders share one computation
+UPLOAD_FLIGHTS = SingleFlight()
+RENDER_FLIGHTS = SingleFlight()
+
+# Layered cache: file hash -> signals, + detection params -> contractions, + scoring params -> result
+ANALYSIS_CACHE = AnalysisCache(CACHE_DIR)
+
+# Rectified signals and envelopes of recently used results, shared across requests, bounded in bytes
+SIGNAL_CONTEXT_CACHE_MB = int(os.environ.get("GHOSTLY_SIGNAL_CONTEXT_CACHE_MB", "256"))
+SIGNAL_CONTEXTS = SignalContextCache(max_results=8, max_bytes=SIGNAL_CONTEXT_CACHE_MB * 1024 * 1024)
+
+# Uploaded C3D files are stored once per content, under their SHA-256
+UPLOAD_STORE = UploadStore(UPLOAD_DIR / "store")
+CONTENT_SHA256 = re.compile(r"^([0-9a-f]{64})(\.c3d)?$")
+# Uploads stored before that were named {timestamp}_{result_id}_{original filename}
+UPLOAD_RESULT_ID = re.compile(r"^\d{8}_\d{6}_([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})_")
+
+# Parsed C3D files of recently viewed results (plots, reports, debug), bounded in bytes
+PARSED_C3D_CACHE_MB = int(os.environ.get("GHOSTLY_PARSED_C3D_CACHE_MB", "256"))
+PARSED_C3D = ParsedC3DCache(max_bytes=PARSED_C3D_CACHE_MB * 1024 * 1024)
 
 for directory in [UPLOAD_DIR, RESULTS_DIR, PLOTS_DIR, CACHE_DIR]:
     directory.mkdir(parents=True, exist_ok=True)
 
+# Index of stored results (patient, session, game, file locations) for lookups and listings
+RESULTS_INDEX = ResultsIndex(RESULTS_INDEX_PATH)
+if RESULTS_INDEX.needs_rebuild:
+    # New or outdated index: pick up results stored before it (or its rollups) existed
+    RESULTS_INDEX.rebuild(RESULTS_DIR, UPLOAD_DIR, UPLOAD_STORE.path_for)
+
+logger = logging.getLogger(__name__)
+
 # Initialize FastAPI app
 app = FastAPI(
     title="GHOSTLY+ EMG Analysis API",
@@ -66,12 +163,29 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Read by clients of binary /raw-data responses and of versioned results
+    expose_headers=["Content-Range", "Accept-Ranges", "X-Channel-Name", "X-Sampling-Rate", "X-Start-Sample",
+                    "ETag", "X-Result-Version"],
 )
 
+# Compress JSON bodies for clients that accept zstd or gzip (binary channel data stays ranged and
+# uncompressed, NDJSON lines are sent as they are produced), giving compressed bodies their own ETag
+app.add_middleware(CompressionMiddleware, minimum_size=1024, compresslevel=6,
+                   excluded_content_types=UNCOMPRESSED_MEDIA_TYPES + tuple(
+                       media_type for media_types in MEDIA_TYPES.values() for media_type in media_types))
+app.add_middleware(EncodedETagMiddleware)
+
 # Mount static files directory for serving plots
 app.mount("/static", StaticFiles(directory="data"), name="static")
 
 
+@app.on_event("shutdown")
+async def shutdown_workers():
+    """Stop the analytics worker processes, if any were started, and the job workers."""
+    shutdown_process_pool()
+    JOBS.shutdown()
+
+
 @app.get("/")
 async def root():
     """Root endpoint returning API information."""
@@ -80,21 +194,235 @@ async def root():
         "version": "1.0.0",
         "description": "API for processing C3D files containing EMG data from the GHOSTLY rehabilitation game",
         "endpoints": {
-            "upload": "POST /upload - Upload and process a C3D file",
+            "upload": "POST /upload - Upload and process a C3D file (?async=true returns a job ID immediately)",
+            "jobs": "GET /jobs/{job_id} - State, stage timings and result of an asynchronous upload",
+            "upload_batch": "POST /upload/batch - Upload and process many C3D files, streaming per-file results as NDJSON",
             "recalculate-scores": "POST /recalculate-scores - Recalculate scores for an existing result with updated parameters",
             "results": "GET /results - List all available result files",
+            "results_query": "GET /results/query - Filter, sort and page through results (with field projection)",
             "result_detail": "GET /results/{result_id} - Get processing results for a specific file",
-            "raw_data": "GET /raw-data/{result_id}/{channel} - Get raw EMG data for a specific channel",
+            "raw_data": "GET /raw-data/{result_id}/{channel} - Get raw EMG data for a specific channel (start_ms, end_ms, max_points for a decimated window)",
+            "sweep": "POST /sweep/{result_id} - Evaluate contraction detection over a grid of parameters",
             "plot": "GET /plot/{result_id}/{channel} - Generate and return a plot image for a specific channel",
             "report": "GET /report/{result_id} - Generate and return a full report image",
             "patients": "GET /patients - List all patient IDs",
-            "patient_results": "GET /patients/{patient_id}/results - Get all results for a specific patient"
+            "patient_results": "GET /patients/{patient_id}/results - Get all results for a specific patient",
+            "patient_trends": "GET /patients/{patient_id}/trends - Daily or weekly per-channel trends of a patient's sessions"
         }
     })
 
 
+def _link_or_write_raw_store(processor: GHOSTLYC3DProcessor, path: Path) -> None:
+    """Store a result's raw EMG data, hard-linking the cached signal store when possible."""
+    if processor.raw_emg_store is not None:
+        try:
+            if path.exists():
+                path.unlink()
+            os.link(processor.raw_emg_store.path, path)
+            return
+        except OSError:
+            pass  # e.g. different filesystems; fall back to writing a copy
+    RawEMGStore.write(path, processor.emg_data)
+
+
+def _write_chunk(buffer, hasher, chunk: bytes) -> None:
+    hasher.update(chunk)
+    buffer.write(chunk)
+
+
+async def _spool_upload(file: UploadFile, tmp_path: Path) -> str:
+    """
+    Stream an upload to `tmp_path`, hashing it as it is written.
+
+    Only one chunk is held in memory at a time. Returns the SHA-256 hex digest; the caller
+    commits the file to the upload store or discards it.
+    """
+    hasher = hashlib.sha256()
+    try:
+        # Open, hash, write and close off the event loop
+        buffer = await storage.run(open, tmp_path, "wb")
+        try:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                await storage.run(_write_chunk, buffer, hasher, chunk)
+        finally:
+            await storage.run(buffer.close)
+    except BaseException:
+        # Clean up even when the request was cancelled
+        with anyio.CancelScope(shield=True):
+            await storage.unlink(tmp_path)
+        raise
+    return hasher.hexdigest()
+
+
+def _process_upload(file_path: Path, file_id: str, timestamp: str, source_filename: str,
+                    processing_opts: ProcessingOptions, session_game_params: GameSessionParameters,
+                    user_id: Optional[str], patient_id: Optional[str], session_id: Optional[str],
+                    cache_keys: Dict[str, str], content_sha256: str,
+                    timings: Optional[Dict[str, float]] = None) -> bytes:
+    """
+    Process a stored C3D upload and store its result, raw EMG data and contraction tables.
+
+    Returns the result as serialized JSON, the same bytes as the stored result file.
+
+    Parsed signals and detected contractions are reused from the analysis cache when an
+    earlier request already produced them for the same file and detection parameters.
+    Releases the pending upload store reference taken when the upload was committed; when
+    no result was stored, the uploaded file is deleted unless other results refer to it.
+    Stage durations are added to `timings` when given.
+    """
+    stored = False
+    try:
+        result_json = _process_stored_upload(file_path, file_id, timestamp, source_filename, processing_opts,
+                                             session_game_params, user_id, patient_id, session_id, cache_keys,
+                                             content_sha256, timings if timings is not None else {})
+        stored = True
+        return result_json
+    finally:
+        UPLOAD_STORE.release(content_sha256)
+        if not stored:
+            UPLOAD_STORE.remove_if_unreferenced(content_sha256, RESULTS_INDEX.content_references)
+
+
+def _process_stored_upload(file_path: Path, file_id: str, timestamp: str, source_filename: str,
+                           processing_opts: ProcessingOptions, session_game_params: GameSessionParameters,
+                           user_id: Optional[str], patient_id: Optional[str], session_id: Optional[str],
+                           cache_keys: Dict[str, str], content_sha256: str,
+                           timings: Dict[str, float]) -> bytes:
+    processor = GHOSTLYC3DProcessor(str(file_path), executor=ANALYTICS_EXECUTOR,
+                                    max_workers=ANALYTICS_WORKERS)
+
+    result_data = processor.process_file(
+        processing_opts=processing_opts,
+        session_game_params=session_game_params,
+        cache=ANALYSIS_CACHE,
+        cache_keys=cache_keys
+    )
+    timings.update(processor.timings)
+    store_start = time.perf_counter()
+
+    # Create result object
+    game_metadata = GameMetadata(**result_data['metadata'])
+
+    analytics = {
+        k: ChannelAnalytics(**v)
+        for k, v in result_data['analytics'].items()
+    }
+
+    result = EMGAnalysisResult(
+        file_id=file_id,
+        timestamp=timestamp,
+        source_filename=source_filename,
+        metadata=game_metadata,
+        analytics=analytics,
+        available_channels=result_data['available_channels'],
+        plots={},
+        user_id=user_id,
+        patient_id=patient_id,
+        session_id=session_id,
+        content_sha256=content_sha256
+    )
+
+    # Save result to file
+    result_filename = f"{file_id}_result.json"
+    result_path = RESULTS_DIR / result_filename
+
+    # Save raw EMG data to a separate binary store for efficient retrieval
+    raw_emg_data_path = RESULTS_DIR / f"{file_id}{RAW_EMG_BINARY_SUFFIX}"
+
+    # Validated once, above; the stored file is what every later request returns
+    result_json = result.model_dump_json().encode('utf-8')
+
+    # Index and write the result together; a failed write leaves no index entry and fails the request
+    try:
+        with RESULTS_INDEX.transaction():
+            RESULTS_INDEX.put(row_from_result(result.model_dump(mode='json'), result_path.resolve(),
+                                              Path(file_path).resolve(), content_sha256,
+                                              result_version(result_json)))
+            with open(result_path, "wb") as f:
+                f.write(result_json)
+    except BaseException:
+        result_path.unlink(missing_ok=True)
+        raise
+
+    # Keep the envelopes computed during detection for later sweeps and plots
+    SIGNAL_CONTEXTS.put(file_id, processor.signal_contexts)
+
+    # Derived artifacts are best effort: the result is served without them
+    try:
+        # Save raw EMG data separately for efficient retrieval
+        _link_or_write_raw_store(processor, raw_emg_data_path)
+        # Min/max pyramid for zooming and panning through decimated windows
+        write_waveform_pyramid(waveform_pyramid_path(RESULTS_DIR, file_id), processor.emg_data)
+
+        # Save the contraction tables for vectorized rescoring
+        save_contraction_tables(contraction_table_path(RESULTS_DIR, file_id), processor.contraction_tables)
+
+        # Point the scores layer of the analysis cache at the result file
+        ANALYSIS_CACHE.save_result(cache_keys['scores'], cache_keys['signals'], result_path,
+                                   result_version(result_json))
+    except Exception:
+        logger.exception("Error saving the stored channels, waveform pyramid, contraction tables "
+                         "or cache marker of result %s", file_id)
+
+    timings['store'] = time.perf_counter() - store_start
+    return result_json
+
+
+def _process_spooled_upload(tmp_path: Path, content_sha256: str, source_filename: str,
+                            processing_opts: ProcessingOptions, session_game_params: GameSessionParameters,
+                            user_id: Optional[str], patient_id: Optional[str], session_id: Optional[str],
+                            cache_keys: Dict[str, str],
+                            timings: Optional[Dict[str, float]] = None) -> bytes:
+    """
+    Store a spooled upload and process it, unless an identical request already is.
+
+    Requests with the same scores cache key (same file content and parameters) that arrive
+    while one of them is being processed wait for it and return its result; the spooled
+    copies of the waiting requests are dropped.
+    """
+    def store_and_process():
+        # An identical request may have finished between our cache check and now
+        cached_result = ANALYSIS_CACHE.load_result_bytes(cache_keys['scores'], cache_keys['signals'])
+        if cached_result is not None:
+            return cached_result
+        file_path = UPLOAD_STORE.commit(tmp_path, content_sha256)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        return _process_upload(file_path, str(uuid.uuid4()), timestamp, source_filename, processing_opts,
+                               session_game_params, user_id, patient_id, session_id, cache_keys,
+                               content_sha256, timings)
+
+    try:
+        result, _ = UPLOAD_FLIGHTS.do(cache_keys['scores'], store_and_process)
+    finally:
+        # Already moved into the store unless this request was answered by another one
+        tmp_path.unlink(missing_ok=True)
+    return result
+
+
+def _upload_job(*args, timings: Dict[str, float]) -> Dict:
+    """Job body of an asynchronous upload: process it and return the result as JSON data."""
+    return json.loads(_process_spooled_upload(*args, timings=timings))
+
+
+def _json_response(body: bytes, headers: Optional[Dict[str, str]] = None) -> Response:
+    """
+    Send an already serialized result as is.
+
+    Results are validated once, when they are built, and stored as JSON; returning a Response
+    skips FastAPI's response_model validation and re-encoding of the (possibly large) result.
+    """
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def _result_version(row: Dict) -> str:
+    """Version (JSON hash) of an indexed result; hashed from the file for rows indexed without one."""
+    return row['result_sha256'] or result_version(Path(row['result_path']).read_bytes())
+
+
 @app.post("/upload", response_model=EMGAnalysisResult)
 async def upload_file(file: UploadFile = File(...),
+                      async_mode: bool = Query(False, alias="async",
+                                               description="Queue the processing and return a job immediately (202)"),
                       user_id: Optional[str] = Form(None),
                       patient_id: Optional[str] = Form(None),
                       session_id: Optional[str] = Form(None),
@@ -108,140 +436,241 @@ async def upload_file(file: UploadFile = File(...),
                       session_expected_contractions: Optional[int] = Form(None),
                       session_expected_contractions_ch1: Optional[int] = Form(None),
                       session_expected_contractions_ch2: Optional[int] = Form(None)):
-    """Upload and process a C3D file."""
+    """
+    Upload and process a C3D file.
+
+    With ?async=true the response is 202 with a job (see GET /jobs/{job_id}) as soon as the
+    file is stored; processing runs on the job workers. When the job queue is full the
+    upload is refused with 429 and a Retry-After header, before the file is read.
+    """
     if not file.filename.lower().endswith('.c3d'):
         raise HTTPException(status_code=400, detail="File must be a C3D file")
 
-    # --- Caching Logic ---
-    # Read file content for hashing
-    file_content = await file.read()
-    await file.seek(0)  # Reset file pointer after reading
+    job = None
+    if async_mode:
+        try:
+            job = JOBS.create()
+        except JobQueueFull as e:
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+    # Create processing options and session parameters objects
+    processing_opts = ProcessingOptions(
+        threshold_factor=threshold_factor,
+        min_duration_ms=min_duration_ms,
+        smoothing_window=smoothing_window
+    )
 
-    # Create a hash of the file content and processing parameters
-    hasher = hashlib.sha256()
-    hasher.update(file_content)
-    hasher.update(str(threshold_factor).encode())
-    hasher.update(str(min_duration_ms).encode())
-    hasher.update(str(smoothing_window).encode())
-    # Include identifiers in hash to ensure distinct cache entries
-    if patient_id: hasher.update(patient_id.encode())
-    if user_id: hasher.update(user_id.encode())
-    if session_id: hasher.update(session_id.encode())
-    # Add new game parameters to hash
-    if session_mvc_value is not None: hasher.update(str(session_mvc_value).encode())
-    if session_mvc_threshold_percentage is not None: hasher.update(str(session_mvc_threshold_percentage).encode())
-    if session_expected_contractions is not None: hasher.update(str(session_expected_contractions).encode())
-    if session_expected_contractions_ch1 is not None: hasher.update(str(session_expected_contractions_ch1).encode())
-    if session_expected_contractions_ch2 is not None: hasher.update(str(session_expected_contractions_ch2).encode())
-    
-    request_hash = hasher.hexdigest()
-    cache_marker_path = CACHE_DIR / request_hash
+    session_game_params = GameSessionParameters(
+        session_mvc_value=session_mvc_value,
+        session_mvc_threshold_percentage=session_mvc_threshold_percentage,
+        session_expected_contractions=session_expected_contractions,
+        session_expected_contractions_ch1=session_expected_contractions_ch1,
+        session_expected_contractions_ch2=session_expected_contractions_ch2
+    )
 
-    # Check for cache hit
-    if cache_marker_path.exists():
-        try:
-            result_path_str = cache_marker_path.read_text()
-            result_path = Path(result_path_str)
-            if result_path.exists():
-                with open(result_path, "r") as f:
-                    return json.load(f)
-            else:
-                # Stale cache marker, remove it and proceed
-                cache_marker_path.unlink()
-        except Exception:
-            # Handle potential errors reading marker or JSON
-            pass # Proceed to process as a cache miss
+    # Stream the upload to disk in chunks, hashing it on the way
+    upload_start = time.perf_counter()
+    tmp_path = UPLOAD_STORE.temporary_path()
+    try:
+        file_hash = await _spool_upload(file, tmp_path)
+    except Exception as e:
+        if job is not None:
+            JOBS.finish(job, error=f"Error saving file: {str(e)}")
+        raise HTTPException(status_code=500,
+                            detail=f"Error saving file: {str(e)}")
+
+    # --- Caching Logic ---
+    # Fingerprint the file content, detection parameters and scoring parameters
+    cache_keys = ANALYSIS_CACHE.keys_for(
+        file_hash, processing_opts, session_game_params,
+        list(ANALYSIS_FUNCTIONS), patient_id=patient_id, user_id=user_id, session_id=session_id)
+
+    # Check for a fully scored cache hit
+    cached_result = await storage.run(ANALYSIS_CACHE.load_result_bytes, cache_keys['scores'], cache_keys['signals'])
+    if cached_result is not None:
+        await storage.unlink(tmp_path)
+        if job is not None:
+            JOBS.finish(job, result=json.loads(cached_result))
+            return _job_accepted(job)
+        return _json_response(cached_result)
 
     # --- End Caching Logic ---
 
-    # Create unique filename to avoid collisions
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    file_id = str(uuid.uuid4())
-    unique_filename = f"{timestamp}_{file_id}_{file.filename}"
-    file_path = UPLOAD_DIR / unique_filename
+    if job is not None:
+        job.timings['upload'] = time.perf_counter() - upload_start
+        JOBS.run(job, _upload_job, tmp_path, file_hash, file.filename, processing_opts,
+                 session_game_params, user_id, patient_id, session_id, cache_keys)
+        return _job_accepted(job)
 
-    # Save uploaded file
+    # Store and process the file (or wait for an identical upload already being processed)
     try:
-        with open(file_path, "wb") as buffer:
-            buffer.write(file_content) # Use the content we already read
+        # Wrap the CPU-bound processing in run_in_threadpool
+        return _json_response(await run_in_threadpool(
+            _process_spooled_upload, tmp_path, file_hash, file.filename,
+            processing_opts, session_game_params, user_id, patient_id, session_id, cache_keys
+        ))
     except Exception as e:
-        raise HTTPException(status_code=500,
-                            detail=f"Error saving file: {str(e)}")
+        import traceback
+        print(f"ERROR in /upload: {str(e)}")
+        print(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
+
 
-    # Process the file
+def _job_accepted(job) -> JSONResponse:
+    return JSONResponse(status_code=202, content=job.to_dict(),
+                        headers={"Location": f"/jobs/{job.job_id}"})
+
+
+@app.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_job(job_id: str):
+    """State, per-stage timings (seconds) and, once succeeded, the result of an asynchronous upload."""
+    job = JOBS.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+
+def _process_batch_item(item: Dict, processing_opts: ProcessingOptions,
+                        session_game_params: GameSessionParameters,
+                        user_id: Optional[str], patient_id: Optional[str]) -> Dict:
+    """Process one spooled file of a batch; failures are reported, never raised."""
+    entry = {'index': item['index'], 'filename': item['filename']}
     try:
-        processor = GHOSTLYC3DProcessor(str(file_path))
-        
-        # Create processing options and session parameters objects
-        processing_opts = ProcessingOptions(
-            threshold_factor=threshold_factor,
-            min_duration_ms=min_duration_ms,
-            smoothing_window=smoothing_window
-        )
-        
-        session_game_params = GameSessionParameters(
-            session_mvc_value=session_mvc_value,
-            session_mvc_threshold_percentage=session_mvc_threshold_percentage,
-            session_expected_contractions=session_expected_contractions,
-            session_expected_contractions_ch1=session_expected_contractions_ch1,
-            session_expected_contractions_ch2=session_expected_contractions_ch2
+        result = _process_spooled_upload(
+            item['tmp_path'], item['content_sha256'], item['filename'], processing_opts,
+            # Processing fills in per-channel MVC defaults, so every file gets its own copy
+            session_game_params.model_copy(deep=True),
+            user_id, patient_id, None, item['cache_keys']
         )
+        entry.update(status='ok', result=result)
+    except Exception as e:
+        import traceback
+        print(f"ERROR in /upload/batch ({item['filename']}): {str(e)}")
+        print(traceback.format_exc())
+        entry.update(status='error', detail=f"Error processing file: {str(e)}")
+    return entry
+
+
+def _batch_line(entry: Dict) -> bytes:
+    """One NDJSON line of a batch; a result (serialized JSON bytes) is spliced in without re-encoding."""
+    result = entry.pop('result', None)
+    line = json.dumps(entry).encode('utf-8')
+    if result is not None:
+        line = line[:-1] + b', "result": ' + result + b'}'
+    return line + b"\n"
+
+
+@app.post("/upload/batch")
+async def upload_batch(files: List[UploadFile] = File(...),
+                       user_id: Optional[str] = Form(None),
+                       patient_id: Optional[str] = Form(None),
+                       # Processing options shared by every file
+                       threshold_factor: float = Form(DEFAULT_THRESHOLD_FACTOR),
+                       min_duration_ms: int = Form(DEFAULT_MIN_DURATION_MS),
+                       smoothing_window: int = Form(DEFAULT_SMOOTHING_WINDOW),
+                       session_mvc_value: Optional[float] = Form(None),
+                       session_mvc_threshold_percentage: Optional[float] = Form(DEFAULT_MVC_THRESHOLD_PERCENTAGE),
+                       session_expected_contractions: Optional[int] = Form(None),
+                       session_expected_contractions_ch1: Optional[int] = Form(None),
+                       session_expected_contractions_ch2: Optional[int] = Form(None)):
+    """
+    Upload and process many C3D files with shared processing options.
 
-        # Wrap the CPU-bound processing in run_in_threadpool
-        result_data = await run_in_threadpool(
-            processor.process_file,
-            processing_opts=processing_opts,
-            session_game_params=session_game_params
-        )
+    Files are processed concurrently on a bounded worker pool. Results are streamed back as
+    NDJSON, one line per file in completion order:
+    {"index", "filename", "status": "ok" | "cached" | "error", "result" | "detail"}.
+    A file that fails only produces an error line; the rest of the batch continues.
+    """
+    if len(files) > MAX_BATCH_FILES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_FILES} files can be uploaded per batch")
 
-        # Create result object
-        game_metadata = GameMetadata(**result_data['metadata'])
-        
-        analytics = {
-            k: ChannelAnalytics(**v)
-            for k, v in result_data['analytics'].items()
-        }
+    processing_opts = ProcessingOptions(
+        threshold_factor=threshold_factor,
+        min_duration_ms=min_duration_ms,
+        smoothing_window=smoothing_window
+    )
+    session_game_params = GameSessionParameters(
+        session_mvc_value=session_mvc_value,
+        session_mvc_threshold_percentage=session_mvc_threshold_percentage,
+        session_expected_contractions=session_expected_contractions,
+        session_expected_contractions_ch1=session_expected_contractions_ch1,
+        session_expected_contractions_ch2=session_expected_contractions_ch2
+    )
 
-        result = EMGAnalysisResult(
-            file_id=file_id,
-            timestamp=timestamp,
-            source_filename=file.filename,
-            metadata=game_metadata,
-            analytics=analytics,
-            available_channels=result_data['available_channels'],
-            plots={},
-            user_id=user_id,
-            patient_id=patient_id,
-            session_id=session_id
-        )
+    # Spool every file to disk in chunks (hashing as we go) before streaming the response,
+    # since the uploaded file objects are closed once this handler returns
+    finished, pending = [], []
+    for index, file in enumerate(files):
+        entry = {'index': index, 'filename': file.filename}
+        if not (file.filename or '').lower().endswith('.c3d'):
+            finished.append(dict(entry, status='error', detail="File must be a C3D file"))
+            continue
 
-        # Save result to file
-        result_filename = f"{file_id}_result.json"
-        result_path = RESULTS_DIR / result_filename
-        
-        # Save raw EMG data to separate file for efficient retrieval
-        raw_emg_data_path = RESULTS_DIR / f"{file_id}_result_raw_emg.json"
-        
+        tmp_path = UPLOAD_STORE.temporary_path()
         try:
-            with open(result_path, "w") as f:
-                f.write(result.model_dump_json(indent=2))
-                
-            # Save raw EMG data separately for efficient retrieval
-            with open(raw_emg_data_path, "w") as f:
-                json.dump(processor.emg_data, f, indent=2)
-                
-            # Write cache marker pointing to the result file
-            cache_marker_path.write_text(str(result_path.resolve()))
+            file_hash = await _spool_upload(file, tmp_path)
         except Exception as e:
-            print(f"Warning: Error saving result or cache marker: {e}")
+            finished.append(dict(entry, status='error', detail=f"Error saving file: {str(e)}"))
+            continue
+
+        cache_keys = ANALYSIS_CACHE.keys_for(
+            file_hash, processing_opts, session_game_params, list(ANALYSIS_FUNCTIONS),
+            patient_id=patient_id, user_id=user_id, session_id=None)
+        cached_result = await storage.run(ANALYSIS_CACHE.load_result_bytes, cache_keys['scores'], cache_keys['signals'])
+        if cached_result is not None:
+            await storage.unlink(tmp_path)
+            finished.append(dict(entry, status='cached', result=cached_result))
+            continue
+
+        pending.append(dict(entry, tmp_path=tmp_path, content_sha256=file_hash, cache_keys=cache_keys))
+
+    async def stream_results():
+        for entry in finished:
+            yield _batch_line(entry)
+
+        loop = asyncio.get_running_loop()
+        futures = [
+            loop.run_in_executor(BATCH_EXECUTOR, _process_batch_item, item, processing_opts,
+                                 session_game_params, user_id, patient_id)
+            for item in pending
+        ]
+        for future in asyncio.as_completed(futures):
+            yield _batch_line(await future)
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+
+def _store_recalculated(result_id: str, result_data: Dict, updated_result_data: Dict, result_path: Path) -> bytes:
+    """Save a rescored result over its result file and refresh its index entry; returns the stored JSON."""
+    # Create result object
+    game_metadata = GameMetadata(**updated_result_data['metadata'])
+
+    analytics = {
+        k: ChannelAnalytics(**v)
+        for k, v in updated_result_data['analytics'].items()
+    }
 
-        return result
+    result = EMGAnalysisResult(
+        file_id=result_id,
+        timestamp=result_data.get('timestamp', datetime.now().strftime("%Y%m%d_%H%M%S")),
+        source_filename=result_data.get('source_filename', 'unknown.c3d'),
+        metadata=game_metadata,
+        analytics=analytics,
+        available_channels=updated_result_data['available_channels'],
+        plots={},
+        user_id=result_data.get('user_id'),
+        patient_id=result_data.get('patient_id'),
+        session_id=result_data.get('session_id'),
+        content_sha256=result_data.get('content_sha256')
+    )
 
-    except Exception as e:
-        import traceback
-        print(f"ERROR in /upload: {str(e)}")
-        print(traceback.format_exc())
-        raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
+    result_json = result.model_dump_json().encode('utf-8')
+    with RESULTS_INDEX.transaction():
+        RESULTS_INDEX.put(row_from_result(result.model_dump(mode='json'), result_path.resolve(),
+                                          result_sha256=result_version(result_json)))
+        with open(result_path, "wb") as f:
+            f.write(result_json)
+    return result_json
 
 
 @app.post("/recalculate-scores", response_model=EMGAnalysisResult)
@@ -266,19 +695,22 @@ async def recalculate_scores(
     # Find the result file
     result_filename = f"{result_id}_result.json"
     result_path = RESULTS_DIR / result_filename
-    raw_emg_data_path = RESULTS_DIR / f"{result_id}_result_raw_emg.json"
+    raw_emg_store = await storage.run(RawEMGStore.open, RESULTS_DIR, result_id)
     
-    if not result_path.exists() or not raw_emg_data_path.exists():
+    if raw_emg_store is None or not await storage.exists(result_path):
         raise HTTPException(status_code=404, detail="Result not found")
     
     try:
         # Load the existing result
-        with open(result_path, "r") as f:
-            result_data = json.load(f)
+        result_data = await storage.read_json(result_path)
+        
+        # Open the raw EMG data (memory-mapped, no full parse)
+        emg_data = await storage.run(raw_emg_store.to_emg_data)
         
-        # Load the raw EMG data
-        with open(raw_emg_data_path, "r") as f:
-            emg_data = json.load(f)
+        # Load the persisted contraction tables (missing for results stored before they existed)
+        contractions_path = contraction_table_path(RESULTS_DIR, result_id)
+        contraction_tables = (await storage.run(load_contraction_tables, contractions_path)
+                              if await storage.exists(contractions_path) else None)
         
         # Parse the channel_muscle_mapping JSON string if provided
         parsed_channel_muscle_mapping = None
@@ -322,42 +754,20 @@ async def recalculate_scores(
         )
         
         # Create a processor instance
-        processor = GHOSTLYC3DProcessor(None)  # No file path needed for recalculation
+        processor = GHOSTLYC3DProcessor(None, signal_contexts=SIGNAL_CONTEXTS.get(result_id))  # No file path needed for recalculation
         processor.emg_data = emg_data  # Set the EMG data directly
         
         # Recalculate the scores
         updated_result_data = await run_in_threadpool(
             processor.recalculate_scores,
             result_data=result_data,
-            session_game_params=session_game_params
+            session_game_params=session_game_params,
+            contraction_tables=contraction_tables
         )
         
-        # Create result object
-        game_metadata = GameMetadata(**updated_result_data['metadata'])
-        
-        analytics = {
-            k: ChannelAnalytics(**v)
-            for k, v in updated_result_data['analytics'].items()
-        }
-        
-        result = EMGAnalysisResult(
-            file_id=result_id,
-            timestamp=result_data.get('timestamp', datetime.now().strftime("%Y%m%d_%H%M%S")),
-            source_filename=result_data.get('source_filename', 'unknown.c3d'),
-            metadata=game_metadata,
-            analytics=analytics,
-            available_channels=updated_result_data['available_channels'],
-            plots={},
-            user_id=result_data.get('user_id'),
-            patient_id=result_data.get('patient_id'),
-            session_id=result_data.get('session_id')
-        )
-        
-        # Save updated result to file
-        with open(result_path, "w") as f:
-            f.write(result.model_dump_json(indent=2))
-        
-        return result
+        # Save updated result to file and refresh its index entry
+        return _json_response(await storage.run(
+            _store_recalculated, result_id, result_data, updated_result_data, result_path))
         
     except Exception as e:
         import traceback
@@ -370,28 +780,110 @@ async def recalculate_scores(
 async def list_results():
     """List all available result files."""
     try:
-        results = [f.name for f in RESULTS_DIR.glob("*.json")]
-        return results
+        return [Path(row['result_path']).name for row in await storage.run(RESULTS_INDEX.list_results)]
     except Exception as e:
         raise HTTPException(status_code=500,
                             detail=f"Error listing results: {str(e)}")
 
 
-@app.get("/results/{result_id}", response_model=EMGAnalysisResult)
-async def get_result(result_id: str):
-    """Get a specific result by ID."""
+def _timestamp_bound(value: Optional[str], end_of_day: bool) -> Optional[str]:
+    """Convert an ISO date or datetime to the stored result timestamp format (YYYYMMDD_HHMMSS)."""
+    if value is None:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid date '{value}', expected ISO 8601 (e.g. 2025-01-31)")
+    if end_of_day and len(value) == 10:
+        # A bare date as upper bound includes the whole day
+        parsed = parsed.replace(hour=23, minute=59, second=59)
+    return parsed.strftime("%Y%m%d_%H%M%S")
+
+
+def _load_projected(row: Dict, fields: Optional[List[str]], exclude: Optional[List[str]]) -> Optional[Dict]:
+    """A result projected onto fields/exclude; answered from the index row when it holds every field."""
+    if fields and all(field in INDEXED_RESULT_FIELDS for field in fields):
+        return {field: row[INDEXED_RESULT_FIELDS[field]] for field in fields}
     try:
-        # Check if the file exists directly
-        direct_path = RESULTS_DIR / f"{result_id}.json"
-        if direct_path.exists():
-            with open(direct_path, "r") as f:
-                return json.load(f)
+        with open(row['result_path'], "r") as f:
+            return project_result(json.load(f), fields, exclude)
+    except FileNotFoundError:
+        return None  # Deleted between the index query and the read
+
+
+def _query_page_json(rows: List[Dict], fields: Optional[List[str]], exclude: Optional[List[str]],
+                     next_cursor: Optional[str]) -> bytes:
+    items = [item for item in (_load_projected(row, fields, exclude) for row in rows) if item is not None]
+    return ResultQueryPage(items=items, next_cursor=next_cursor).model_dump_json().encode('utf-8')
+
+
+@app.get("/results/query", response_model=ResultQueryPage)
+async def query_results(
+    patient_id: Optional[str] = Query(None),
+    therapist_id: Optional[str] = Query(None),
+    user_id: Optional[str] = Query(None),
+    session_id: Optional[str] = Query(None),
+    game_name: Optional[str] = Query(None),
+    level: Optional[str] = Query(None),
+    date_from: Optional[str] = Query(None, description="Earliest session date/time (ISO 8601), inclusive"),
+    date_to: Optional[str] = Query(None, description="Latest session date/time (ISO 8601), inclusive"),
+    score_min: Optional[float] = Query(None),
+    score_max: Optional[float] = Query(None),
+    sort: str = Query("timestamp", description="timestamp (processed), session_timestamp (played), score, level, game_name or patient_id"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    limit: int = Query(DEFAULT_QUERY_LIMIT, ge=1, le=MAX_QUERY_LIMIT),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated top-level fields to return (default: all)"),
+    exclude: Optional[str] = Query(None, description="Comma-separated dotted paths to omit, e.g. analytics.*.contractions")):
+    """
+    Query stored results by patient, therapist, game, level, date range and score range.
+
+    Results are served from the results index and paged with an opaque cursor, so each
+    page costs the same regardless of the archive size. Only the results on the page are
+    read from disk, and not even those when every requested field is in the index.
+    """
+    filters = {
+        'patient_id': patient_id, 'therapist_id': therapist_id, 'user_id': user_id,
+        'session_id': session_id, 'game_name': game_name, 'level': level,
+        'timestamp_from': _timestamp_bound(date_from, end_of_day=False),
+        'timestamp_to': _timestamp_bound(date_to, end_of_day=True),
+        'score_min': score_min, 'score_max': score_max,
+    }
+    descending = order == "desc"
+    field_list = [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+    exclude_list = [path.strip() for path in exclude.split(",") if path.strip()] if exclude else None
+
+    try:
+        after = decode_cursor(cursor, sort, descending) if cursor else None
+        # One extra row tells whether there is a next page
+        rows = await storage.run(RESULTS_INDEX.query, filters, sort=sort, descending=descending,
+                                 limit=limit + 1, after=after)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    page = rows[:limit]
+    next_cursor = encode_cursor(sort, descending, page[-1]) if len(rows) > limit else None
+    return _json_response(await storage.run(_query_page_json, page, field_list, exclude_list, next_cursor))
 
-        # Fallback to searching by prefix if not found
-        for f in RESULTS_DIR.glob(f"*{result_id}*.json"):
-            with open(f, "r") as file:
-                return json.load(file)
 
+@app.get("/results/{result_id}", response_model=EMGAnalysisResult)
+async def get_result(result_id: str, request: Request):
+    """
+    Get a specific result by ID (the stored JSON, returned as is).
+
+    The ETag (and X-Result-Version header) follow the result version; a request whose
+    If-None-Match lists the current ETag gets 304 without the result file being read.
+    """
+    row = await storage.run(RESULTS_INDEX.get, result_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Result not found")
+    try:
+        version = await storage.run(_result_version, row)
+        headers = cache_headers(make_etag(version), REVALIDATE, **{"X-Result-Version": version})
+        if matches(request, headers["ETag"]):
+            return not_modified(headers)
+        return _json_response(await storage.read_bytes(row['result_path']), headers)
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="Result not found")
     except Exception as e:
         raise HTTPException(status_code=500,
@@ -401,7 +893,13 @@ async def get_result(result_id: str):
 # backend/api.py
 
 @app.get("/raw-data/{result_id}/{channel}", response_model=EMGRawData)
-async def get_raw_data(result_id: str, channel: str):
+async def get_raw_data(result_id: str, channel: str, request: Request,
+                       start_ms: Optional[float] = Query(None, ge=0, description="Window start (ms)"),
+                       end_ms: Optional[float] = Query(None, ge=0, description="Window end (ms)"),
+                       max_points: Optional[int] = Query(None, ge=2, le=MAX_RAW_DATA_POINTS,
+                                                         description="Decimate to at most this many points"),
+                       wire_format: Optional[str] = Query(None, alias="format", pattern="^(json|npy|arrow)$",
+                                                          description="Response format (also selected by the Accept header)")):
     """
     Get raw EMG data for a specific channel.
     The 'channel' parameter can be a base name (e.g., "CH1"),
@@ -410,29 +908,70 @@ async def get_raw_data(result_id: str, channel: str):
     and if the requested channel was "Raw", its "activated" counterpart will be in 'activated_data'.
     If the requested channel was "activated", its "Raw" counterpart could also be returned if needed
     (though the current EMGRawData model has only one 'activated_data' field).
+
+    With start_ms/end_ms only that window is returned, and with max_points at most that many
+    points: every sample when the window is short enough, otherwise the minimum and maximum of
+    each bucket of samples, read from the result's waveform pyramid. activated_data is then
+    sampled at the same points, and only contractions overlapping the window are returned.
+
+    Accept: application/octet-stream (or ?format=npy) returns the samples of the channel (or
+    window) as a .npy file, and Accept: application/vnd.apache.arrow.stream (?format=arrow) as
+    an Arrow IPC stream with the activated counterpart as a second column. Both are streamed
+    from the stored array and honor Range requests; the sampling rate and first sample are in
+    the X-Sampling-Rate and X-Start-Sample headers.
+
+    Responses carry an ETag derived from the result version and the request; a matching
+    If-None-Match is answered with 304 before any data is read. Every response, errors and
+    304s included, carries Vary: Accept, since the format is negotiated from that header.
+
+    Reading the stores and encoding the response run off the event loop.
     """
+    try:
+        if start_ms is not None and end_ms is not None and end_ms <= start_ms:
+            raise HTTPException(status_code=400, detail="end_ms must be greater than start_ms")
+        windowed = start_ms is not None or end_ms is not None or max_points is not None
+        wire_format = negotiate(request.headers.get("accept", ""), wire_format)
+        if wire_format != 'json' and max_points is not None:
+            raise HTTPException(status_code=400, detail="max_points is only supported for JSON responses")
+        if wire_format == 'arrow' and pa is None:
+            raise HTTPException(status_code=406, detail="Arrow responses are not available (pyarrow is not installed)")
+
+        return await storage.run(_get_raw_data, result_id, channel, request, start_ms, end_ms, max_points,
+                                 wire_format, windowed)
+    except HTTPException as e:
+        e.headers = {**(e.headers or {}), **VARY_ACCEPT}
+        raise
+
+
+def _get_raw_data(result_id: str, channel: str, request: Request,
+                  start_ms: Optional[float], end_ms: Optional[float], max_points: Optional[int],
+                  wire_format: str, windowed: bool) -> Response:
+    caching = dict(VARY_ACCEPT)
+    row = RESULTS_INDEX.get(result_id)
+    if row is not None:
+        try:
+            etag = make_etag(_result_version(row), 'raw-data', channel, start_ms, end_ms, max_points, wire_format)
+        except OSError:
+            pass  # the result file is gone; reported below
+        else:
+            caching = cache_headers(etag, **VARY_ACCEPT)
+            if matches(request, etag):
+                return not_modified(caching)
     result_filename_base = f"{result_id}_result" # This was from your /upload
-    raw_emg_data_path = RESULTS_DIR / f"{result_filename_base}_raw_emg.json"
+    raw_emg_store = RawEMGStore.open(RESULTS_DIR, result_id)
     result_json_path = RESULTS_DIR / f"{result_filename_base}.json" # For contractions
 
-    if not raw_emg_data_path.exists():
-        # Fallback for older results that might not have split raw EMG data
-        # This part requires careful thought: if you *always* expect _raw_emg.json, remove this fallback.
-        # If fallback is needed, it must re-process the C3D, which is slow.
-        # For this fix, we'll assume _raw_emg.json *should* exist.
-        error_detail = f"Raw EMG data file not found: {raw_emg_data_path}. C3D reprocessing fallback not implemented in this version for get_raw_data."
+    if raw_emg_store is None:
+        # Neither the binary store nor a legacy _raw_emg.json exists.
+        # Re-processing the C3D here would be slow, so stay strict.
+        error_detail = f"Raw EMG data file not found for result ID: {result_id}. C3D reprocessing fallback not implemented in this version for get_raw_data."
         print(f"ERROR: {error_detail}") # Log this
-        # To make the frontend work even if this happens, you might return empty data or re-process.
-        # For now, strict:
-        raise HTTPException(status_code=404, detail=f"Raw EMG data file not found for result ID: {result_id}. File expected: {raw_emg_data_path.name}")
+        raise HTTPException(status_code=404, detail=f"Raw EMG data file not found for result ID: {result_id}. File expected: {result_id}{RAW_EMG_BINARY_SUFFIX}")
 
     if not result_json_path.exists():
          raise HTTPException(status_code=404, detail=f"Result JSON file not found for result ID: {result_id}")
 
     try:
-        with open(raw_emg_data_path, "r") as f:
-            all_emg_data_from_file = json.load(f) # This is the dict from processor.emg_data
-        
         with open(result_json_path, "r") as f:
             main_result_data = json.load(f) # This is the EMGAnalysisResult model data
 
@@ -441,13 +980,13 @@ async def get_raw_data(result_id: str, channel: str):
         requested_channel_name = channel
 
         # Try to find the exact requested_channel_name first.
-        primary_channel_dict = all_emg_data_from_file.get(requested_channel_name)
+        primary_channel_dict = raw_emg_store.get_channel(requested_channel_name) if requested_channel_name in raw_emg_store else None
         
         # If not found, and if `requested_channel_name` looks like a base name (e.g., "CH1"),
         # try appending " Raw" as a common default for the primary signal.
         if not primary_channel_dict and not (" Raw" in requested_channel_name or " activated" in requested_channel_name):
             potential_raw_name = f"{requested_channel_name} Raw"
-            primary_channel_dict = all_emg_data_from_file.get(potential_raw_name)
+            primary_channel_dict = raw_emg_store.get_channel(potential_raw_name) if potential_raw_name in raw_emg_store else None
             if primary_channel_dict:
                 # If we found "CH1 Raw" when "CH1" was requested, update what we consider the "primary"
                 requested_channel_name = potential_raw_name 
@@ -455,7 +994,7 @@ async def get_raw_data(result_id: str, channel: str):
         # If still not found, the channel truly doesn't exist in any common form.
         if not primary_channel_dict:
             # For debugging, list available channels if the requested one is not found.
-            available_keys_in_raw_file = list(all_emg_data_from_file.keys())
+            available_keys_in_raw_file = raw_emg_store.channels
             raise HTTPException(
                 status_code=404, 
                 detail=f"Channel '{channel}' (or its variants like '{channel} Raw') not found in pre-extracted raw data for result_id '{result_id}'. Available channels in raw file: {available_keys_in_raw_file}"
@@ -469,12 +1008,26 @@ async def get_raw_data(result_id: str, channel: str):
         final_activated_data_list = None
         base_name_of_primary = requested_channel_name.replace(" Raw", "").replace(" activated", "")
 
+        if wire_format != 'json':
+            return _raw_data_binary(requested_channel_name, primary_channel_dict, f"{base_name_of_primary} activated",
+                                    raw_emg_store, start_ms, end_ms, wire_format, request.headers.get("range"),
+                                    caching)
+
+        if windowed:
+            # Only the window is read (and converted to lists), never the whole channel
+            activated_counterpart_key = (None if requested_channel_name.endswith(" activated")
+                                         else f"{base_name_of_primary} activated")
+            analytics = main_result_data.get("analytics", {}).get(base_name_of_primary, {})
+            raw_data = _raw_data_window(result_id, requested_channel_name, primary_channel_dict,
+                                        activated_counterpart_key, raw_emg_store, analytics.get("contractions"),
+                                        start_ms, end_ms, max_points)
+            return _json_response(raw_data.model_dump_json().encode('utf-8'), caching)
+
         if requested_channel_name.endswith(" Raw"):
             # If primary is "CH1 Raw", then activated_data should be "CH1 activated"
             activated_counterpart_key = f"{base_name_of_primary} activated"
-            activated_counterpart_dict = all_emg_data_from_file.get(activated_counterpart_key)
-            if activated_counterpart_dict and 'data' in activated_counterpart_dict:
-                final_activated_data_list = [float(x) for x in activated_counterpart_dict['data']]
+            if activated_counterpart_key in raw_emg_store:
+                final_activated_data_list = raw_emg_store.get_signal(activated_counterpart_key).tolist()
         elif requested_channel_name.endswith(" activated"):
             # If primary is "CH1 activated", then `data` field gets "CH1 activated"
             # and `activated_data` field in the response model should also get "CH1 activated".
@@ -482,15 +1035,14 @@ async def get_raw_data(result_id: str, channel: str):
             # OR, if the model implies `activated_data` is *always* the '.activated' version
             # regardless of what was requested, then we just ensure it's populated.
             if primary_channel_dict and 'data' in primary_channel_dict: # primary_channel_dict is the activated one
-                 final_activated_data_list = [float(x) for x in primary_channel_dict['data']]
+                 final_activated_data_list = primary_channel_dict['data'].tolist()
         else:
             # If `requested_channel_name` is a base name (e.g., "EMG1" from C3D without suffix)
             # or some other name that doesn't end with " Raw" or " activated".
             # We should still look for its ".activated" counterpart.
             activated_counterpart_key = f"{base_name_of_primary} activated"
-            activated_counterpart_dict = all_emg_data_from_file.get(activated_counterpart_key)
-            if activated_counterpart_dict and 'data' in activated_counterpart_dict:
-                final_activated_data_list = [float(x) for x in activated_counterpart_dict['data']]
+            if activated_counterpart_key in raw_emg_store:
+                final_activated_data_list = raw_emg_store.get_signal(activated_counterpart_key).tolist()
 
 
         # Get contractions if they exist for the base muscle analytics
@@ -499,14 +1051,15 @@ async def get_raw_data(result_id: str, channel: str):
         muscle_analytics_for_contractions = main_result_data.get("analytics", {}).get(base_name_of_primary, {})
         contractions_from_analytics = muscle_analytics_for_contractions.get("contractions") # This was your previous logic
 
-        return EMGRawData(
+        raw_data = EMGRawData(
             channel_name=requested_channel_name, # The actual key found and being returned in 'data'
             sampling_rate=float(primary_channel_dict['sampling_rate']),
-            data=[float(x) for x in primary_channel_dict['data']],
-            time_axis=[float(x) for x in primary_channel_dict['time_axis']],
+            data=primary_channel_dict['data'].tolist(),
+            time_axis=primary_channel_dict['time_axis'].tolist(),
             activated_data=final_activated_data_list,
             contractions=contractions_from_analytics # This might be None if not present
         )
+        return _json_response(raw_data.model_dump_json().encode('utf-8'), caching)
 
     except FileNotFoundError: # More specific than generic Exception for this case
         raise HTTPException(status_code=404, detail=f"A required data file for result ID '{result_id}' was not found.")
@@ -521,60 +1074,217 @@ async def get_raw_data(result_id: str, channel: str):
         raise HTTPException(status_code=500, detail=f"Internal server error while retrieving raw EMG data. Details: {str(e)}")
 
 
+def _sample_window(size: int, sampling_rate: float,
+                   start_ms: Optional[float], end_ms: Optional[float]) -> Tuple[int, int]:
+    """Sample positions [start, stop) of a time window (the whole channel by default)."""
+    start = min(int(start_ms * sampling_rate / 1000), size) if start_ms is not None else 0
+    stop = min(int(np.ceil(end_ms * sampling_rate / 1000)), size) if end_ms is not None else size
+    return start, max(stop, start)
+
+
+def _raw_data_binary(channel_name: str, channel: Dict, activated_key: str, raw_emg_store: RawEMGStore,
+                     start_ms: Optional[float], end_ms: Optional[float], wire_format: str,
+                     range_header: Optional[str], extra_headers: Dict[str, str]):
+    """A channel (window) as a .npy file or Arrow IPC stream, sliced from the stored array without copying."""
+    signal = channel['data']
+    sampling_rate = float(channel['sampling_rate'])
+    start, stop = _sample_window(signal.size, sampling_rate, start_ms, end_ms)
+
+    if wire_format == 'npy':
+        parts = npy_body(signal[start:stop])
+    else:
+        columns = {channel_name: signal[start:stop]}
+        if activated_key != channel_name and activated_key in raw_emg_store:
+            activated = raw_emg_store.get_signal(activated_key)
+            if activated.size == signal.size:
+                columns[activated_key] = activated[start:stop]
+        parts = arrow_body(columns)
+
+    headers = {"X-Channel-Name": channel_name, "X-Sampling-Rate": repr(sampling_rate),
+               "X-Start-Sample": str(start), **extra_headers}
+    return binary_response(parts, MEDIA_TYPES[wire_format][0], range_header, headers)
+
+
+def _raw_data_window(result_id: str, channel_name: str, channel: Dict, activated_key: Optional[str],
+                     raw_emg_store: RawEMGStore, contractions: Optional[List[Dict]],
+                     start_ms: Optional[float], end_ms: Optional[float], max_points: Optional[int]) -> EMGRawData:
+    """The requested window of a channel, decimated to max_points through the waveform pyramid."""
+    signal = channel['data']
+    sampling_rate = float(channel['sampling_rate'])
+    start, stop = _sample_window(signal.size, sampling_rate, start_ms, end_ms)
+
+    indices, values, bucket = decimate_window(signal, start, stop, max_points or (stop - start),
+                                              WaveformPyramid.open(RESULTS_DIR, result_id), channel_name)
+
+    activated_data = None
+    if activated_key is not None and activated_key in raw_emg_store:
+        activated = raw_emg_store.get_signal(activated_key)
+        activated_data = activated[np.minimum(indices, activated.size - 1)].tolist() if activated.size else []
+    elif channel_name.endswith(" activated"):
+        activated_data = values.tolist()
+
+    window_start_ms, window_end_ms = start * 1000 / sampling_rate, stop * 1000 / sampling_rate
+    if contractions is not None:
+        contractions = [c for c in contractions
+                        if c['end_time_ms'] >= window_start_ms and c['start_time_ms'] <= window_end_ms]
+
+    return EMGRawData(
+        channel_name=channel_name,
+        sampling_rate=sampling_rate,
+        data=values.tolist(),
+        time_axis=(indices / sampling_rate).tolist(),
+        activated_data=activated_data,
+        contractions=contractions,
+        start_ms=window_start_ms,
+        end_ms=window_end_ms,
+        samples_per_bucket=bucket
+    )
+
+
+@app.post("/sweep/{result_id}", response_model=SweepResult)
+async def sweep_parameters(result_id: str, sweep: SweepRequest):
+    """
+    Evaluate contraction detection over a grid of detection parameters.
+
+    Returns contraction counts and summary statistics for every
+    (smoothing_window, threshold_factor, min_duration_ms) combination, using the
+    stored raw EMG data and the MVC threshold of the stored result.
+    """
+    result_path = RESULTS_DIR / f"{result_id}_result.json"
+    raw_emg_store = await storage.run(RawEMGStore.open, RESULTS_DIR, result_id)
+
+    if raw_emg_store is None or not await storage.exists(result_path):
+        raise HTTPException(status_code=404, detail="Result not found")
+
+    grid_size = len(sweep.threshold_factors) * len(sweep.min_durations_ms) * len(sweep.smoothing_windows)
+    if grid_size > MAX_SWEEP_GRID_POINTS:
+        raise HTTPException(status_code=400,
+                            detail=f"Sweep grid has {grid_size} points; at most {MAX_SWEEP_GRID_POINTS} are allowed")
+    if any(window <= 0 for window in sweep.smoothing_windows):
+        raise HTTPException(status_code=400, detail="Smoothing windows must be positive")
+
+    try:
+        result_data = await storage.read_json(result_path)
+
+        mvc_thresholds = {
+            base_name: channel_analytics.get('mvc_threshold_actual_value')
+            for base_name, channel_analytics in result_data.get('analytics', {}).items()
+        }
+
+        processor = GHOSTLYC3DProcessor(None, signal_contexts=SIGNAL_CONTEXTS.get(result_id))
+        processor.emg_data = await storage.run(raw_emg_store.to_emg_data)
+
+        sweeps = await run_in_threadpool(
+            processor.sweep_detection_parameters,
+            threshold_factors=sweep.threshold_factors,
+            min_durations_ms=sweep.min_durations_ms,
+            smoothing_windows=sweep.smoothing_windows,
+            mvc_thresholds=mvc_thresholds,
+            channels=sweep.channels
+        )
+        for base_name, channel_sweep in sweeps.items():
+            channel_sweep['mvc_threshold_actual_value'] = mvc_thresholds.get(base_name)
+
+        return SweepResult(file_id=result_id, channels=sweeps)
+
+    except Exception as e:
+        import traceback
+        print(f"ERROR in /sweep: {str(e)}")
+        print(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Error sweeping parameters: {str(e)}")
+
+
+def _upload_key(row: Dict) -> str:
+    """Key of an indexed result's upload in PARSED_C3D: its content hash, or (legacy uploads) the result ID."""
+    return row['content_sha256'] or row['result_id']
+
+
+def _find_source_c3d(row: Dict) -> Path:
+    """Resolve the uploaded C3D file of an indexed result (raises 404 when it is gone)."""
+    c3d_file_path = Path(row['upload_path']) if row['upload_path'] else None
+    if not c3d_file_path or not c3d_file_path.exists():
+        raise HTTPException(status_code=404, detail=f"Original C3D file not found for result ID: {row['result_id']}")
+    return c3d_file_path
+
+
+def _processor_for_result(result_id: str) -> GHOSTLYC3DProcessor:
+    """A processor on the (cached) parse of a result's C3D file; only a cache miss touches the disk."""
+    row = RESULTS_INDEX.get(result_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Result JSON file not found.")
+    # Results computed from the same stored upload share one parse
+    parsed = PARSED_C3D.get_or_parse(_upload_key(row), lambda: _find_source_c3d(row))
+    processor = GHOSTLYC3DProcessor(parsed.file_path, signal_contexts=SIGNAL_CONTEXTS.get(result_id))
+    processor.use_parsed(parsed)
+    return processor
+
+
+def _render_plot(result_id: str, channel: str, plot_path: Path) -> None:
+    processor = _processor_for_result(result_id)
+    plot_path.parent.mkdir(parents=True, exist_ok=True)
+    processor.plot_emg_with_contractions(channel=channel, save_path=str(plot_path))
+
+
+def _render_report(result_id: str, report_path: Path) -> None:
+    processor = _processor_for_result(result_id)
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    processor.plot_ghostly_report(save_path=str(report_path))
+
+
+def _image_cache_headers(request: Request, result_id: str, requested_version: Optional[str], *selectors: str):
+    """
+    (result version, cache headers, 304 response or None) of a plot or report.
+
+    Images are rendered per result version; requested with ?version= set to the current
+    version they are immutable, otherwise they must be revalidated.
+    """
+    row = RESULTS_INDEX.get(result_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Result JSON file not found.")
+    try:
+        version = _result_version(row)
+    except OSError:
+        raise HTTPException(status_code=404, detail="Result JSON file not found.")
+    etag = make_etag(version, *selectors)
+    headers = cache_headers(etag, IMMUTABLE if requested_version == version else REVALIDATE,
+                            **{"X-Result-Version": version})
+    return version, headers, not_modified(headers) if matches(request, etag) else None
+
+
 @app.get("/plot/{result_id}/{channel}")
 async def generate_plot(
+    request: Request,
     result_id: str,
     channel: str,
     regenerate: bool = Query(
         False,
-        description="Force regeneration of plot even if it already exists")):
+        description="Force regeneration of plot even if it already exists"),
+    version: Optional[str] = Query(
+        None,
+        description="Result version (X-Result-Version) the plot is requested for; makes the response immutable")):
     """Generate and return a plot image for a specific channel."""
-    # Find the original C3D file path from the result JSON
-    result_json_path = None
-    for f in RESULTS_DIR.glob(f"*{result_id}*.json"):
-        result_json_path = f
-        break
-
-    if not result_json_path:
-        raise HTTPException(status_code=404, detail="Result JSON file not found.")
-
-    with open(result_json_path, "r") as f:
-        result_data = json.load(f)
-        source_filename = result_data.get("source_filename")
-        if not source_filename:
-            raise HTTPException(status_code=500, detail="Source filename not in result JSON.")
-
-    # Find the uploaded C3D file
-    # This logic might need to be more robust if original filenames aren't unique
-    c3d_file_path = None
-    for f in UPLOAD_DIR.glob(f"*{result_id}*{source_filename}"):
-        c3d_file_path = f
-        break
-
-    if not c3d_file_path or not c3d_file_path.exists():
-        raise HTTPException(status_code=404, detail=f"Original C3D file not found for result ID: {result_id}")
+    current_version, headers, unchanged = await storage.run(_image_cache_headers, request, result_id, version,
+                                                            'plot', channel)
+    if unchanged is not None and not regenerate:
+        return unchanged
 
-    # Create plot directory
+    # Plots are rendered once per result version (and deleted with their result)
     plot_dir = PLOTS_DIR / result_id
-    plot_dir.mkdir(parents=True, exist_ok=True)
-    plot_path = plot_dir / f"{channel}.png"
+    plot_path = plot_dir / f"{channel}_{current_version[:16]}.png"
 
     # If plot exists and not regenerating, return it
-    if plot_path.exists() and not regenerate:
-        return FileResponse(plot_path)
+    if not regenerate and await storage.exists(plot_path):
+        return FileResponse(plot_path, headers=headers)
 
-    # Generate the plot
+    # Generate the plot (concurrent requests for the same plot wait for one rendering)
     try:
-        processor = GHOSTLYC3DProcessor(str(c3d_file_path))
-        
         # Use run_in_threadpool for the potentially long-running plotting operation
-        await run_in_threadpool(
-            processor.plot_emg_with_contractions,
-            channel=channel,
-            save_path=str(plot_path)
-        )
-        
-        return FileResponse(plot_path)
+        await run_in_threadpool(RENDER_FLIGHTS.do, ('plot', result_id, channel, current_version), _render_plot,
+                                result_id, channel, plot_path)
+
+        return FileResponse(plot_path, headers=headers)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500,
                             detail=f"Error generating plot: {str(e)}")
@@ -582,55 +1292,37 @@ async def generate_plot(
 
 @app.get("/report/{result_id}")
 async def generate_report(
+    request: Request,
     result_id: str,
     regenerate: bool = Query(
         False,
-        description="Force regeneration of report even if it already exists")):
+        description="Force regeneration of report even if it already exists"),
+    version: Optional[str] = Query(
+        None,
+        description="Result version (X-Result-Version) the report is requested for; makes the response immutable")):
     """Generate and return a full report for a specific result."""
-    # Find the original C3D file path from the result JSON
-    result_json_path = None
-    for f in RESULTS_DIR.glob(f"*{result_id}*.json"):
-        result_json_path = f
-        break
-
-    if not result_json_path:
-        raise HTTPException(status_code=404, detail="Result JSON file not found.")
+    current_version, headers, unchanged = await storage.run(_image_cache_headers, request, result_id, version,
+                                                            'report')
+    if unchanged is not None and not regenerate:
+        return unchanged
 
-    with open(result_json_path, "r") as f:
-        result_data = json.load(f)
-        source_filename = result_data.get("source_filename")
-        if not source_filename:
-            raise HTTPException(status_code=500, detail="Source filename not in result JSON.")
-
-    # Find the uploaded C3D file
-    c3d_file_path = None
-    for f in UPLOAD_DIR.glob(f"*{result_id}*{source_filename}"):
-        c3d_file_path = f
-        break
-
-    if not c3d_file_path or not c3d_file_path.exists():
-        raise HTTPException(status_code=404, detail=f"Original C3D file not found for result ID: {result_id}")
-
-    # Create plot directory
+    # Reports are rendered once per result version
     plot_dir = PLOTS_DIR / result_id
-    plot_dir.mkdir(parents=True, exist_ok=True)
-    report_path = plot_dir / "report.png"
+    report_path = plot_dir / f"report_{current_version[:16]}.png"
 
     # If report exists and not regenerating, return it
-    if report_path.exists() and not regenerate:
-        return FileResponse(report_path)
+    if not regenerate and await storage.exists(report_path):
+        return FileResponse(report_path, headers=headers)
 
-    # Generate the report
+    # Generate the report (concurrent requests for the same report wait for one rendering)
     try:
-        processor = GHOSTLYC3DProcessor(str(c3d_file_path))
-
         # Use run_in_threadpool for the potentially long-running plotting operation
-        await run_in_threadpool(
-             processor.plot_ghostly_report,
-             save_path=str(report_path)
-        )
+        await run_in_threadpool(RENDER_FLIGHTS.do, ('report', result_id, current_version), _render_report,
+                                result_id, report_path)
 
-        return FileResponse(report_path)
+        return FileResponse(report_path, headers=headers)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500,
                             detail=f"Error generating report: {str(e)}")
@@ -638,55 +1330,124 @@ async def generate_report(
 
 @app.get("/patients", response_model=List[str])
 async def list_patients():
-    """List all unique patient IDs from result filenames."""
+    """List all unique patient IDs of the stored results."""
     try:
-        patient_ids = set()
-        for f in RESULTS_DIR.glob("*.json"):
-            parts = f.name.split('_')
-            if len(parts) > 2:  # Assuming patientID_timestamp_uuid.json format
-                patient_ids.add(parts[0])
-        return list(patient_ids)
+        return await storage.run(RESULTS_INDEX.patients)
     except Exception as e:
         raise HTTPException(status_code=500,
                             detail=f"Error listing patients: {str(e)}")
 
 
+def _iter_patient_history(patient_id: str, exclude: Optional[List[str]]):
+    """Yield a patient's results as NDJSON lines, oldest first, one session in memory at a time."""
+    after = None
+    while True:
+        rows = RESULTS_INDEX.query({'patient_id': patient_id}, limit=HISTORY_PAGE_SIZE, after=after)
+        for row in rows:
+            result = _load_projected(row, None, exclude)
+            if result is not None:
+                yield json.dumps(result) + "\n"
+        if len(rows) < HISTORY_PAGE_SIZE:
+            return
+        after = (rows[-1]['sort_key'], rows[-1]['rowid'])
+
+
+def _patient_results_json(patient_id: str, exclude: Optional[List[str]]) -> bytes:
+    results = []
+    for row in RESULTS_INDEX.patient_results(patient_id):
+        result = _load_projected(row, None, exclude)
+        if result is not None:
+            results.append(result)
+    return json.dumps(results).encode('utf-8')
+
+
 @app.get("/patients/{patient_id}/results",
          response_model=List[EMGAnalysisResult])
-async def get_patient_results(patient_id: str):
-    """Get all results for a specific patient."""
+async def get_patient_results(
+    patient_id: str,
+    request: Request,
+    stream: bool = Query(False, description="Stream one result per line as NDJSON (also selected by Accept: application/x-ndjson)"),
+    summary: bool = Query(False, description="Omit the per-contraction lists of each channel")):
+    """
+    Get all results for a specific patient, oldest first.
+
+    With streaming, results are read and sent one session at a time, so the first
+    session arrives immediately and memory stays bounded regardless of history length.
+    """
+    exclude = HISTORY_SUMMARY_EXCLUDE if summary else None
+    if stream or "application/x-ndjson" in request.headers.get("accept", ""):
+        # A sync generator: StreamingResponse iterates it in the threadpool, off the event loop
+        return StreamingResponse(_iter_patient_history(patient_id, exclude), media_type="application/x-ndjson")
     try:
-        results = []
-        for f in RESULTS_DIR.glob(f"{patient_id}_*.json"):
-            with open(f, "r") as file:
-                results.append(json.load(file))
-        return results
+        # Stored results are returned as read, without re-validation
+        return _json_response(await storage.run(_patient_results_json, patient_id, exclude))
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error retrieving patient results: {str(e)}")
 
 
-@app.delete("/results/{result_id}")
-async def delete_result(result_id: str):
-    """Delete a result JSON file and its associated plots."""
-    try:
-        result_file = None
-        for f in RESULTS_DIR.glob(f"*{result_id}*.json"):
-            result_file = f
-            break
-
-        if not result_file:
-            raise HTTPException(status_code=404, detail="Result not found")
+@app.get("/patients/{patient_id}/trends", response_model=PatientTrends)
+async def get_patient_trends(
+    patient_id: str,
+    period: str = Query("week", pattern="^(day|week)$"),
+    channel: Optional[str] = Query(None, description="Base channel name, e.g. CH1 (default: all)"),
+    date_from: Optional[str] = Query(None, description="Earliest period start (ISO date), inclusive"),
+    date_to: Optional[str] = Query(None, description="Latest period start (ISO date), inclusive")):
+    """
+    Per-channel daily or weekly aggregates of a patient's sessions: contraction counts,
+    good-contraction ratio and mean RMS, MAV, MPF, MDF and FI_nsm5.
 
-        # Delete result file
-        os.remove(result_file)
+    Served from rollups maintained on every upload, recalculation and delete, so the
+    cost depends on the number of days/weeks returned, not on the number of sessions.
+    """
+    bounds = []
+    for value in (date_from, date_to):
+        try:
+            bounds.append(datetime.fromisoformat(value).date().isoformat() if value else None)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid date '{value}', expected ISO 8601 (e.g. 2025-01-31)")
+    channels = await storage.run(RESULTS_INDEX.trends, patient_id, period=period, channel=channel,
+                                 start=bounds[0], end=bounds[1])
+    return PatientTrends(patient_id=patient_id, period=period, channels=channels)
+
+
+def _delete_result(row: Dict) -> None:
+    result_id = row['result_id']
+    # Delete the index entry and result file together
+    with RESULTS_INDEX.transaction():
+        RESULTS_INDEX.delete(result_id)
+        if os.path.exists(row['result_path']):
+            os.remove(row['result_path'])
+    # Delete the stored channels, waveform pyramid and contraction tables of the result
+    for path in (*raw_emg_paths(RESULTS_DIR, result_id).values(), waveform_pyramid_path(RESULTS_DIR, result_id),
+                 contraction_table_path(RESULTS_DIR, result_id)):
+        path.unlink(missing_ok=True)
+    SIGNAL_CONTEXTS.discard(result_id)
+
+    # Delete the uploaded file once no other result was computed from it
+    content_sha256 = row['content_sha256']
+    if not content_sha256:
+        PARSED_C3D.discard(_upload_key(row))  # a legacy upload belongs to this result alone
+    elif UPLOAD_STORE.remove_if_unreferenced(content_sha256, RESULTS_INDEX.content_references):
+        PARSED_C3D.discard(_upload_key(row))
+        # ...and everything the analysis cache derived from it
+        ANALYSIS_CACHE.discard_content(content_sha256)
+
+    # Delete associated plot directory
+    plot_dir = PLOTS_DIR / result_id
+    if plot_dir.exists():
+        shutil.rmtree(plot_dir)
 
-        # Delete associated plot directory
-        plot_dir = PLOTS_DIR / result_id
-        if plot_dir.exists():
-            shutil.rmtree(plot_dir)
 
+@app.delete("/results/{result_id}")
+async def delete_result(result_id: str):
+    """Delete a result with its stored channel data, contraction tables and plots."""
+    row = await storage.run(RESULTS_INDEX.get, result_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Result not found")
+    try:
+        await storage.run(_delete_result, row)
         return {"message": f"Result {result_id} deleted successfully"}
     except Exception as e:
         raise HTTPException(status_code=500,
@@ -697,17 +1458,25 @@ async def delete_result(result_id: str):
 async def debug_file_structure(filename: str):
     """FOR DEBUGGING: Returns the structure of a C3D file's parameters."""
     try:
-        file_path = UPLOAD_DIR / filename
-        if not file_path.exists():
+        # Stored uploads are addressed by their SHA-256; older ones by their file name
+        content_match = CONTENT_SHA256.match(filename)
+        file_path = UPLOAD_STORE.path_for(content_match.group(1)) if content_match else UPLOAD_DIR / filename
+        if not await storage.exists(file_path):
             raise HTTPException(status_code=404, detail="File not found in upload directory.")
 
-        c3d = ezc3d.c3d(str(file_path))
+        # Share the parse with the results of this upload
+        match = UPLOAD_RESULT_ID.match(filename)
+        cache_key = content_match.group(1) if content_match else match.group(1) if match else filename
+        c3d = (await run_in_threadpool(PARSED_C3D.get_or_parse, cache_key, lambda: file_path)).c3d
         
         # A recursive function to serialize the parameter structure
         def serialize_params(params):
             output = {}
             for key, value in params.items():
-                if 'value' in value:
+                if not isinstance(value, dict):
+                    # Group metadata entries (e.g., __METADATA__ descriptions) are plain values
+                    output[key] = value
+                elif 'value' in value:
                     # Try to convert numpy arrays to lists for JSON serialization
                     param_value = value['value']
                     if hasattr(param_value, 'tolist'):
@@ -725,6 +1494,12 @@ async def debug_file_structure(filename: str):
         return JSONResponse(status_code=500, content={"error": f"Failed to read C3D file structure: {e}"})
 
 
+@app.get("/debug/parsed-c3d-cache")
+async def debug_parsed_c3d_cache():
+    """FOR DEBUGGING: Hit/miss counters and memory use of the parsed C3D cache."""
+    return PARSED_C3D.stats()
+
+
 @app.get("/debug/spectral-analysis")
 async def debug_spectral_analysis():
     """Debug endpoint to test spectral analysis functions with sample data."""
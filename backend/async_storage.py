@@ -0,0 +1,54 @@
+"""
+GHOSTLY+ Async Storage
+======================
+
+Awaitable access to the API's storage (result files, raw EMG stores, uploads,
+plots and the results index) for its ``async def`` endpoints. Every call runs
+the blocking operation in the threadpool, so one slow disk read or a busy
+SQLite write never stalls the event loop, and with it every other request the
+worker is serving.
+
+RULE:
+=====
+Async endpoints never open, stat, list or delete files, nor query the results
+index, on the event loop: they await one of the helpers below, or run a whole
+synchronous step (e.g. read a result, rescore it and store it) with run().
+The endpoint tests enforce this by slowing down every file open, every stat
+of the storage directories and every results index call, failing on any such
+call made from the event loop and on any stall of the loop.
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Callable, Union
+
+from fastapi.concurrency import run_in_threadpool
+
+PathLike = Union[str, Path]
+
+
+async def run(fn: Callable, *args, **kwargs) -> Any:
+    """Run a blocking function (e.g., a results index query or a whole storage step) off the event loop."""
+    return await run_in_threadpool(fn, *args, **kwargs)
+
+
+async def read_bytes(path: PathLike) -> bytes:
+    return await run_in_threadpool(Path(path).read_bytes)
+
+
+def _read_json(path: PathLike) -> Any:
+    with open(path, "rb") as f:
+        return json.load(f)
+
+
+async def read_json(path: PathLike) -> Any:
+    return await run_in_threadpool(_read_json, path)
+
+
+async def exists(path: PathLike) -> bool:
+    return await run_in_threadpool(Path(path).exists)
+
+
+async def unlink(path: PathLike) -> None:
+    """Delete a file if it exists."""
+    await run_in_threadpool(Path(path).unlink, missing_ok=True)
@@ -0,0 +1,215 @@
+"""
+GHOSTLY+ Channel Executor
+=========================
+
+Per-channel signal analysis, run either in the calling thread or fanned out to
+a persistent pool of worker processes.
+
+The work for one base channel (the registered metrics on its Raw signal and the
+contraction detection on its activated signal) does not depend on any other
+channel, so multi-channel recordings can use one core per channel instead of
+being limited by the GIL of the API's thread pool.
+
+PROCESS MODE:
+=============
+- The pool is created on first use and reused for the life of the server
+  (``spawn`` start method, so workers never inherit the API's threads).
+- Signals are copied once into a single shared-memory block; workers attach to
+  it by name and read the arrays in place instead of receiving pickled copies.
+- Workers write the detection envelope back into the same block, so the caller
+  can seed its SignalContext cache without recomputing or pickling it.
+- Only the small per-channel results (metrics, contraction list and table)
+  travel back through pickling.
+"""
+
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .emg_analysis import SignalContext, analyze_contractions, run_analysis_function
+
+ALIGNMENT = 64
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def analyze_channel(raw_context: Optional[SignalContext],
+                    contraction_context: Optional[SignalContext],
+                    analysis_functions: Dict[str, Callable],
+                    threshold_factor: float,
+                    min_duration_ms: int,
+                    smoothing_window: int) -> Dict:
+    """
+    Run the signal analysis of one base channel.
+
+    Contractions are detected without an MVC threshold; scoring is applied afterwards
+    by the processor, so the result only depends on the signals and detection parameters.
+
+    Returns a dict with 'analytics' (metric results), 'errors' (per-metric failures),
+    'contraction_stats' (analyze_contractions output, or None) and 'contraction_error'.
+    """
+    analytics, errors = {}, {}
+
+    # Apply all registered analysis functions to the raw signal,
+    # sharing intermediate products (PSD, rectified signal) between them
+    if raw_context is not None:
+        for func_name, func in analysis_functions.items():
+            try:
+                result = run_analysis_function(func, raw_context.signal, raw_context.sampling_rate,
+                                               context=raw_context)
+                analytics.update(result)
+            except Exception as e:
+                errors[func_name] = f"Analysis failed: {str(e)}"
+                analytics[func_name] = None
+
+    contraction_stats, contraction_error = None, None
+    if contraction_context is not None:
+        try:
+            contraction_stats = analyze_contractions(
+                signal=contraction_context.signal,
+                sampling_rate=contraction_context.sampling_rate,
+                threshold_factor=threshold_factor,
+                min_duration_ms=min_duration_ms,
+                smoothing_window=smoothing_window,
+                context=contraction_context
+            )
+        except Exception as e:
+            contraction_error = str(e)
+
+    return {
+        'analytics': analytics,
+        'errors': errors,
+        'contraction_stats': contraction_stats,
+        'contraction_error': contraction_error,
+    }
+
+
+# --- Process Pool ---
+
+def get_process_pool(max_workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """Return the shared analysis process pool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=max_workers,
+                                        mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def shutdown_process_pool() -> None:
+    """Shut down the shared analysis process pool (it is recreated on next use)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
+
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _layout(arrays: Dict[str, Tuple[int, np.dtype]]) -> Tuple[Dict[str, Dict], int]:
+    """Assign aligned offsets in one shared block to named (length, dtype) arrays."""
+    layout, offset = {}, 0
+    for name, (length, dtype) in arrays.items():
+        layout[name] = {'offset': offset, 'length': length, 'dtype': np.dtype(dtype).str}
+        offset += (length * np.dtype(dtype).itemsize + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+    return layout, max(offset, 1)
+
+
+def _view(buffer, entry: Dict) -> np.ndarray:
+    return np.ndarray((entry['length'],), dtype=np.dtype(entry['dtype']), buffer=buffer, offset=entry['offset'])
+
+
+def _analyze_channel_in_worker(shm_name: str, layout: Dict[str, Dict], task: Dict,
+                               analysis_functions: Dict[str, Callable], detection_params: Dict) -> Dict:
+    """Worker entry point: attach to the shared block and analyze one base channel."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    contexts: Dict[str, SignalContext] = {}
+    try:
+        for role in ('raw_channel', 'contraction_channel'):
+            name = task[role]
+            if name is not None:
+                contexts[role] = SignalContext(_view(shm.buf, layout[name]), task['sampling_rates'][name])
+        result = analyze_channel(contexts.get('raw_channel'), contexts.get('contraction_channel'),
+                                 analysis_functions, **detection_params)
+
+        window = max(1, detection_params['smoothing_window'])
+        result['envelope_window'] = None
+        if 'contraction_channel' in contexts and window in contexts['contraction_channel'].cached_windows:
+            envelope_slot = _view(shm.buf, layout[f"{task['contraction_channel']}#envelope"])
+            envelope_slot[:] = contexts['contraction_channel'].envelope(window)
+            del envelope_slot
+            result['envelope_window'] = window
+        return result
+    finally:
+        # Views into the block must be released before it can be closed
+        contexts.clear()
+        shm.close()
+
+
+def analyze_channels_in_processes(tasks: List[Dict],
+                                  signals: Dict[str, Tuple[np.ndarray, float]],
+                                  analysis_functions: Dict[str, Callable],
+                                  detection_params: Dict,
+                                  max_workers: Optional[int] = None
+                                 ) -> Tuple[List[Dict], Dict[str, Tuple[int, np.ndarray]]]:
+    """
+    Analyze base channels in the shared process pool.
+
+    Args:
+        tasks: One dict per base channel with 'raw_channel' and 'contraction_channel'
+               (channel names or None).
+        signals: Channel name -> (signal, sampling rate) for every channel named in tasks.
+        analysis_functions: Registry of metrics to run on each Raw signal (must be picklable).
+        detection_params: threshold_factor, min_duration_ms and smoothing_window.
+        max_workers: Pool size, used when the pool is first created.
+
+    Returns:
+        (results in task order, {contraction channel: (window, envelope)} computed by workers)
+    """
+    arrays = {name: (len(signal), np.asarray(signal).dtype) for name, (signal, _) in signals.items()}
+    contraction_channels = {task['contraction_channel'] for task in tasks if task['contraction_channel']}
+    arrays.update({f"{name}#envelope": (len(signals[name][0]), np.float64) for name in contraction_channels})
+    layout, size = _layout(arrays)
+    sampling_rates = {name: sampling_rate for name, (_, sampling_rate) in signals.items()}
+
+    shm = shared_memory.SharedMemory(create=True, size=size)
+    try:
+        for name, (signal, _) in signals.items():
+            _view(shm.buf, layout[name])[:] = signal
+
+        pool = get_process_pool(max_workers)
+        futures = [
+            pool.submit(_analyze_channel_in_worker, shm.name, layout,
+                        dict(task, sampling_rates=sampling_rates), analysis_functions, detection_params)
+            for task in tasks
+        ]
+        try:
+            results = [future.result() for future in futures]
+        except BrokenProcessPool:
+            # A worker died; drop the pool so the next call starts a fresh one
+            _discard_pool(pool)
+            raise
+
+        envelopes = {}
+        for task, result in zip(tasks, results):
+            window = result.pop('envelope_window')
+            if window is not None:
+                envelopes[task['contraction_channel']] = (
+                    window, _view(shm.buf, layout[f"{task['contraction_channel']}#envelope"]).copy())
+        return results, envelopes
+    finally:
+        shm.close()
+        shm.unlink()
@@ -36,9 +36,212 @@ Key parameters requiring clinical validation:
 Detailed hypotheses for each parameter are documented within the relevant function docstrings.
 """
 
+import threading
+from collections import OrderedDict
+
 import numpy as np
 from scipy.signal import welch
-from typing import Dict, Optional
+from typing import Callable, Dict, List, Optional, Tuple
+
+def moving_average_envelope(rectified_signal: np.ndarray, window: int) -> np.ndarray:
+    """
+    Moving average of a signal computed from its cumulative sum, in O(N) for any window.
+
+    Equivalent to np.convolve(rectified_signal, np.ones(window)/window, mode='same'):
+    sample i averages rectified_signal[i - window//2 : i + (window-1)//2 + 1], with the
+    signal treated as zero outside its bounds and the sum always divided by `window`.
+    """
+    window = max(1, window)
+    n_samples = len(rectified_signal)
+    cumulative = np.empty(n_samples + 1)
+    cumulative[0] = 0.0
+    np.cumsum(rectified_signal, out=cumulative[1:])
+
+    ahead, behind = (window - 1) // 2, window // 2
+    upper = np.full(n_samples, cumulative[-1])
+    n_inside = max(0, n_samples - ahead)
+    upper[:n_inside] = cumulative[ahead + 1:ahead + 1 + n_inside]
+    lower = np.zeros(n_samples)
+    if behind < n_samples:
+        lower[behind:] = cumulative[:n_samples - behind]
+    # The difference of two large partial sums can round slightly below zero on flat stretches
+    return np.maximum(upper - lower, 0.0) / window
+
+
+# --- Shared Intermediate Products ---
+
+# Bytes of envelopes memoized per SignalContext (least recently used windows are dropped)
+MAX_ENVELOPE_BYTES = 32 * 1024 * 1024
+
+class SignalContext:
+    """
+    Memoized intermediate products of one signal, shared by every metric that needs them.
+
+    The processor creates one context per channel, so expensive products such as the Welch
+    PSD are computed once instead of once per metric. Products are computed lazily on first
+    access. The API keeps the contexts of recently used results (see SignalContextCache),
+    so envelopes also survive across requests on the same result.
+
+    Envelopes are memoized least recently used first within `max_envelope_bytes`; the most
+    recent one is always kept, so a sweep over many windows cannot pin them all.
+    """
+
+    def __init__(self, signal: np.ndarray, sampling_rate: int, max_envelope_bytes: int = MAX_ENVELOPE_BYTES):
+        self.signal = signal
+        self.sampling_rate = sampling_rate
+        self.max_envelope_bytes = max_envelope_bytes
+        self._rectified: Optional[np.ndarray] = None
+        self._psd: Optional[Tuple[Optional[np.ndarray], Optional[np.ndarray]]] = None
+        self._envelopes: "OrderedDict[int, np.ndarray]" = OrderedDict()
+        self._envelope_bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def rectified(self) -> np.ndarray:
+        """Full-wave rectified signal."""
+        if self._rectified is None:
+            self._rectified = np.abs(self.signal)
+        return self._rectified
+
+    @property
+    def psd(self) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+        """(freqs, psd) from _calculate_psd, or (None, None) if the signal is unsuitable."""
+        if self._psd is None:
+            self._psd = _calculate_psd(self.signal, self.sampling_rate)
+        return self._psd
+
+    def envelope(self, window: int) -> np.ndarray:
+        """
+        Moving-average envelope of the rectified signal for the given window size.
+
+        Computed in O(N) with moving_average_envelope and memoized per window, so contraction
+        detection, parameter sweeps and plot overlays of the same channel share one array.
+        The array is read-only because it is shared.
+        """
+        window = max(1, window)
+        with self._lock:
+            envelope = self._envelopes.get(window)
+            if envelope is not None:
+                self._envelopes.move_to_end(window)
+                return envelope
+        envelope = moving_average_envelope(self.rectified, window)
+        self.store_envelope(window, envelope)
+        return envelope
+
+    def store_envelope(self, window: int, envelope: np.ndarray) -> None:
+        """Memoize an envelope computed elsewhere (e.g., by a worker process) for this signal."""
+        envelope.flags.writeable = False
+        window = max(1, window)
+        with self._lock:
+            self._pop_envelope(window)
+            self._envelopes[window] = envelope
+            self._envelope_bytes += envelope.nbytes
+            while len(self._envelopes) > 1 and self._envelope_bytes > self.max_envelope_bytes:
+                self._pop_envelope(next(iter(self._envelopes)))
+
+    def _pop_envelope(self, window: int) -> None:
+        envelope = self._envelopes.pop(window, None)
+        if envelope is not None:
+            self._envelope_bytes -= envelope.nbytes
+
+    @property
+    def cached_windows(self) -> List[int]:
+        """Window sizes whose envelopes are currently memoized."""
+        with self._lock:
+            return sorted(self._envelopes)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the memoized products (not by the signal itself)."""
+        products = [self._rectified, *(self._psd or ())]
+        return self._envelope_bytes + sum(array.nbytes for array in products if array is not None)
+
+
+def uses_signal_context(func: Callable) -> Callable:
+    """
+    Mark an analysis function as accepting a ``context`` keyword argument.
+
+    The processor passes the channel's SignalContext to marked functions; unmarked
+    functions keep the plain ``func(signal, sampling_rate)`` calling convention.
+    """
+    func.uses_signal_context = True
+    return func
+
+
+def run_analysis_function(func: Callable, signal: np.ndarray, sampling_rate: int,
+                          context: Optional[SignalContext] = None) -> Dict:
+    """Call a registered analysis function, sharing the context if it supports one."""
+    if context is not None and getattr(func, 'uses_signal_context', False):
+        return func(signal, sampling_rate, context=context)
+    return func(signal, sampling_rate)
+
+
+def _find_bursts(above_threshold: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Find the boundaries of every run of True values in a boolean mask.
+
+    Returns sorted, paired (starts, ends) index arrays. `starts` is the first sample of
+    each run; `ends` is the first sample after the run, or the last sample of the signal
+    for a run that reaches the end of the recording.
+    """
+    n_samples = len(above_threshold)
+    # Padding with False on both sides guarantees every rising edge has a falling edge,
+    # so starts and ends always pair up one-to-one.
+    edges = np.diff(np.concatenate(([0], above_threshold.view(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    if len(ends) > 0 and ends[-1] == n_samples:
+        ends[-1] = n_samples - 1
+    return starts, ends
+
+
+def _filter_bursts(starts: np.ndarray, ends: np.ndarray,
+                   min_duration_samples: int,
+                   refractory_period_samples: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Keep bursts lasting at least `min_duration_samples`, then apply the refractory period.
+
+    A burst is dropped if it starts less than `refractory_period_samples` after the end of
+    the previously *kept* burst (the very first burst is exempt). Because that rule chains
+    through kept bursts, the next kept burst is located with a binary search on the sorted
+    starts, so the cost is O(log n) per kept burst rather than a scan of every candidate.
+    """
+    keep = np.flatnonzero(ends - starts >= min_duration_samples)
+    if refractory_period_samples <= 0 or len(keep) == 0:
+        return starts[keep], ends[keep]
+
+    kept_starts, kept_ends = starts[keep], ends[keep]
+    selected = []
+    if keep[0] == 0:
+        selected.append(0)
+        next_allowed_start = kept_ends[0] + refractory_period_samples
+    else:
+        next_allowed_start = refractory_period_samples
+    position = np.searchsorted(kept_starts, next_allowed_start, side='left')
+    while position < len(kept_starts):
+        selected.append(position)
+        next_allowed_start = kept_ends[position] + refractory_period_samples
+        position = np.searchsorted(kept_starts, next_allowed_start, side='left')
+
+    selected = np.asarray(selected, dtype=np.intp)
+    return kept_starts[selected], kept_ends[selected]
+
+
+def _merge_bursts(starts: np.ndarray, ends: np.ndarray,
+                  merge_threshold_samples: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Merge consecutive bursts separated by a gap of at most `merge_threshold_samples`.
+
+    Each gap larger than the threshold opens a new group; a group spans from the start
+    of its first burst to the end of its last burst.
+    """
+    if len(starts) == 0:
+        return starts, ends
+    new_group = (starts[1:] - ends[:-1]) > merge_threshold_samples
+    group_starts = np.concatenate(([0], np.flatnonzero(new_group) + 1))
+    group_ends = np.concatenate((group_starts[1:] - 1, [len(starts) - 1]))
+    return starts[group_starts], ends[group_ends]
+
 
 # --- Contraction Analysis ---
 
@@ -50,7 +253,8 @@ def analyze_contractions(
     smoothing_window: int,
     mvc_amplitude_threshold: Optional[float] = None,
     merge_threshold_ms: int = 200,
-    refractory_period_ms: int = 0
+    refractory_period_ms: int = 0,
+    context: Optional[SignalContext] = None
 ) -> Dict:
     """
     Analyzes a signal to detect contractions and calculate related stats.
@@ -90,10 +294,13 @@ def analyze_contractions(
                            which is based on typical motor unit firing rates and muscle response times.
         refractory_period_ms: The minimum time in milliseconds after a contraction ends before
                              a new contraction can be detected. Default is 0ms (disabled).
+        context: Optional shared SignalContext of `signal`; its rectified signal and
+                 envelopes are reused instead of being recomputed.
 
     Returns:
         A dictionary containing contraction statistics, a list of contractions (with 'is_good' flag if mvc_threshold_used),
-        and good_contraction_count.
+        good_contraction_count, and (when contractions were found) 'contraction_table', the
+        struct-of-arrays of contraction features used for persistence and rescoring.
     """
     base_return = {
         'contraction_count': 0, 'avg_duration_ms': 0.0, 'min_duration_ms': 0.0,
@@ -107,13 +314,15 @@ def analyze_contractions(
     if len(signal) < smoothing_window or smoothing_window <= 0:
         return base_return
 
+    if context is None:
+        context = SignalContext(signal, sampling_rate)
+
     # 1. Rectify the signal
-    rectified_signal = np.abs(signal)
+    rectified_signal = context.rectified
 
     # 2. Smooth the signal with a moving average
     # Ensure smoothing_window is at least 1
-    actual_smoothing_window = max(1, smoothing_window)
-    smoothed_signal = np.convolve(rectified_signal, np.ones(actual_smoothing_window)/actual_smoothing_window, mode='same')
+    smoothed_signal = context.envelope(smoothing_window)
 
     # 3. Set threshold for burst detection
     max_smoothed_amplitude = np.max(smoothed_signal)
@@ -124,40 +333,7 @@ def analyze_contractions(
 
     # 4. Detect activity above threshold
     above_threshold = smoothed_signal > threshold
-    
-    # Find start and end points of contractions
-    diff = np.diff(above_threshold.astype(int))
-    starts = np.where(diff == 1)[0] + 1 # diff is 1 sample shorter
-    ends = np.where(diff == -1)[0] + 1   # diff is 1 sample shorter
-    
-    # Handle cases where activity starts or ends at the file boundaries
-    if above_threshold[0]:
-        starts = np.insert(starts, 0, 0)
-    if above_threshold[-1] and (len(ends) == 0 or ends[-1] < len(above_threshold) - 1):
-        ends = np.append(ends, len(above_threshold) - 1)
-        
-    # Ensure starts and ends pair up
-    if len(starts) > len(ends):
-        starts = starts[:len(ends)]
-    elif len(ends) > len(starts):
-        # This can happen if signal ends above threshold AND last diff was not -1.
-        # Or if signal starts below threshold, goes up, and ends above threshold.
-        # Example: [F,F,T,T,T] -> starts=[2], ends=[] -> should be ends=[4]
-        # Example: [F,T,T,F,T,T] -> starts=[1,4], ends=[3] -> if ends[-1] < len(signal)-1 and signal[-1] is T
-        # A simpler approach is to ensure starts < ends
-        valid_pairs = []
-        current_start_idx = 0
-        while current_start_idx < len(starts):
-            potential_ends = ends[ends > starts[current_start_idx]]
-            if len(potential_ends) > 0:
-                valid_pairs.append((starts[current_start_idx], potential_ends[0]))
-                # Move to next start after this end
-                current_start_idx = np.argmax(starts > potential_ends[0]) if np.any(starts > potential_ends[0]) else len(starts)
-            else:
-                break # No more valid ends for current or subsequent starts
-        
-        starts = np.array([p[0] for p in valid_pairs])
-        ends = np.array([p[1] for p in valid_pairs])
+    starts, ends = _find_bursts(above_threshold)
 
     # 5. Filter contractions by minimum duration
     min_duration_samples = int((min_duration_ms / 1000) * sampling_rate)
@@ -167,84 +343,367 @@ def analyze_contractions(
     refractory_period_samples = int((refractory_period_ms / 1000) * sampling_rate)
     
     # Filter by minimum duration and apply refractory period
-    valid_contractions = []
-    for i, (start_idx, end_idx) in enumerate(zip(starts, ends)):
-        duration_samples = end_idx - start_idx
-        if duration_samples >= min_duration_samples:
-            # Apply refractory period if specified
-            if refractory_period_samples > 0 and i > 0:
-                last_end = valid_contractions[-1][1] if valid_contractions else 0
-                if start_idx - last_end < refractory_period_samples:
-                    continue  # Skip this contraction as it's within refractory period
-            
-            valid_contractions.append((start_idx, end_idx))
+    starts, ends = _filter_bursts(starts, ends, min_duration_samples, refractory_period_samples)
     
     # 6. Merge contractions that are close together
-    if merge_threshold_samples > 0 and valid_contractions:
-        merged_contractions = [valid_contractions[0]]
-        for current_start, current_end in valid_contractions[1:]:
-            prev_start, prev_end = merged_contractions[-1]
-            
-            # If current contraction starts soon after previous one ends, merge them
-            if current_start - prev_end <= merge_threshold_samples:
-                # Update the end time of the previous contraction to include this one
-                merged_contractions[-1] = (prev_start, current_end)
-            else:
-                # Add as a new contraction
-                merged_contractions.append((current_start, current_end))
-        
-        valid_contractions = merged_contractions
+    if merge_threshold_samples > 0:
+        starts, ends = _merge_bursts(starts, ends, merge_threshold_samples)
     
-    # 7. Create contraction objects with detailed information
-    contractions_list = []
-    good_contraction_count = 0
-
-    for start_idx, end_idx in valid_contractions:
-        segment = rectified_signal[start_idx:end_idx+1]  # Inclusive end for segment analysis
-        if len(segment) == 0: 
-            continue
-
-        max_amp_in_segment = np.max(segment)
-        
-        is_good = None
-        if mvc_amplitude_threshold is not None:
-            is_good = max_amp_in_segment >= mvc_amplitude_threshold
-            if is_good:
-                good_contraction_count += 1
-        
-        contractions_list.append({
-            'start_time_ms': (start_idx / sampling_rate) * 1000,
-            'end_time_ms': (end_idx / sampling_rate) * 1000,  # end_idx is the last sample *in* the contraction
-            'duration_ms': ((end_idx - start_idx) / sampling_rate) * 1000,
-            'mean_amplitude': np.mean(segment),
-            'max_amplitude': max_amp_in_segment,
-            'is_good': is_good
-        })
+    # 7. Compute per-contraction features in one batched pass
+    features = extract_contraction_features(rectified_signal, smoothed_signal, starts, ends, sampling_rate)
 
     # 8. Calculate summary statistics
-    if not contractions_list:
+    if len(starts) == 0:
         base_return['good_contraction_count'] = 0 if mvc_amplitude_threshold is not None else None
         return base_return
-        
-    durations = [c['duration_ms'] for c in contractions_list]
-    # Use mean_amplitude from *rectified original signal segment* for these summary stats
-    mean_amplitudes_of_contractions = [c['mean_amplitude'] for c in contractions_list] 
-    max_amplitudes_of_contractions = [c['max_amplitude'] for c in contractions_list]
 
+    good_contraction_count = None
+    if mvc_amplitude_threshold is not None:
+        is_good = features['max_amplitude'] >= mvc_amplitude_threshold
+        good_contraction_count = int(np.count_nonzero(is_good))
+    else:
+        is_good = np.full(len(starts), None)
+
+    durations = features['duration_ms']
+    # Use mean_amplitude from *rectified original signal segment* for these summary stats
     return {
-        'contraction_count': len(contractions_list),
-        'avg_duration_ms': np.mean(durations) if durations else 0.0,
-        'min_duration_ms': np.min(durations) if durations else 0.0,
-        'max_duration_ms': np.max(durations) if durations else 0.0,
-        'total_time_under_tension_ms': np.sum(durations) if durations else 0.0,
-        'avg_amplitude': np.mean(mean_amplitudes_of_contractions) if mean_amplitudes_of_contractions else 0.0, # Avg of mean amplitudes
-        'max_amplitude': np.max(max_amplitudes_of_contractions) if max_amplitudes_of_contractions else 0.0, # Max of max amplitudes
-        'contractions': contractions_list,
-        'good_contraction_count': good_contraction_count if mvc_amplitude_threshold is not None else None,
+        'contraction_count': len(starts),
+        'avg_duration_ms': float(np.mean(durations)),
+        'min_duration_ms': float(np.min(durations)),
+        'max_duration_ms': float(np.max(durations)),
+        'total_time_under_tension_ms': float(np.sum(durations)),
+        'avg_amplitude': float(np.mean(features['mean_amplitude'])), # Avg of mean amplitudes
+        'max_amplitude': float(np.max(features['max_amplitude'])), # Max of max amplitudes
+        'contractions': contraction_features_to_list(features, is_good),
+        'contraction_table': features,
+        'good_contraction_count': good_contraction_count,
         'mvc_threshold_actual_value': mvc_amplitude_threshold
     }
 
 
+# --- Per-Contraction Features ---
+
+CONTRACTION_FEATURE_FIELDS = (
+    'start_time_ms', 'end_time_ms', 'duration_ms',
+    'mean_amplitude', 'max_amplitude', 'rms',
+    'area_under_envelope', 'time_to_peak_ms', 'rise_time_ms', 'fall_time_ms',
+)
+
+
+def _segment_reduce(ufunc: np.ufunc, values: np.ndarray, starts: np.ndarray, stops: np.ndarray) -> np.ndarray:
+    """
+    Apply `ufunc.reduce` to every half-open segment values[starts[i]:stops[i]] (non-empty).
+
+    Segments may overlap or come in any order. reduceat cannot take the end of the array
+    as a boundary, so segments reaching it stop one sample early and fold in the last value.
+    """
+    n_values = len(values)
+    at_end = stops >= n_values
+    indices = np.empty(2 * len(starts), dtype=np.intp)
+    indices[0::2] = starts
+    indices[1::2] = np.where(at_end, n_values - 1, stops)
+    reduced = ufunc.reduceat(values, indices)[0::2]
+    fold_last = at_end & (starts < n_values - 1)
+    reduced[fold_last] = ufunc(reduced[fold_last], values[-1])
+    return reduced
+
+
+def extract_contraction_features(rectified_signal: np.ndarray,
+                                 envelope: np.ndarray,
+                                 starts: np.ndarray,
+                                 ends: np.ndarray,
+                                 sampling_rate: int) -> Dict[str, np.ndarray]:
+    """
+    Computes the features of every contraction in one batched pass.
+
+    Segments are inclusive of their end sample (rectified_signal[start:end+1]), matching
+    the original per-contraction slicing. Amplitude features use segment reductions
+    (`ufunc.reduceat`) over the rectified signal; timing features use the envelope.
+
+    Clinical Assumptions:
+    - Amplitude features (mean, max, RMS) are taken from the rectified signal
+    - Area under the envelope approximates the contraction's total activation (amplitude * s)
+    - Time to peak is measured from onset to the envelope maximum
+    - Rise time is the 10%->90% of envelope peak interval; fall time the 90%->10% interval
+
+    Args:
+        rectified_signal: The rectified EMG signal.
+        envelope: The smoothed envelope used for detection (same length as the signal).
+        starts: Start sample index of each contraction.
+        ends: End sample index (inclusive) of each contraction.
+        sampling_rate: The sampling rate of the signal in Hz.
+
+    Returns:
+        A struct-of-arrays dictionary with one array per name in CONTRACTION_FEATURE_FIELDS,
+        plus the 'start_idx' and 'end_idx' boundary arrays.
+    """
+    starts = np.asarray(starts, dtype=np.intp)
+    ends = np.asarray(ends, dtype=np.intp)
+    features = {'start_idx': starts, 'end_idx': ends}
+    if len(starts) == 0:
+        features.update({name: np.empty(0) for name in CONTRACTION_FEATURE_FIELDS})
+        return features
+
+    stops = ends + 1
+    lengths = stops - starts
+    to_ms = 1000.0 / sampling_rate
+
+    features['start_time_ms'] = starts * to_ms
+    features['end_time_ms'] = ends * to_ms  # end_idx is the last sample *in* the contraction
+    features['duration_ms'] = (ends - starts) * to_ms
+
+    # Amplitude features: segment reductions over the rectified signal
+    features['max_amplitude'] = _segment_reduce(np.maximum, rectified_signal, starts, stops)
+    features['mean_amplitude'] = _segment_reduce(np.add, rectified_signal, starts, stops) / lengths
+    features['rms'] = np.sqrt(_segment_reduce(np.add, np.square(rectified_signal), starts, stops) / lengths)
+    features['area_under_envelope'] = _segment_reduce(np.add, envelope, starts, stops) / sampling_rate
+
+    # Timing features: gather the envelope samples of all contractions into one flat array
+    # (total size <= signal length) and reduce per contraction on it.
+    segment_offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    local_index = np.arange(lengths.sum()) - np.repeat(segment_offsets, lengths)
+    segment_envelope = envelope[np.repeat(starts, lengths) + local_index]
+
+    peak = _segment_reduce(np.maximum, segment_envelope, segment_offsets, segment_offsets + lengths)
+    relative = np.divide(segment_envelope, np.repeat(peak, lengths),
+                         out=np.zeros_like(segment_envelope, dtype=float), where=np.repeat(peak, lengths) > 0)
+    no_index = len(segment_envelope)
+
+    def first_where(mask):
+        return _segment_reduce(np.minimum, np.where(mask, local_index, no_index), segment_offsets, segment_offsets + lengths)
+
+    def last_where(mask):
+        return _segment_reduce(np.maximum, np.where(mask, local_index, -1), segment_offsets, segment_offsets + lengths)
+
+    features['time_to_peak_ms'] = first_where(relative >= 1.0) * to_ms
+    features['rise_time_ms'] = (first_where(relative >= 0.9) - first_where(relative >= 0.1)) * to_ms
+    features['fall_time_ms'] = (last_where(relative >= 0.1) - last_where(relative >= 0.9)) * to_ms
+    return features
+
+
+def contraction_table_from_list(contractions: List[Dict]) -> Dict[str, np.ndarray]:
+    """Builds a contraction table from a list of contraction dicts (e.g. a stored result)."""
+    return {
+        name: np.array([c.get(name) for c in contractions], dtype=float)
+        for name in ('start_time_ms', 'end_time_ms', 'duration_ms', 'mean_amplitude', 'max_amplitude')
+    }
+
+
+def score_contractions(table: Dict[str, np.ndarray],
+                       mvc_amplitude_threshold: Optional[float],
+                       duration_threshold_ms: Optional[float]) -> Dict:
+    """
+    Scores a contraction table with one vectorized comparison per criterion.
+
+    Clinical Assumptions:
+    - A contraction is 'good' if its max amplitude reaches the MVC threshold
+    - A contraction is 'long' if its duration reaches the duration threshold, 'short' otherwise
+
+    Args:
+        table: Contraction table with at least 'max_amplitude' and 'duration_ms' columns.
+        mvc_amplitude_threshold: Amplitude a 'good' contraction must reach, or None.
+        duration_threshold_ms: Duration separating short from long contractions, or None.
+
+    Returns:
+        A dictionary with the boolean 'is_good' / 'is_long' arrays (None when the
+        corresponding threshold is None) and the resulting counts.
+    """
+    is_good = None
+    is_long = None
+    scores = {}
+    if mvc_amplitude_threshold is not None:
+        is_good = table['max_amplitude'] >= mvc_amplitude_threshold
+        scores['good_contraction_count'] = int(np.count_nonzero(is_good))
+    if duration_threshold_ms is not None:
+        is_long = table['duration_ms'] >= duration_threshold_ms
+        long_count = int(np.count_nonzero(is_long))
+        scores['long_contraction_count'] = long_count
+        scores['short_contraction_count'] = len(is_long) - long_count
+        if is_good is not None:
+            good_long_count = int(np.count_nonzero(is_good & is_long))
+            scores['good_long_contraction_count'] = good_long_count
+            scores['good_short_contraction_count'] = scores['good_contraction_count'] - good_long_count
+    scores['is_good'] = is_good
+    scores['is_long'] = is_long
+    return scores
+
+
+def contraction_features_to_list(features: Dict[str, np.ndarray], is_good: np.ndarray) -> List[Dict]:
+    """Converts a struct-of-arrays of contraction features to a list of plain-Python dicts."""
+    columns = {name: features[name].tolist() for name in CONTRACTION_FEATURE_FIELDS}
+    columns['is_good'] = is_good.tolist()
+    return [dict(zip(columns, row)) for row in zip(*columns.values())]
+
+
+# --- Parameter Sweeps ---
+
+SWEEP_STAT_FIELDS = (
+    'contraction_count', 'good_contraction_count',
+    'avg_duration_ms', 'min_duration_ms', 'max_duration_ms', 'total_time_under_tension_ms',
+    'avg_amplitude', 'max_amplitude',
+)
+
+# Thresholds are compared against the envelope in blocks of at most this many cells
+# (thresholds x samples), bounding the memory of a sweep whatever the grid size
+SWEEP_BLOCK_CELLS = 4 * 1024 * 1024
+
+
+def _find_bursts_per_threshold(envelope: np.ndarray, thresholds: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Vectorized _find_bursts for several thresholds at once.
+
+    Returns (rows, starts, ends): the threshold index, start and end of every burst,
+    ordered by threshold then by start. Uses (thresholds x samples) bytes of memory;
+    sweeps pass blocks of at most SWEEP_BLOCK_CELLS.
+    """
+    n_samples = len(envelope)
+    padded = np.zeros((len(thresholds), n_samples + 2), dtype=np.int8)
+    padded[:, 1:-1] = envelope[np.newaxis, :] > thresholds[:, np.newaxis]
+    edges = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    ends[ends == n_samples] = n_samples - 1
+    return rows, starts, ends
+
+
+def _reduce_by_key(ufunc: np.ufunc, values: np.ndarray, keys: np.ndarray, n_keys: int, fill: float) -> np.ndarray:
+    """Reduce `values` per key; `keys` must be sorted. Keys without values get `fill`."""
+    reduced = np.full(n_keys, fill, dtype=float)
+    if len(values):
+        first = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+        reduced[keys[first]] = ufunc.reduceat(values, first)
+    return reduced
+
+
+def _sweep_threshold_block(envelope: np.ndarray, rectified_signal: np.ndarray, thresholds: np.ndarray,
+                           min_duration_samples: np.ndarray, merge_threshold_samples: int, sampling_rate: int,
+                           mvc_amplitude_threshold: Optional[float]) -> Dict[str, np.ndarray]:
+    """SWEEP_STAT_FIELDS of every (threshold, min_duration) pair of one block of thresholds, keyed row-major."""
+    n_durations = len(min_duration_samples)
+    n_keys = len(thresholds) * n_durations
+    stats = {name: np.zeros(n_keys) for name in SWEEP_STAT_FIELDS}
+    rows, starts, ends = _find_bursts_per_threshold(envelope, thresholds)
+
+    # Every (min_duration, burst) pair that survives duration filtering, keyed by grid point.
+    # np.nonzero is row-major, so bursts stay sorted by key and then by start.
+    duration_index, burst_index = np.nonzero(
+        (ends - starts)[np.newaxis, :] >= min_duration_samples[:, np.newaxis])
+    keys = rows[burst_index] * n_durations + duration_index
+    order = np.argsort(keys, kind='stable')
+    keys, starts, ends = keys[order], starts[burst_index][order], ends[burst_index][order]
+
+    # Merge consecutive bursts of the same grid point separated by small gaps
+    new_group = np.ones(len(keys), dtype=bool)
+    if merge_threshold_samples > 0 and len(keys) > 1:
+        new_group[1:] = (keys[1:] != keys[:-1]) | ((starts[1:] - ends[:-1]) > merge_threshold_samples)
+    first = np.flatnonzero(new_group)
+    last = np.concatenate((first[1:] - 1, [len(keys) - 1])) if len(first) else first
+    group_keys, group_starts, group_ends = keys[first], starts[first], ends[last]
+
+    if len(group_keys):
+        durations = (group_ends - group_starts) * (1000.0 / sampling_rate)
+        mean_amplitudes = (_segment_reduce(np.add, rectified_signal, group_starts, group_ends + 1)
+                           / (group_ends - group_starts + 1))
+        max_amplitudes = _segment_reduce(np.maximum, rectified_signal, group_starts, group_ends + 1)
+
+        counts = np.bincount(group_keys, minlength=n_keys)
+        has_contractions = counts > 0
+        stats['contraction_count'] = counts
+        if mvc_amplitude_threshold is not None:
+            stats['good_contraction_count'] = np.bincount(
+                group_keys, weights=max_amplitudes >= mvc_amplitude_threshold, minlength=n_keys).astype(int)
+        total = np.bincount(group_keys, weights=durations, minlength=n_keys)
+        stats['total_time_under_tension_ms'] = total
+        stats['avg_duration_ms'] = np.divide(total, counts, out=np.zeros(n_keys), where=has_contractions)
+        stats['min_duration_ms'] = _reduce_by_key(np.minimum, durations, group_keys, n_keys, 0.0)
+        stats['max_duration_ms'] = _reduce_by_key(np.maximum, durations, group_keys, n_keys, 0.0)
+        stats['avg_amplitude'] = np.divide(np.bincount(group_keys, weights=mean_amplitudes, minlength=n_keys),
+                                           counts, out=np.zeros(n_keys), where=has_contractions)
+        stats['max_amplitude'] = _reduce_by_key(np.maximum, max_amplitudes, group_keys, n_keys, 0.0)
+    return stats
+
+
+def sweep_contraction_parameters(
+    signal: np.ndarray,
+    sampling_rate: int,
+    threshold_factors: List[float],
+    min_durations_ms: List[int],
+    smoothing_windows: List[int],
+    mvc_amplitude_threshold: Optional[float] = None,
+    merge_threshold_ms: int = 200,
+    context: Optional[SignalContext] = None
+) -> List[Dict]:
+    """
+    Evaluates contraction detection over a grid of detection parameters.
+
+    Produces, for every (smoothing_window, threshold_factor, min_duration_ms) combination,
+    the summary statistics analyze_contractions would report, without re-running it per
+    grid point. The signal is rectified once; each smoothing window is computed once with
+    a cumulative sum (and reused from the context's envelope cache); thresholds are compared
+    against it in 2-D blocks of at most SWEEP_BLOCK_CELLS cells, so memory does not grow with
+    the grid; and minimum-duration filtering, gap merging and per-contraction amplitudes are
+    computed for every (threshold, min_duration) pair of a block at once with key-grouped reductions.
+    The refractory period is not swept (it is disabled by default in analyze_contractions).
+
+    Args:
+        signal: A numpy array of the EMG signal.
+        sampling_rate: The sampling rate of the signal in Hz.
+        threshold_factors: Threshold factors to evaluate (fraction of max envelope amplitude).
+        min_durations_ms: Minimum contraction durations to evaluate, in milliseconds.
+        smoothing_windows: Smoothing window sizes to evaluate, in samples.
+        mvc_amplitude_threshold: Optional. If provided, 'good' contractions are counted.
+        merge_threshold_ms: Gap below which consecutive contractions are merged.
+        context: Optional shared SignalContext of `signal`.
+
+    Returns:
+        A list with one dict per grid point, holding the grid parameters and, under 'stats',
+        the SWEEP_STAT_FIELDS summary statistics.
+    """
+    if context is None:
+        context = SignalContext(signal, sampling_rate)
+    rectified_signal = context.rectified
+
+    factors = np.asarray(threshold_factors, dtype=float)
+    min_duration_samples = np.array([int((ms / 1000) * sampling_rate) for ms in min_durations_ms], dtype=np.intp)
+    merge_threshold_samples = int((merge_threshold_ms / 1000) * sampling_rate)
+    n_thresholds, n_durations = len(factors), len(min_duration_samples)
+    n_keys = n_thresholds * n_durations
+
+    results = []
+    for window in smoothing_windows:
+        stats = {
+            'contraction_count': np.zeros(n_keys, dtype=int),
+            'good_contraction_count': np.zeros(n_keys, dtype=int) if mvc_amplitude_threshold is not None else None,
+        }
+        stats.update({name: np.zeros(n_keys) for name in SWEEP_STAT_FIELDS[2:]})
+
+        envelope = context.envelope(window) if 0 < window <= len(signal) else None
+        if envelope is not None and n_keys and np.max(envelope) >= 1e-9:
+            thresholds = np.max(envelope) * factors
+            # Blocks of thresholds are evaluated one after the other: their grid points are disjoint
+            block_size = max(1, SWEEP_BLOCK_CELLS // (len(envelope) + 2))
+            for first in range(0, n_thresholds, block_size):
+                block_stats = _sweep_threshold_block(
+                    envelope, rectified_signal, thresholds[first:first + block_size], min_duration_samples,
+                    merge_threshold_samples, sampling_rate, mvc_amplitude_threshold)
+                key_slice = slice(first * n_durations, (first + block_size) * n_durations)
+                for name, values in block_stats.items():
+                    if stats[name] is not None:
+                        stats[name][key_slice] = values
+
+        columns = {name: (values.tolist() if values is not None else [None] * n_keys)
+                   for name, values in stats.items()}
+        for key in range(n_keys):
+            threshold_index, duration_index = divmod(key, n_durations)
+            results.append({
+                'smoothing_window': window,
+                'threshold_factor': float(factors[threshold_index]),
+                'min_duration_ms': min_durations_ms[duration_index],
+                'stats': {name: columns[name][key] for name in SWEEP_STAT_FIELDS},
+            })
+    return results
+
+
 # --- Amplitude-based Metrics ---
 
 def calculate_rms(signal: np.ndarray, sampling_rate: int) -> Dict[str, float]:
@@ -276,7 +735,9 @@ def calculate_rms(signal: np.ndarray, sampling_rate: int) -> Dict[str, float]:
     return {"rms": float(rms)}
 
 
-def calculate_mav(signal: np.ndarray, sampling_rate: int) -> Dict[str, float]:
+@uses_signal_context
+def calculate_mav(signal: np.ndarray, sampling_rate: int,
+                  context: Optional[SignalContext] = None) -> Dict[str, float]:
     """
     Calculates the Mean Absolute Value (MAV) of the signal.
 
@@ -294,13 +755,15 @@ def calculate_mav(signal: np.ndarray, sampling_rate: int) -> Dict[str, float]:
         signal: A numpy array of the EMG signal.
         sampling_rate: The sampling rate of the signal in Hz (not used for this
                      calculation but kept for consistent function signatures).
+        context: Optional shared SignalContext providing the rectified signal.
 
     Returns:
         A dictionary containing the calculated 'mav' value.
     """
     if len(signal) == 0:
         return {"mav": 0.0}
-    mav = np.mean(np.abs(signal))
+    rectified = context.rectified if context is not None else np.abs(signal)
+    mav = np.mean(rectified)
     return {"mav": float(mav)}
 
 
@@ -352,7 +815,9 @@ def _calculate_psd(signal: np.ndarray, sampling_rate: int) -> tuple[np.ndarray,
 
 # --- Frequency-based Metrics (for Fatigue Analysis) ---
 
-def calculate_mpf(signal: np.ndarray, sampling_rate: int) -> Dict[str, float]:
+@uses_signal_context
+def calculate_mpf(signal: np.ndarray, sampling_rate: int,
+                  context: Optional[SignalContext] = None) -> Dict[str, float]:
     """
     Calculates the Mean Power Frequency (MPF) of the signal.
 
@@ -371,11 +836,12 @@ def calculate_mpf(signal: np.ndarray, sampling_rate: int) -> Dict[str, float]:
     Args:
         signal: A numpy array of the EMG signal.
         sampling_rate: The sampling rate of the signal in Hz.
+        context: Optional shared SignalContext; its PSD is reused if provided.
 
     Returns:
         A dictionary containing the calculated 'mpf' value or None if calculation fails.
     """
-    freqs, psd = _calculate_psd(signal, sampling_rate)
+    freqs, psd = context.psd if context is not None else _calculate_psd(signal, sampling_rate)
     if freqs is None or psd is None:
         return {"mpf": None}
     
@@ -386,7 +852,9 @@ def calculate_mpf(signal: np.ndarray, sampling_rate: int) -> Dict[str, float]:
     return {"mpf": float(mpf)}
 
 
-def calculate_mdf(signal: np.ndarray, sampling_rate: int) -> Dict[str, float]:
+@uses_signal_context
+def calculate_mdf(signal: np.ndarray, sampling_rate: int,
+                  context: Optional[SignalContext] = None) -> Dict[str, float]:
     """
     Calculates the Median Frequency (MDF) of the signal.
 
@@ -405,11 +873,12 @@ def calculate_mdf(signal: np.ndarray, sampling_rate: int) -> Dict[str, float]:
     Args:
         signal: A numpy array of the EMG signal.
         sampling_rate: The sampling rate of the signal in Hz.
+        context: Optional shared SignalContext; its PSD is reused if provided.
 
     Returns:
         A dictionary containing the calculated 'mdf' value or None if calculation fails.
     """
-    freqs, psd = _calculate_psd(signal, sampling_rate)
+    freqs, psd = context.psd if context is not None else _calculate_psd(signal, sampling_rate)
     if freqs is None or psd is None:
         return {"mdf": None}
 
@@ -430,7 +899,9 @@ def calculate_mdf(signal: np.ndarray, sampling_rate: int) -> Dict[str, float]:
     return {"mdf": float(mdf)}
 
 
-def calculate_fatigue_index_fi_nsm5(signal: np.ndarray, sampling_rate: int) -> Dict[str, float]:
+@uses_signal_context
+def calculate_fatigue_index_fi_nsm5(signal: np.ndarray, sampling_rate: int,
+                                    context: Optional[SignalContext] = None) -> Dict[str, float]:
     """
     Calculates Dimitrov's Fatigue Index (FI_nsm5) using normalized spectral moments.
 
@@ -452,11 +923,12 @@ def calculate_fatigue_index_fi_nsm5(signal: np.ndarray, sampling_rate: int) -> D
     Args:
         signal: A numpy array of the EMG signal.
         sampling_rate: The sampling rate of the signal in Hz.
+        context: Optional shared SignalContext; its PSD is reused if provided.
 
     Returns:
         A dictionary containing the calculated 'fatigue_index_fi_nsm5' or None if calculation fails.
     """
-    freqs, psd = _calculate_psd(signal, sampling_rate)
+    freqs, psd = context.psd if context is not None else _calculate_psd(signal, sampling_rate)
     if freqs is None or psd is None:
         return {"fatigue_index_fi_nsm5": None}
 
@@ -484,6 +956,8 @@ def calculate_fatigue_index_fi_nsm5(signal: np.ndarray, sampling_rate: int) -> D
 
 # A registry of all available analysis functions
 # This allows the processor to discover and use them easily.
+# Functions decorated with @uses_signal_context receive the channel's shared
+# SignalContext, so intermediate products (PSD, rectified signal) are computed once.
 ANALYSIS_FUNCTIONS = {
     "rms": calculate_rms,
     "mav": calculate_mav,
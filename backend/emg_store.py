@@ -0,0 +1,246 @@
+"""
+GHOSTLY+ Raw EMG Store
+======================
+
+Binary, columnar storage for the raw EMG channels extracted from a C3D file.
+
+FILE LAYOUT:
+============
+    [8 bytes]  magic  b"GHSTEMG1"
+    [4 bytes]  little-endian uint32, length of the JSON header
+    [N bytes]  UTF-8 JSON header describing every channel
+    [padding]  zero bytes up to the next 64-byte boundary
+    [arrays]   one contiguous little-endian float32/float64 array per channel,
+               each starting on a 64-byte boundary
+
+The header stores, per channel: name, dtype, byte offset, sample count and
+sampling rate. The time axis is not stored; it is derived from the sampling rate.
+
+Channels are opened through ``np.memmap``, so reading one channel of a long
+session touches only that channel's pages and never parses the whole file.
+Results written before this format existed (``*_raw_emg.json``) remain readable.
+
+The detected contractions of each channel are persisted next to the raw data as
+a column table (``*_result_contractions.npz``), one array per feature, so they can
+be rescored with vectorized comparisons instead of walking a list of dicts.
+"""
+
+import os
+import json
+import uuid
+import struct
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+MAGIC = b"GHSTEMG1"
+ALIGNMENT = 64
+SUPPORTED_DTYPES = ("<f4", "<f8")
+
+RAW_EMG_BINARY_SUFFIX = "_result_raw_emg.bin"
+RAW_EMG_LEGACY_SUFFIX = "_result_raw_emg.json"
+CONTRACTIONS_SUFFIX = "_result_contractions.npz"
+
+
+def temporary_path(path: Path) -> Path:
+    """A unique sibling path to write to before an atomic os.replace onto `path`."""
+    return path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+
+
+def _align(offset: int) -> int:
+    """Round an offset up to the next ALIGNMENT boundary."""
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def raw_emg_paths(results_dir: Path, result_id: str) -> Dict[str, Path]:
+    """Return the binary and legacy JSON raw EMG paths for a result."""
+    return {
+        'binary': results_dir / f"{result_id}{RAW_EMG_BINARY_SUFFIX}",
+        'legacy': results_dir / f"{result_id}{RAW_EMG_LEGACY_SUFFIX}",
+    }
+
+
+class RawEMGStore:
+    """Read access to the raw EMG channels of one processed result."""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._legacy = self.path.suffix == '.json'
+        self._header: Optional[Dict] = None
+        self._legacy_data: Optional[Dict[str, Dict]] = None
+
+    # --- Writing ---
+
+    @classmethod
+    def write(cls, path: Union[str, Path], emg_data: Dict[str, Dict]) -> "RawEMGStore":
+        """
+        Write EMG channels to a binary store.
+
+        Args:
+            path: Destination file path.
+            emg_data: Mapping of channel name to a dict holding 'data' (array-like)
+                      and 'sampling_rate', as produced by GHOSTLYC3DProcessor.
+
+        Returns:
+            A RawEMGStore opened on the written file.
+        """
+        path = Path(path)
+        arrays = {}
+        for name, channel in emg_data.items():
+            signal = np.asarray(channel['data'])
+            dtype = signal.dtype.newbyteorder('<') if signal.dtype.kind == 'f' else None
+            if dtype is None or dtype.str not in SUPPORTED_DTYPES:
+                dtype = np.dtype('<f8')
+            arrays[name] = (np.ascontiguousarray(signal, dtype=dtype), float(channel['sampling_rate']))
+
+        # The header size depends on the offsets it contains, so lay out the data
+        # relative to a provisional header size and grow it until it fits.
+        data_start = ALIGNMENT
+        while True:
+            channels = []
+            offset = data_start
+            for name, (signal, sampling_rate) in arrays.items():
+                channels.append({
+                    'name': name,
+                    'dtype': signal.dtype.str,
+                    'offset': offset,
+                    'length': int(signal.size),
+                    'sampling_rate': sampling_rate,
+                })
+                offset = _align(offset + signal.nbytes)
+            header = json.dumps({'version': 1, 'channels': channels}).encode('utf-8')
+            needed = _align(len(MAGIC) + 4 + len(header))
+            if needed <= data_start:
+                break
+            data_start = needed
+
+        tmp_path = temporary_path(path)
+        with open(tmp_path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack('<I', len(header)))
+            f.write(header)
+            for channel, (signal, _) in zip(channels, arrays.values()):
+                f.write(b'\0' * (channel['offset'] - f.tell()))
+                f.write(signal.tobytes())
+        os.replace(tmp_path, path)
+        return cls(path)
+
+    # --- Reading ---
+
+    @classmethod
+    def open(cls, results_dir: Path, result_id: str) -> Optional["RawEMGStore"]:
+        """Open the raw EMG store of a result, preferring the binary format."""
+        paths = raw_emg_paths(results_dir, result_id)
+        if paths['binary'].exists():
+            return cls(paths['binary'])
+        if paths['legacy'].exists():
+            return cls(paths['legacy'])
+        return None
+
+    def _load_header(self) -> Dict:
+        if self._header is None:
+            if self._legacy:
+                self._header = self._load_legacy_header()
+            else:
+                with open(self.path, 'rb') as f:
+                    magic = f.read(len(MAGIC))
+                    if magic != MAGIC:
+                        raise ValueError(f"Not a raw EMG store: {self.path}")
+                    (header_len,) = struct.unpack('<I', f.read(4))
+                    header = json.loads(f.read(header_len).decode('utf-8'))
+                self._header = {c['name']: c for c in header['channels']}
+        return self._header
+
+    def _load_legacy_header(self) -> Dict:
+        with open(self.path, 'r') as f:
+            raw = json.load(f)
+        self._legacy_data = {}
+        header = {}
+        for name, channel in raw.items():
+            signal = np.asarray(channel['data'], dtype=np.float64)
+            self._legacy_data[name] = signal
+            header[name] = {
+                'name': name,
+                'dtype': signal.dtype.str,
+                'length': int(signal.size),
+                'sampling_rate': float(channel['sampling_rate']),
+            }
+        return header
+
+    @property
+    def channels(self) -> List[str]:
+        """Names of all stored channels, in storage order."""
+        return list(self._load_header().keys())
+
+    def __contains__(self, channel: str) -> bool:
+        return channel in self._load_header()
+
+    def sampling_rate(self, channel: str) -> float:
+        return self._load_header()[channel]['sampling_rate']
+
+    def get_signal(self, channel: str) -> np.ndarray:
+        """Return a read-only view of one channel (memory-mapped for binary stores)."""
+        entry = self._load_header()[channel]
+        if self._legacy:
+            return self._legacy_data[channel]
+        if entry['length'] == 0:
+            return np.empty(0, dtype=entry['dtype'])
+        return np.memmap(self.path, dtype=np.dtype(entry['dtype']), mode='r',
+                         offset=entry['offset'], shape=(entry['length'],))
+
+    def get_time_axis(self, channel: str) -> np.ndarray:
+        """Derive the time axis (seconds) of a channel from its sampling rate."""
+        entry = self._load_header()[channel]
+        return np.arange(entry['length']) / entry['sampling_rate']
+
+    def get_channel(self, channel: str) -> Dict:
+        """Return one channel with its data, derived time axis and sampling rate."""
+        return {
+            'data': self.get_signal(channel),
+            'time_axis': self.get_time_axis(channel),
+            'sampling_rate': self.sampling_rate(channel),
+        }
+
+    def to_emg_data(self) -> Dict[str, Dict]:
+        """Return every channel in the processor's emg_data layout (no time axis)."""
+        return {
+            name: {'data': self.get_signal(name), 'sampling_rate': self.sampling_rate(name)}
+            for name in self.channels
+        }
+
+
+# --- Contraction Tables ---
+
+def contraction_table_path(results_dir: Path, result_id: str) -> Path:
+    return results_dir / f"{result_id}{CONTRACTIONS_SUFFIX}"
+
+
+def save_contraction_tables(path: Union[str, Path], tables: Dict[str, Dict[str, np.ndarray]]) -> None:
+    """
+    Persist per-channel contraction tables as one .npz archive.
+
+    Args:
+        path: Destination file path.
+        tables: Mapping of base channel name to a struct-of-arrays contraction table.
+    """
+    path = Path(path)
+    columns = {
+        f"{channel}.{column}": np.asarray(values)
+        for channel, table in tables.items()
+        for column, values in table.items()
+    }
+    tmp_path = temporary_path(path)
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **columns)
+    os.replace(tmp_path, path)
+
+
+def load_contraction_tables(path: Union[str, Path]) -> Dict[str, Dict[str, np.ndarray]]:
+    """Load per-channel contraction tables written by save_contraction_tables."""
+    tables: Dict[str, Dict[str, np.ndarray]] = {}
+    with np.load(path) as archive:
+        for key in archive.files:
+            channel, column = key.rsplit('.', 1)
+            tables.setdefault(channel, {})[column] = archive[key]
+    return tables
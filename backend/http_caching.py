@@ -0,0 +1,209 @@
+"""
+GHOSTLY+ HTTP Caching
+=====================
+
+Validators and cache headers for result-derived responses, so that browsers
+and the nginx tier can reuse bodies that have not changed.
+
+ETAGS:
+======
+Every stored result has a version: the SHA-256 of its result JSON, kept in the
+results index (result_sha256) and changed only by /recalculate-scores. The
+strong ETag of a response is derived from that version plus whatever else
+selects the body (channel, window, format), so a conditional GET
+(If-None-Match) is answered with 304 from the index alone, before any file is
+read or any plot is rendered.
+
+COMPRESSION:
+============
+JSON bodies are compressed by CompressionMiddleware with the coding negotiated
+from Accept-Encoding: zstd when the optional zstandard package is installed and
+the client accepts it, otherwise gzip. Binary channel data (served in byte
+ranges), images and NDJSON streams (whose lines must reach the client as they
+are produced) are sent uncompressed. A compressed body is a different
+representation, so EncodedETagMiddleware gives it its own strong ETag
+("<tag>-gzip", "<tag>-zstd"); If-None-Match accepts every form.
+
+CACHE-CONTROL:
+==============
+- Results and channel data: ``no-cache`` (may be stored, revalidated on use).
+- Plots and reports requested for a given version (``?version=``): immutable
+  for a year, since a new version is rendered to a new file.
+"""
+
+import zlib
+import hashlib
+from typing import Dict, Optional, Sequence
+
+from fastapi import Request
+from fastapi.responses import Response
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import zstandard
+except ImportError:  # zstd responses are optional
+    zstandard = None
+
+REVALIDATE = "no-cache"
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+# Content codings of CompressionMiddleware, in order of preference
+CONTENT_CODINGS = ("zstd", "gzip") if zstandard is not None else ("gzip",)
+ZSTD_LEVEL = 3
+
+
+def result_version(result_json: bytes) -> str:
+    """Version of a stored result: the SHA-256 hex digest of its JSON."""
+    return hashlib.sha256(result_json).hexdigest()
+
+
+def make_etag(version: str, *selectors: object) -> str:
+    """Strong ETag of a response derived from a result version and what selects the body."""
+    if not selectors:
+        return f'"{version[:32]}"'
+    digest = hashlib.sha256('\x1f'.join([version, *map(str, selectors)]).encode('utf-8')).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def _opaque_tag(tag: str) -> str:
+    tag = tag.strip()
+    if tag.startswith('W/'):
+        tag = tag[2:]  # If-None-Match uses the weak comparison
+    for coding in ("gzip", "zstd"):
+        if tag.endswith(f'-{coding}"'):
+            return tag[:-len(coding) - 2] + '"'
+    return tag
+
+
+def matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match lists `etag` (in any content coding)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    return any(_opaque_tag(tag) == etag for tag in header.split(','))
+
+
+def cache_headers(etag: str, cache_control: str = REVALIDATE, **extra: str) -> Dict[str, str]:
+    return {"ETag": etag, "Cache-Control": cache_control, **extra}
+
+
+def not_modified(headers: Dict[str, str]) -> Response:
+    return Response(status_code=304, headers=headers)
+
+
+def negotiate_coding(accept_encoding: str) -> Optional[str]:
+    """The preferred content coding of CONTENT_CODINGS that an Accept-Encoding header allows, if any."""
+    accepted = {}
+    for item in accept_encoding.split(','):
+        coding, *params = [part.strip() for part in item.split(';')]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding.lower()] = quality
+    return next((coding for coding in CONTENT_CODINGS if accepted.get(coding, 0.0) > 0), None)
+
+
+def _compressor(coding: str, compresslevel: int):
+    """An object with compress(data) and flush() for one response body."""
+    if coding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+    return zlib.compressobj(compresslevel, zlib.DEFLATED, zlib.MAX_WBITS | 16)  # gzip container
+
+
+class CompressionMiddleware:
+    """
+    Compresses response bodies with the coding negotiated from Accept-Encoding (zstd or gzip).
+
+    Bodies of `excluded_content_types`, bodies that already have a Content-Encoding and
+    single-message bodies under `minimum_size` bytes are sent unchanged. Streamed bodies
+    are compressed chunk by chunk as they are sent.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, compresslevel: int = 6,
+                 excluded_content_types: Sequence[str] = ()):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compresslevel = compresslevel
+        self.excluded_content_types = tuple(excluded_content_types)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        coding = negotiate_coding(Headers(scope=scope).get("accept-encoding", "")) if scope["type"] == "http" else None
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        compressor = None
+        passthrough = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "").split(';')[0].strip().lower()
+                passthrough = "content-encoding" in headers or content_type in self.excluded_content_types
+                if passthrough:
+                    await send(message)
+                else:
+                    start = message  # sent with the first body message, once the size is known
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body, more_body = message.get("body", b""), message.get("more_body", False)
+            if compressor is None:
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                compressor = _compressor(coding, self.compresslevel)
+                headers = MutableHeaders(raw=start["headers"])
+                headers["Content-Encoding"] = coding
+                headers.add_vary_header("Accept-Encoding")
+                if more_body:
+                    del headers["Content-Length"]
+                else:
+                    body = compressor.compress(body) + compressor.flush()
+                    headers["Content-Length"] = str(len(body))
+                    await send(start)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                await send(start)
+            chunk = compressor.compress(body)
+            if not more_body:
+                chunk += compressor.flush()
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+
+class EncodedETagMiddleware:
+    """Gives content-encoded responses a distinct strong ETag; install outside CompressionMiddleware."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_etag(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message["headers"])
+                etag: Optional[str] = headers.get("etag")
+                if etag and "content-encoding" in headers and etag.endswith('"'):
+                    headers["etag"] = etag[:-1] + f'-{headers["content-encoding"]}"'
+            await send(message)
+
+        await self.app(scope, receive, send_with_etag)
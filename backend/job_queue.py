@@ -0,0 +1,149 @@
+"""
+GHOSTLY+ Processing Job Queue
+=============================
+
+Bounded queue of background processing jobs, for clients that should not
+hold an HTTP request open while a file is analyzed (``/upload?async=true``).
+
+LIFECYCLE:
+==========
+    create()  -> 'queued'   (counts toward capacity from the moment the request is accepted)
+    run()     -> 'running'  (on one of the local worker threads)
+              -> 'succeeded' with a result, or 'failed' with an error
+    finish()  -> 'succeeded' / 'failed' without running (e.g., a cache hit or a bad upload)
+
+At most ``max_workers + max_queued`` jobs are queued or running; create()
+raises JobQueueFull beyond that, with a Retry-After estimate from the recent
+job durations. Finished jobs are kept (oldest dropped first) up to
+``max_retained`` so clients can fetch their results.
+"""
+
+import math
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+
+class JobQueueFull(Exception):
+    """Raised when the queue is at capacity; retry_after is a suggested wait in seconds."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Job queue is full, retry after {retry_after} s")
+        self.retry_after = retry_after
+
+
+class Job:
+    """State, per-stage timings (seconds) and outcome of one processing job."""
+
+    def __init__(self):
+        self.job_id = str(uuid.uuid4())
+        self.state = QUEUED
+        self.created_at = time.time()
+        self.submitted_at: Optional[float] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.timings: Dict[str, float] = {}
+        self.result: Any = None
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> Dict:
+        def iso(timestamp):
+            return datetime.fromtimestamp(timestamp).isoformat() if timestamp is not None else None
+        return {
+            'job_id': self.job_id,
+            'state': self.state,
+            'created_at': iso(self.created_at),
+            'started_at': iso(self.started_at),
+            'finished_at': iso(self.finished_at),
+            'timings': dict(self.timings),
+            'result': self.result,
+            'error': self.error,
+        }
+
+
+class JobQueue:
+    """Bounded queue of jobs run on a local pool of worker threads."""
+
+    def __init__(self, max_workers: int = 2, max_queued: int = 32, max_retained: int = 1000):
+        self.max_workers = max_workers
+        self.capacity = max_workers + max_queued
+        self.max_retained = max_retained
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ghostly-job")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._active = 0
+        self._avg_duration: Optional[float] = None  # moving average of run times, for Retry-After
+        self._lock = threading.Lock()
+
+    def create(self) -> Job:
+        """Accept a new job, or raise JobQueueFull when at capacity."""
+        with self._lock:
+            if self._active >= self.capacity:
+                raise JobQueueFull(self._retry_after())
+            job = Job()
+            self._active += 1
+            self._jobs[job.job_id] = job
+            return job
+
+    def run(self, job: Job, fn: Callable, *args, **kwargs) -> None:
+        """
+        Run `fn(*args, timings=job.timings, **kwargs)` on a worker; its return value becomes the
+        job result. `fn` may record its own stage durations in the timings dict.
+        """
+        job.submitted_at = time.time()
+        self._executor.submit(self._execute, job, fn, args, kwargs)
+
+    def finish(self, job: Job, result: Any = None, error: Optional[str] = None) -> None:
+        """Complete a job without running it."""
+        job.started_at = job.started_at or time.time()
+        self._complete(job, result, error)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def retry_after(self) -> int:
+        with self._lock:
+            return self._retry_after()
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _retry_after(self) -> int:
+        # Time for the jobs ahead to drain through the workers; at least a second
+        per_job = self._avg_duration if self._avg_duration is not None else 1.0
+        return max(1, math.ceil(per_job * self._active / self.max_workers))
+
+    def _execute(self, job: Job, fn: Callable, args: tuple, kwargs: Dict) -> None:
+        job.started_at = time.time()
+        job.timings['queued'] = job.started_at - job.submitted_at
+        job.state = RUNNING
+        try:
+            result, error = fn(*args, timings=job.timings, **kwargs), None
+        except Exception as e:
+            result, error = None, str(e)
+        self._complete(job, result, error, ran=True)
+
+    def _complete(self, job: Job, result: Any, error: Optional[str], ran: bool = False) -> None:
+        job.finished_at = time.time()
+        job.result, job.error = result, error
+        job.state = FAILED if error is not None else SUCCEEDED
+        with self._lock:
+            self._active -= 1
+            if ran:
+                duration = job.finished_at - job.started_at
+                self._avg_duration = (duration if self._avg_duration is None
+                                      else 0.8 * self._avg_duration + 0.2 * duration)
+            # Drop the oldest finished jobs beyond the retention limit
+            excess = len(self._jobs) - self.max_retained
+            if excess > 0:
+                finished = [job_id for job_id, old in self._jobs.items() if old.finished_at is not None]
+                for job_id in finished[:excess]:
+                    del self._jobs[job_id]
@@ -24,6 +24,13 @@ class Contraction(BaseModel):
     mean_amplitude: float
     max_amplitude: float
     is_good: Optional[bool] = None # New field
+    is_long: Optional[bool] = None # duration >= contraction_duration_threshold
+    # Batched shape/timing features (absent from results produced before they existed)
+    rms: Optional[float] = None
+    area_under_envelope: Optional[float] = None # amplitude * seconds
+    time_to_peak_ms: Optional[float] = None
+    rise_time_ms: Optional[float] = None # 10% -> 90% of envelope peak
+    fall_time_ms: Optional[float] = None # 90% -> 10% of envelope peak
 
 class ChannelAnalytics(BaseModel):
     """Analytics for a single EMG channel."""
@@ -45,6 +52,15 @@ class ChannelAnalytics(BaseModel):
     # New fields for game stats
     mvc_threshold_actual_value: Optional[float] = None
     good_contraction_count: Optional[int] = None
+    expected_contractions: Optional[int] = None
+
+    # Short/long classification against contraction_duration_threshold
+    long_contraction_count: Optional[int] = None
+    short_contraction_count: Optional[int] = None
+    good_long_contraction_count: Optional[int] = None
+    good_short_contraction_count: Optional[int] = None
+    expected_long_contractions: Optional[int] = None
+    expected_short_contractions: Optional[int] = None
 
 
 class GameSessionParameters(BaseModel):
@@ -102,6 +118,7 @@ class EMGAnalysisResult(BaseModel):
     user_id: Optional[str] = None
     session_id: Optional[str] = None
     patient_id: Optional[str] = None
+    content_sha256: Optional[str] = None # SHA-256 of the uploaded C3D file (see upload_store.py)
 
 class EMGRawData(BaseModel):
     """Model for returning raw EMG data for a specific channel."""
@@ -110,4 +127,78 @@ class EMGRawData(BaseModel):
     data: List[float]
     time_axis: List[float]
     activated_data: Optional[List[float]] = None
-    contractions: Optional[List[Contraction]] = None # Will include is_good flag
\ No newline at end of file
+    contractions: Optional[List[Contraction]] = None # Will include is_good flag
+    # Set for windowed / decimated requests (start_ms, end_ms, max_points)
+    start_ms: Optional[float] = None
+    end_ms: Optional[float] = None
+    samples_per_bucket: Optional[int] = None # 1 = every sample; otherwise min/max of each bucket
+
+
+class SweepRequest(BaseModel):
+    """Grid of contraction detection parameters to evaluate on a stored result."""
+    threshold_factors: List[float] = Field(..., min_length=1, description="Threshold factors to evaluate")
+    min_durations_ms: List[int] = Field(..., min_length=1, description="Minimum contraction durations (ms) to evaluate")
+    smoothing_windows: List[int] = Field(..., min_length=1, description="Smoothing window sizes (samples) to evaluate")
+    channels: Optional[List[str]] = Field(None, description="Base channel names to sweep (default: all)")
+
+class SweepStats(BaseModel):
+    """Contraction summary statistics for one grid point."""
+    contraction_count: int = 0
+    good_contraction_count: Optional[int] = None
+    avg_duration_ms: float = 0.0
+    min_duration_ms: float = 0.0
+    max_duration_ms: float = 0.0
+    total_time_under_tension_ms: float = 0.0
+    avg_amplitude: float = 0.0
+    max_amplitude: float = 0.0
+
+class SweepPoint(BaseModel):
+    smoothing_window: int
+    threshold_factor: float
+    min_duration_ms: int
+    stats: SweepStats
+
+class ChannelSweep(BaseModel):
+    source_channel: str
+    mvc_threshold_actual_value: Optional[float] = None
+    grid: List[SweepPoint]
+
+class SweepResult(BaseModel):
+    """Model for a detection parameter sweep over a stored result."""
+    file_id: str
+    channels: Dict[str, ChannelSweep]
+
+class ResultQueryPage(BaseModel):
+    """One page of a result query; pass next_cursor back to get the following page."""
+    items: List[Dict[str, Any]]
+    next_cursor: Optional[str] = None
+
+class TrendPoint(BaseModel):
+    """Aggregated session metrics of one channel over one day or week."""
+    period_start: str  # ISO date; the Monday of the week for weekly trends
+    sessions: int
+    contraction_count: int
+    good_contraction_count: int
+    good_contraction_ratio: Optional[float] = None  # over sessions scored against an MVC threshold
+    avg_rms: Optional[float] = None
+    avg_mav: Optional[float] = None
+    avg_mpf: Optional[float] = None
+    avg_mdf: Optional[float] = None
+    avg_fatigue_index_fi_nsm5: Optional[float] = None
+
+class PatientTrends(BaseModel):
+    """Model for the longitudinal trends of a patient, per channel."""
+    patient_id: str
+    period: str
+    channels: Dict[str, List[TrendPoint]]
+
+class JobStatus(BaseModel):
+    """Model for the state of an asynchronous processing job."""
+    job_id: str
+    state: str  # queued, running, succeeded or failed
+    created_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    timings: Dict[str, float] = {}  # seconds per stage (upload, queued, signals, contractions, scores, store)
+    result: Optional[EMGAnalysisResult] = None
+    error: Optional[str] = None
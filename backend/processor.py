@@ -19,13 +19,25 @@ ASSUMPTIONS & PARAMETERS:
 """
 
 import os
+import copy
+import time
+import pickle
+import threading
 import numpy as np
 import ezc3d
+from collections import OrderedDict
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Callable, Dict, List, Optional, Any, Tuple
 import json
-from .emg_analysis import ANALYSIS_FUNCTIONS, analyze_contractions
-from .models import GameSessionParameters
+from .emg_analysis import (
+    ANALYSIS_FUNCTIONS, SignalContext, contraction_table_from_list, score_contractions,
+    sweep_contraction_parameters
+)
+from .channel_executor import analyze_channel, analyze_channels_in_processes
+from .models import GameSessionParameters, DEFAULT_SMOOTHING_WINDOW
+from .emg_store import RawEMGStore
+from .analysis_cache import AnalysisCache
 
 # Default parameters for EMG processing
 DEFAULT_SAMPLING_RATE = 1000  # Hz
@@ -33,6 +45,11 @@ DEFAULT_THRESHOLD_FACTOR = 0.3  # 30% of max amplitude
 DEFAULT_MIN_DURATION_MS = 50  # Minimum contraction duration in ms
 DEFAULT_SMOOTHING_WINDOW = 25  # Smoothing window size in samples
 
+# Channel analytics executors: in the calling thread, or one worker process per base channel
+EXECUTOR_SERIAL = 'serial'
+EXECUTOR_PROCESS = 'process'
+EXECUTOR_MODES = (EXECUTOR_SERIAL, EXECUTOR_PROCESS)
+
 # Visualization settings
 EMG_COLOR = '#1abc9c'  # Teal color for EMG signal
 CONTRACTION_COLOR = '#3498db'  # Blue color for contractions
@@ -42,10 +59,151 @@ ACTIVITY_COLORS = {
 }
 
 
+class SignalContextCache:
+    """
+    SignalContexts of recently used results, keyed by result ID.
+
+    Keeps the rectified signals, envelopes and PSDs of a processed result alive between
+    requests (recalculation, sweeps, plots), so they are not recomputed each time.
+    The least recently used result is evicted once more than `max_results` are held or
+    their memoized products (SignalContext.nbytes) exceed `max_bytes`. Products grow while
+    a result is in use, so the budget is enforced whenever a result is looked up or stored.
+    """
+
+    def __init__(self, max_results: int = 8, max_bytes: int = 256 * 1024 * 1024):
+        self.max_results = max_results
+        self.max_bytes = max_bytes
+        self._contexts: "OrderedDict[str, Dict[str, SignalContext]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, result_id: str) -> Dict[str, SignalContext]:
+        """Return the (possibly empty) channel -> SignalContext dict of a result."""
+        with self._lock:
+            return self._insert(result_id, self._contexts.pop(result_id, {}))
+
+    def put(self, result_id: str, contexts: Dict[str, SignalContext]) -> None:
+        with self._lock:
+            self._contexts.pop(result_id, None)
+            self._insert(result_id, contexts)
+
+    def _insert(self, result_id: str, contexts: Dict[str, SignalContext]) -> Dict[str, SignalContext]:
+        self._contexts[result_id] = contexts
+        # The result just inserted is kept, whatever its size
+        while len(self._contexts) > 1 and (len(self._contexts) > self.max_results
+                                           or self._nbytes() > self.max_bytes):
+            self._contexts.popitem(last=False)
+        return contexts
+
+    def _nbytes(self) -> int:
+        return sum(context.nbytes for contexts in self._contexts.values() for context in contexts.values())
+
+    @property
+    def nbytes(self) -> int:
+        with self._lock:
+            return self._nbytes()
+
+    def discard(self, result_id: str) -> None:
+        with self._lock:
+            self._contexts.pop(result_id, None)
+
+    def __contains__(self, result_id: str) -> bool:
+        return result_id in self._contexts
+
+
+class ParsedC3D:
+    """A parsed C3D file: the ezc3d object, its game metadata and its extracted EMG channels."""
+
+    def __init__(self, file_path: str, c3d, metadata: Dict, emg_data: Dict[str, Dict]):
+        self.file_path = file_path
+        self.c3d = c3d
+        self.metadata = metadata
+        self.emg_data = emg_data
+        # The EMG channels are views into the analog block, so the data blocks hold all the memory
+        self.nbytes = sum(block.nbytes for block in c3d['data'].values() if isinstance(block, np.ndarray))
+
+    @classmethod
+    def load(cls, file_path: str) -> "ParsedC3D":
+        processor = GHOSTLYC3DProcessor(file_path)
+        processor.load_file()
+        metadata = processor.extract_metadata()
+        return cls(file_path, processor.c3d, metadata, processor.extract_emg_data())
+
+
+class ParsedC3DCache:
+    """
+    Parsed C3D files of recently viewed results, keyed by upload: the content_sha256 of
+    a file in the upload store, or the result ID of a legacy upload (named after it).
+
+    Plots, reports and debug views of every result computed from one file share a single
+    parse of it.
+    Eviction is least recently used and bounded by the size of the parsed data blocks
+    (`max_bytes`); a file larger than the whole budget is returned but not kept.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, ParsedC3D]" = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[ParsedC3D]:
+        """Return the cached parse of an upload (marking it recently used), or None."""
+        with self._lock:
+            parsed = self._entries.get(key)
+            if parsed is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return parsed
+
+    def put(self, key: str, parsed: ParsedC3D) -> None:
+        with self._lock:
+            self._pop(key)
+            if parsed.nbytes > self.max_bytes:
+                return
+            self._entries[key] = parsed
+            self._nbytes += parsed.nbytes
+            while self._nbytes > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def get_or_parse(self, key: str, find_file: Callable[[], str]) -> ParsedC3D:
+        """Return the cached parse of an upload; on a miss, parse the file `find_file()` locates."""
+        parsed = self.get(key)
+        if parsed is None:
+            # Parse outside the lock so other uploads stay available meanwhile
+            parsed = ParsedC3D.load(str(find_file()))
+            self.put(key, parsed)
+        return parsed
+
+    def _pop(self, key: str) -> None:
+        parsed = self._entries.pop(key, None)
+        if parsed is not None:
+            self._nbytes -= parsed.nbytes
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self._pop(key)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'entries': len(self._entries), 'bytes': self._nbytes, 'max_bytes': self.max_bytes}
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+
 class GHOSTLYC3DProcessor:
     """Class for processing C3D files from the GHOSTLY game."""
 
-    def __init__(self, file_path: str, analysis_functions: Optional[Dict] = None):
+    def __init__(self, file_path: str, analysis_functions: Optional[Dict] = None,
+                 signal_contexts: Optional[Dict[str, SignalContext]] = None,
+                 executor: str = EXECUTOR_SERIAL, max_workers: Optional[int] = None):
         self.file_path = file_path
         self.c3d = None
         self.emg_data = {}
@@ -53,6 +211,20 @@ class GHOSTLYC3DProcessor:
         self.analytics = {}
         self.analysis_functions = analysis_functions if analysis_functions is not None else ANALYSIS_FUNCTIONS
         self.session_game_params_used: Optional[GameSessionParameters] = None
+        # Per-channel SignalContexts; pass a shared dict to reuse envelopes across processors
+        self.signal_contexts: Dict[str, SignalContext] = signal_contexts if signal_contexts is not None else {}
+        self.contraction_tables: Dict[str, Dict[str, np.ndarray]] = {}
+        # Smoothing window of the last contraction detection; plot overlays reuse its envelopes
+        self.smoothing_window = DEFAULT_SMOOTHING_WINDOW
+        # Binary store holding emg_data, when the signals came from (or went to) the analysis cache
+        self.raw_emg_store: Optional[RawEMGStore] = None
+        # Opt-in: analyze base channels in the shared worker process pool
+        if executor not in EXECUTOR_MODES:
+            raise ValueError(f"Unknown executor '{executor}', expected one of {EXECUTOR_MODES}")
+        self.executor = executor
+        self.max_workers = max_workers
+        # Durations (seconds) of the stages of the last process_file run
+        self.timings: Dict[str, float] = {}
 
     def load_file(self) -> None:
         """Load the C3D file using ezc3d library."""
@@ -61,6 +233,12 @@ class GHOSTLYC3DProcessor:
         except Exception as e:
             raise ValueError(f"Error loading C3D file: {str(e)}")
 
+    def use_parsed(self, parsed: ParsedC3D) -> None:
+        """Use an already parsed C3D file (e.g., from a ParsedC3DCache) instead of loading it again."""
+        self.c3d = parsed.c3d
+        self.game_metadata = dict(parsed.metadata)
+        self.emg_data = dict(parsed.emg_data)
+
     def extract_metadata(self) -> Dict:
         """Extract game metadata from the C3D file."""
         if not self.c3d:
@@ -141,21 +319,21 @@ class GHOSTLYC3DProcessor:
                 if rate_value and len(rate_value) > 0:
                     sampling_rate = float(rate_value[0])
 
-            # Extract each analog channel
+            # Extract each analog channel as a read-only view into the ezc3d analog block.
+            # No copy is made here; the time axis is derived on demand (see get_time_axis).
             for i in range(analog_data.shape[1]):
                 # Use the label if available, otherwise fall back to a default name like CH1, CH2, etc.
                 channel_name = labels[i].strip() if i < len(labels) else f"CH{i + 1}"
                 
                 try:
-                    signal_data = analog_data[0, i, :].flatten()
+                    signal_data = analog_data[0, i, :]
                     if signal_data.size == 0:
                         errors.append(f"No data for channel {channel_name}")
                         continue
 
-                    time_axis = np.arange(len(signal_data)) / sampling_rate
+                    signal_data.flags.writeable = False
                     emg_data[channel_name] = {
-                        'data': signal_data.tolist(),
-                        'time_axis': time_axis.tolist(),
+                        'data': signal_data,
                         'sampling_rate': sampling_rate
                     }
                 except IndexError:
@@ -174,6 +352,125 @@ class GHOSTLYC3DProcessor:
         except Exception as e:
             raise ValueError(f"An unexpected error occurred during EMG data extraction: {str(e)}")
 
+    def get_time_axis(self, channel: str) -> np.ndarray:
+        """Return the time axis (seconds) of a channel, derived from its sampling rate."""
+        channel_data = self.emg_data[channel]
+        return np.arange(len(channel_data['data'])) / channel_data['sampling_rate']
+
+    def get_signal_context(self, channel: str) -> SignalContext:
+        """Return the memoized SignalContext (rectified signal, PSD, envelopes) of a channel."""
+        if channel not in self.signal_contexts:
+            channel_data = self.emg_data[channel]
+            self.signal_contexts[channel] = SignalContext(
+                np.asarray(channel_data['data']), channel_data['sampling_rate'])
+        return self.signal_contexts[channel]
+
+    def get_envelope(self, channel: str, smoothing_window: int) -> np.ndarray:
+        """Return the cached moving-average envelope of a channel (e.g., for plot overlays)."""
+        return self.get_signal_context(channel).envelope(smoothing_window)
+
+    def get_base_names(self) -> List[str]:
+        """Unique base channel names (e.g., "CH1" from "CH1 Raw", "CH1 activated")."""
+        return sorted(set(
+            name.replace(' Raw', '').replace(' activated', '')
+            for name in self.emg_data.keys()
+        ))
+
+    def _contraction_channel(self, base_name: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Pick the signal used for contraction detection of a base channel.
+
+        Returns (channel name, note), preferring the activated signal, then the raw
+        signal, then the base name itself. The note explains any fallback.
+        """
+        if f"{base_name} activated" in self.emg_data:
+            return f"{base_name} activated", None
+        if f"{base_name} Raw" in self.emg_data:
+            return f"{base_name} Raw", "Used Raw signal for contractions (Activated not found)"
+        if base_name in self.emg_data:
+            return base_name, f"Used {base_name} signal for contractions"
+        return None, None
+
+    @staticmethod
+    def _channel_side(base_name: str, channel_index: int, session_params: GameSessionParameters) -> Optional[str]:
+        """
+        Return 'left' or 'right' for a channel.
+
+        Uses the muscle name from channel_muscle_mapping when it says left/right,
+        otherwise the GHOSTLY+ convention that the first channel is left, the second right.
+        """
+        muscle_name = (session_params.channel_muscle_mapping or {}).get(base_name, '').lower()
+        if 'left' in muscle_name:
+            return 'left'
+        if 'right' in muscle_name:
+            return 'right'
+        return {0: 'left', 1: 'right'}.get(channel_index)
+
+    def _score_channel(self,
+                       channel_analytics: Dict,
+                       contraction_table: Optional[Dict[str, np.ndarray]],
+                       mvc_threshold: Optional[float],
+                       session_params: GameSessionParameters,
+                       base_name: str,
+                       channel_index: int) -> None:
+        """
+        Score a channel's contractions against the MVC and duration thresholds (in place).
+
+        The comparisons run on the columnar contraction table; the per-contraction flags
+        are only written back to the contraction dicts for serialization.
+        """
+        contractions = channel_analytics.get('contractions') or []
+        if contraction_table is None or len(contraction_table['duration_ms']) != len(contractions):
+            contraction_table = contraction_table_from_list(contractions)
+
+        scores = score_contractions(contraction_table, mvc_threshold,
+                                    session_params.contraction_duration_threshold)
+        for flag in ('is_good', 'is_long'):
+            if scores[flag] is not None:
+                for contraction, value in zip(contractions, scores.pop(flag).tolist()):
+                    contraction[flag] = value
+            else:
+                scores.pop(flag)
+        channel_analytics.update(scores)
+
+        side = self._channel_side(base_name, channel_index, session_params)
+        if side is not None:
+            channel_analytics['expected_long_contractions'] = getattr(session_params, f'session_expected_long_{side}')
+            channel_analytics['expected_short_contractions'] = getattr(session_params, f'session_expected_short_{side}')
+
+    def _analyze_channels(self, channel_tasks: List[Dict], detection_params: Dict) -> List[Dict]:
+        """
+        Run the signal analysis of every base channel (see channel_executor.analyze_channel).
+
+        In process mode the channels fan out to the shared worker pool, with signals passed
+        through shared memory; the detection envelopes computed by the workers are stored in
+        this processor's SignalContexts. Falls back to serial analysis if the pool cannot be used.
+        """
+        if self.executor == EXECUTOR_PROCESS and len(channel_tasks) > 1:
+            channel_names = {name for task in channel_tasks
+                             for name in (task['raw_channel'], task['contraction_channel']) if name}
+            signals = {name: (np.asarray(self.emg_data[name]['data']), self.emg_data[name]['sampling_rate'])
+                       for name in channel_names}
+            try:
+                results, envelopes = analyze_channels_in_processes(
+                    channel_tasks, signals, self.analysis_functions, detection_params, self.max_workers)
+            except (BrokenProcessPool, pickle.PicklingError, AttributeError, OSError) as e:
+                print(f"Warning: Parallel channel analytics unavailable ({e}); analyzing channels serially")
+            else:
+                for channel, (window, envelope) in envelopes.items():
+                    self.get_signal_context(channel).store_envelope(window, envelope)
+                return results
+
+        return [
+            analyze_channel(
+                self.get_signal_context(task['raw_channel']) if task['raw_channel'] else None,
+                self.get_signal_context(task['contraction_channel']) if task['contraction_channel'] else None,
+                self.analysis_functions,
+                **detection_params
+            )
+            for task in channel_tasks
+        ]
+
     def calculate_analytics(self,
                            threshold_factor: float,
                            min_duration_ms: int,
@@ -192,9 +489,76 @@ class GHOSTLYC3DProcessor:
         Returns:
             Dictionary of analytics for each channel
         """
+        detections = self.detect_channels(threshold_factor, min_duration_ms, smoothing_window)
+        return self.score_channels(detections, session_params)
+
+    def detect_channels(self,
+                        threshold_factor: float,
+                        min_duration_ms: int,
+                        smoothing_window: int
+                       ) -> Dict[str, Dict]:
+        """
+        Run the signal analysis of every base channel, independent of any scoring parameter.
+
+        Contractions are detected without an MVC threshold; score_channels applies the
+        session's thresholds afterwards. The result is JSON-serializable (the contraction
+        tables are kept in self.contraction_tables), so it can be cached per file and
+        detection parameters.
+
+        Returns:
+            Dictionary with, for each base channel, the source channel names, the metric
+            results and errors, and the contraction statistics (or the detection error)
+        """
         if not self.emg_data:
             raise ValueError("No EMG data loaded. Call extract_emg_data() first.")
-        
+
+        # Shared intermediate products are only valid for the signals of this analysis
+        self.signal_contexts.clear()
+        self.contraction_tables = {}
+        self.smoothing_window = smoothing_window
+
+        # Find unique base channel names (e.g., "CH1" from "CH1 Raw", "CH1 activated")
+        base_names = self.get_base_names()
+
+        # The signal analysis of a channel does not depend on the other channels,
+        # so it can run serially or in worker processes.
+        channel_tasks = []
+        for base_name in base_names:
+            raw_channel_name = f"{base_name} Raw"
+            contraction_channel_name, source_note = self._contraction_channel(base_name)
+            channel_tasks.append({
+                'raw_channel': raw_channel_name if raw_channel_name in self.emg_data else None,
+                'contraction_channel': contraction_channel_name,
+                'contractions_source': source_note,
+            })
+
+        channel_results = self._analyze_channels(channel_tasks, {
+            'threshold_factor': threshold_factor,
+            'min_duration_ms': min_duration_ms,
+            'smoothing_window': smoothing_window,
+        })
+
+        detections = {}
+        for base_name, task, channel_result in zip(base_names, channel_tasks, channel_results):
+            contraction_stats = channel_result['contraction_stats']
+            if contraction_stats is not None:
+                contraction_table = contraction_stats.pop('contraction_table', None)
+                if contraction_table is not None:
+                    self.contraction_tables[base_name] = contraction_table
+            detections[base_name] = {**task, **channel_result}
+        return detections
+
+    def score_channels(self, detections: Dict[str, Dict], session_params: GameSessionParameters) -> Dict:
+        """
+        Score detected contractions against the session parameters.
+
+        Determines each channel's MVC threshold, classifies its contractions and initializes
+        missing per-channel MVC values and threshold percentages (updates session_params).
+        `detections` (from detect_channels) is not modified.
+
+        Returns:
+            Dictionary of analytics for each channel
+        """
         # Initialize per-muscle MVC values if they don't exist
         if not hasattr(session_params, 'session_mvc_values') or not session_params.session_mvc_values:
             session_params.session_mvc_values = {}
@@ -208,15 +572,8 @@ class GHOSTLYC3DProcessor:
             global_mvc_threshold = session_params.session_mvc_value * (session_params.session_mvc_threshold_percentage / 100.0)
         
         all_analytics = {}
-        
-        # Find unique base channel names (e.g., "CH1" from "CH1 Raw", "CH1 activated")
-        base_names = sorted(list(set(
-            name.replace(' Raw', '').replace(' activated', '') 
-            for name in self.emg_data.keys()
-        )))
-        
-        # Process each base channel
-        for i, base_name in enumerate(base_names):
+
+        for i, (base_name, detection) in enumerate(detections.items()):
             channel_analytics = {}
             channel_errors = {}
             
@@ -258,50 +615,22 @@ class GHOSTLYC3DProcessor:
                 actual_mvc_threshold = global_mvc_threshold
             
             # --- Full-Signal Analysis on RAW data ---
-            raw_channel_name = f"{base_name} Raw"
-            if raw_channel_name in self.emg_data:
-                raw_signal = np.array(self.emg_data[raw_channel_name]['data'])
-                sampling_rate = self.emg_data[raw_channel_name]['sampling_rate']
-                
-                # Apply all registered analysis functions to the raw signal
-                for func_name, func in self.analysis_functions.items():
-                    try:
-                        result = func(raw_signal, sampling_rate)
-                        channel_analytics.update(result)
-                    except Exception as e:
-                        channel_errors[func_name] = f"Analysis failed: {str(e)}"
-                        channel_analytics[func_name] = None
+            channel_analytics.update(detection['analytics'])
+            channel_errors.update(detection['errors'])
 
             # --- Contraction Analysis ---
-            # Prefer activated signal for contraction analysis, fall back to raw if needed
-            signal_for_contraction = None
-            activated_channel_name = f"{base_name} activated"
-            
-            if activated_channel_name in self.emg_data:
-                signal_for_contraction = np.array(self.emg_data[activated_channel_name]['data'])
-                sampling_rate = self.emg_data[activated_channel_name]['sampling_rate']
-            elif raw_channel_name in self.emg_data:
-                signal_for_contraction = np.array(self.emg_data[raw_channel_name]['data'])
-                sampling_rate = self.emg_data[raw_channel_name]['sampling_rate']
-                channel_errors['contractions_source'] = "Used Raw signal for contractions (Activated not found)"
-            else:
-                # Try the base name itself as a fallback
-                if base_name in self.emg_data:
-                    signal_for_contraction = np.array(self.emg_data[base_name]['data'])
-                    sampling_rate = self.emg_data[base_name]['sampling_rate']
-                    channel_errors['contractions_source'] = f"Used {base_name} signal for contractions"
+            if detection['contractions_source']:
+                channel_errors['contractions_source'] = detection['contractions_source']
 
-            if signal_for_contraction is not None:
+            if detection['contraction_channel'] is not None:
                 try:
-                    contraction_stats = analyze_contractions(
-                        signal=signal_for_contraction,
-                        sampling_rate=sampling_rate,
-                        threshold_factor=threshold_factor,
-                        min_duration_ms=min_duration_ms,
-                        smoothing_window=smoothing_window,
-                        mvc_amplitude_threshold=actual_mvc_threshold
-                    )
+                    if detection['contraction_error'] is not None:
+                        raise RuntimeError(detection['contraction_error'])
+                    contraction_stats = copy.deepcopy(detection['contraction_stats'])
                     channel_analytics.update(contraction_stats)
+                    channel_analytics['mvc_threshold_actual_value'] = actual_mvc_threshold
+                    self._score_channel(channel_analytics, self.contraction_tables.get(base_name),
+                                        actual_mvc_threshold, session_params, base_name, i)
                     
                     # Initialize MVC value to max amplitude if not provided
                     max_amplitude = contraction_stats.get('max_amplitude', 0.0)
@@ -382,15 +711,76 @@ class GHOSTLYC3DProcessor:
         self.analytics = all_analytics
         return all_analytics
 
+    def sweep_detection_parameters(self,
+                                   threshold_factors: List[float],
+                                   min_durations_ms: List[int],
+                                   smoothing_windows: List[int],
+                                   mvc_thresholds: Optional[Dict[str, Optional[float]]] = None,
+                                   channels: Optional[List[str]] = None
+                                  ) -> Dict[str, Dict]:
+        """
+        Evaluate contraction detection over a grid of parameters for each base channel.
+
+        Args:
+            threshold_factors: Threshold factors to evaluate
+            min_durations_ms: Minimum contraction durations (ms) to evaluate
+            smoothing_windows: Smoothing window sizes (samples) to evaluate
+            mvc_thresholds: Optional per-channel MVC amplitude thresholds for 'good' counts
+            channels: Optional subset of base channel names (default: all)
+
+        Returns:
+            Dictionary of {'source_channel', 'grid'} for each base channel
+        """
+        if not self.emg_data:
+            raise ValueError("No EMG data loaded. Call extract_emg_data() first.")
+
+        mvc_thresholds = mvc_thresholds or {}
+        sweeps = {}
+        for base_name in self.get_base_names():
+            if channels is not None and base_name not in channels:
+                continue
+            contraction_channel_name, _ = self._contraction_channel(base_name)
+            if contraction_channel_name is None:
+                continue
+            context = self.get_signal_context(contraction_channel_name)
+            sweeps[base_name] = {
+                'source_channel': contraction_channel_name,
+                'grid': sweep_contraction_parameters(
+                    signal=context.signal,
+                    sampling_rate=context.sampling_rate,
+                    threshold_factors=threshold_factors,
+                    min_durations_ms=min_durations_ms,
+                    smoothing_windows=smoothing_windows,
+                    mvc_amplitude_threshold=mvc_thresholds.get(base_name),
+                    context=context
+                ),
+            }
+        return sweeps
+
     def process_file(self,
                      processing_opts,
-                     session_game_params: GameSessionParameters
+                     session_game_params: GameSessionParameters,
+                     cache: Optional[AnalysisCache] = None,
+                     cache_keys: Optional[Dict[str, str]] = None
                     ) -> Dict:
         """
         Process the C3D file and return complete analysis results.
+
+        With an AnalysisCache and this request's keys (AnalysisCache.keys_for), parsed signals
+        and detected contractions are reused from earlier runs on the same file; only the
+        scoring is always recomputed. Stage durations are recorded in self.timings.
         """
-        self.load_file()
-        c3d_metadata = self.extract_metadata()
+        use_cache = cache is not None and cache_keys is not None
+        stage_start = time.perf_counter()
+
+        cached_signals = cache.load_signals(cache_keys['signals']) if use_cache else None
+        if cached_signals is not None:
+            self.raw_emg_store, c3d_metadata = cached_signals
+            self.emg_data = self.raw_emg_store.to_emg_data()
+            self.game_metadata = c3d_metadata
+        else:
+            self.load_file()
+            c3d_metadata = self.extract_metadata()
         
         # Store the session game parameters that were used for this processing run
         self.session_game_params_used = session_game_params
@@ -399,14 +789,28 @@ class GHOSTLYC3DProcessor:
         final_metadata_dict = {**c3d_metadata, "session_parameters_used": session_game_params.model_dump()}
         self.game_metadata = final_metadata_dict
 
-        self.extract_emg_data()
-        
-        self.calculate_analytics(
-            threshold_factor=processing_opts.threshold_factor,
-            min_duration_ms=processing_opts.min_duration_ms,
-            smoothing_window=processing_opts.smoothing_window,
-            session_params=session_game_params
-        )
+        if cached_signals is None:
+            self.extract_emg_data()
+            if use_cache:
+                self.raw_emg_store = cache.save_signals(cache_keys['signals'], self.emg_data, c3d_metadata)
+        self.timings['signals'], stage_start = time.perf_counter() - stage_start, time.perf_counter()
+
+        cached_detections = cache.load_detections(cache_keys['contractions'], cache_keys['signals']) if use_cache else None
+        if cached_detections is not None:
+            detections, self.contraction_tables = cached_detections
+            self.smoothing_window = processing_opts.smoothing_window
+        else:
+            detections = self.detect_channels(
+                threshold_factor=processing_opts.threshold_factor,
+                min_duration_ms=processing_opts.min_duration_ms,
+                smoothing_window=processing_opts.smoothing_window
+            )
+            if use_cache:
+                cache.save_detections(cache_keys['contractions'], cache_keys['signals'], detections, self.contraction_tables)
+        self.timings['contractions'], stage_start = time.perf_counter() - stage_start, time.perf_counter()
+
+        self.score_channels(detections, session_game_params)
+        self.timings['scores'] = time.perf_counter() - stage_start
 
         return {
             "metadata": self.game_metadata,
@@ -425,13 +829,17 @@ class GHOSTLYC3DProcessor:
                                    save_path=save_path,
                                    show_plot=False)
 
-    def plot_emg_with_contractions(self, channel: str, save_path: str):
+    def plot_emg_with_contractions(self, channel: str, save_path: str, smoothing_window: Optional[int] = None):
         """
         Plots the EMG signal with identified contractions for a given channel.
 
+        The envelope overlay is the memoized detection envelope of the channel (see
+        get_envelope), so rendering reuses the array contraction detection computed.
+
         Args:
             channel: Name of the EMG channel to plot
             save_path: Path to save the plot
+            smoothing_window: Envelope window (samples); defaults to the window of the last detection
         """
         if channel not in self.emg_data:
             raise ValueError(f"Channel {channel} not found in EMG data")
@@ -440,8 +848,8 @@ class GHOSTLYC3DProcessor:
         base_name = channel.replace(' Raw', '').replace(' activated', '')
         
         # Get signal data
-        signal_data = np.array(self.emg_data[channel]['data'])
-        time_axis = np.array(self.emg_data[channel]['time_axis'])
+        signal_data = np.asarray(self.emg_data[channel]['data'])
+        time_axis = self.get_time_axis(channel)
         
         # Get contractions from analytics if available
         contractions = []
@@ -450,6 +858,10 @@ class GHOSTLYC3DProcessor:
         
         # Get analytics for the channel
         analytics = self.analytics.get(base_name, None)
+
+        # Envelope of the signal contractions were detected on
+        envelope_channel = self._contraction_channel(base_name)[0] or channel
+        envelope = self.get_envelope(envelope_channel, smoothing_window or self.smoothing_window)
         
         # Use the imported plotting function
         return plot_emg_with_contractions(
@@ -458,17 +870,21 @@ class GHOSTLYC3DProcessor:
             time_axis=time_axis,
             contractions=contractions,
             analytics=analytics,
+            envelope=envelope,
             save_path=save_path,
             show_plot=False
         )
 
-    def recalculate_scores(self, result_data: Dict, session_game_params: GameSessionParameters) -> Dict:
+    def recalculate_scores(self, result_data: Dict, session_game_params: GameSessionParameters,
+                           contraction_tables: Optional[Dict[str, Dict[str, np.ndarray]]] = None) -> Dict:
         """
         Recalculate scores for an existing result with updated session parameters.
         
         Args:
             result_data: The existing result data
             session_game_params: Updated session parameters
+            contraction_tables: Optional persisted per-channel contraction tables; when
+                                missing, tables are rebuilt from the stored contraction list
             
         Returns:
             Updated result data with recalculated scores
@@ -516,7 +932,7 @@ class GHOSTLYC3DProcessor:
             channel_analytics = existing_analytics.get(base_name, {})
             
             # Get the contractions for this channel
-            contractions = channel_analytics.get('contractions', [])
+            contractions = channel_analytics.get('contractions') or []
             
             # Determine which expected contractions count to use
             expected_contractions = session_game_params.session_expected_contractions
@@ -552,20 +968,14 @@ class GHOSTLYC3DProcessor:
             elif session_game_params.session_mvc_value is not None and session_game_params.session_mvc_threshold_percentage is not None:
                 actual_mvc_threshold = session_game_params.session_mvc_value * (session_game_params.session_mvc_threshold_percentage / 100.0)
             
-            # Count good contractions based on MVC threshold
-            good_contraction_count = 0
-            if actual_mvc_threshold is not None:
-                for contraction in contractions:
-                    if contraction.get('max_amplitude', 0) >= actual_mvc_threshold:
-                        contraction['is_good'] = True
-                        good_contraction_count += 1
-                    else:
-                        contraction['is_good'] = False
+            # Score contractions with vectorized comparisons on the contraction table
+            channel_analytics['contractions'] = contractions
+            channel_analytics['good_contraction_count'] = 0
+            self._score_channel(channel_analytics, (contraction_tables or {}).get(base_name),
+                                actual_mvc_threshold, session_game_params, base_name, i)
             
             # Update the channel analytics
             channel_analytics['mvc_threshold_actual_value'] = actual_mvc_threshold
-            channel_analytics['good_contraction_count'] = good_contraction_count
-            channel_analytics['contractions'] = contractions
             channel_analytics['expected_contractions'] = expected_contractions  # Add expected contractions to analytics
             
             # Add the updated analytics to the result
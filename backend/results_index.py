@@ -0,0 +1,539 @@
+"""
+GHOSTLY+ Results Index
+======================
+
+Embedded SQLite index of the stored analysis results, so that looking up a
+result, a patient's sessions or the list of patients is an indexed query
+instead of a scan of the results and uploads directories.
+
+The result JSON files remain the source of truth for the full analysis; the
+index holds one row per result with the fields used for lookups and listings:
+
+    result_id, patient_id, user_id, therapist_id, session_id, game_name, level,
+    score, timestamp, session_timestamp, source_filename, result_path,
+    upload_path, content_sha256, result_sha256
+
+timestamp is when the result was processed; session_timestamp is when the
+session was played (the game's metadata.time, or the processing time when that
+is missing or unreadable), both as YYYYMMDD_HHMMSS.
+
+content_sha256 links a result to its file in the content-addressed upload store
+(see upload_store.py) and counts that file's references. result_sha256 is the
+hash of the stored result JSON: the version behind the HTTP ETags of the
+result and of everything derived from it (see http_caching.py).
+
+ROLLUPS:
+========
+Per patient and channel, the index also keeps daily and weekly (ISO weeks,
+starting Monday) aggregates of the session metrics in TREND_METRICS, bucketed
+by session_timestamp, so imported history lands on the days it was played.
+They are maintained incrementally in the same transaction as the result row:
+a re-indexed (recalculated) or deleted result first has its previous
+per-channel metrics subtracted, touching only its own buckets. Serving trends
+reads one row per bucket, whatever the number of sessions.
+
+CONCURRENCY:
+============
+- The database runs in WAL mode: readers never block the (single) writer.
+- Each thread uses its own connection.
+- Writes run in ``BEGIN IMMEDIATE`` transactions. Callers that also write files
+  wrap both in ``transaction()``, so a failed file write rolls back the row.
+"""
+
+import json
+import base64
+import hashlib
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    result_id       TEXT PRIMARY KEY,
+    patient_id      TEXT,
+    user_id         TEXT,
+    therapist_id    TEXT,
+    session_id      TEXT,
+    game_name       TEXT,
+    level           TEXT,
+    score           REAL,
+    timestamp       TEXT NOT NULL,
+    session_timestamp TEXT,
+    source_filename TEXT,
+    result_path     TEXT NOT NULL,
+    upload_path     TEXT,
+    content_sha256  TEXT,
+    result_sha256   TEXT
+);
+CREATE INDEX IF NOT EXISTS results_by_patient ON results (patient_id, timestamp);
+CREATE INDEX IF NOT EXISTS results_by_timestamp ON results (timestamp);
+CREATE INDEX IF NOT EXISTS results_by_therapist ON results (therapist_id, timestamp);
+CREATE INDEX IF NOT EXISTS results_by_game ON results (game_name, level, timestamp);
+CREATE INDEX IF NOT EXISTS results_by_score ON results (score);
+
+CREATE TABLE IF NOT EXISTS channel_metrics (
+    result_id             TEXT NOT NULL,
+    channel               TEXT NOT NULL,
+    patient_id            TEXT NOT NULL,
+    day                   TEXT NOT NULL,
+    week                  TEXT NOT NULL,
+    contraction_count     INTEGER,
+    good_contraction_count INTEGER,
+    rms                   REAL,
+    mav                   REAL,
+    mpf                   REAL,
+    mdf                   REAL,
+    fatigue_index_fi_nsm5 REAL,
+    PRIMARY KEY (result_id, channel)
+);
+
+CREATE TABLE IF NOT EXISTS rollups (
+    patient_id            TEXT NOT NULL,
+    period                TEXT NOT NULL,
+    period_start          TEXT NOT NULL,
+    channel               TEXT NOT NULL,
+    sessions              INTEGER NOT NULL DEFAULT 0,
+    contraction_count     INTEGER NOT NULL DEFAULT 0,
+    good_contraction_count INTEGER NOT NULL DEFAULT 0,
+    scored_contraction_count INTEGER NOT NULL DEFAULT 0,
+    rms_sum REAL NOT NULL DEFAULT 0, rms_n INTEGER NOT NULL DEFAULT 0,
+    mav_sum REAL NOT NULL DEFAULT 0, mav_n INTEGER NOT NULL DEFAULT 0,
+    mpf_sum REAL NOT NULL DEFAULT 0, mpf_n INTEGER NOT NULL DEFAULT 0,
+    mdf_sum REAL NOT NULL DEFAULT 0, mdf_n INTEGER NOT NULL DEFAULT 0,
+    fatigue_index_fi_nsm5_sum REAL NOT NULL DEFAULT 0, fatigue_index_fi_nsm5_n INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (patient_id, period, channel, period_start)
+);
+"""
+
+COLUMNS = ('result_id', 'patient_id', 'user_id', 'therapist_id', 'session_id', 'game_name', 'level',
+           'score', 'timestamp', 'session_timestamp', 'source_filename', 'result_path', 'upload_path',
+           'content_sha256', 'result_sha256')
+# Columns an update leaves unchanged when the new row has no value (e.g., recalculations)
+KEEP_IF_MISSING = ('upload_path', 'content_sha256')
+
+# Bumped when the index gains data that must be rebuilt from the result files
+SCHEMA_VERSION = 4
+
+# Per-session channel metrics averaged by the trend rollups
+TREND_METRICS = ('rms', 'mav', 'mpf', 'mdf', 'fatigue_index_fi_nsm5')
+ROLLUP_PERIODS = ('day', 'week')
+
+# Equality filters of query(), by column
+FILTER_COLUMNS = ('patient_id', 'user_id', 'therapist_id', 'session_id', 'game_name', 'level')
+
+# Sort keys of query(); NULLs sort first, so they are mapped to a value below every real one
+SORT_KEYS = {
+    'timestamp': "timestamp",
+    'session_timestamp': "session_timestamp",  # set for every row (see row_from_result)
+    'score': "IFNULL(score, -1e308)",
+    'level': "IFNULL(CAST(level AS INTEGER), -1)",  # numerically: "2" before "10"; non-numeric levels as 0
+    'game_name': "IFNULL(game_name, '')",
+    'patient_id': "IFNULL(patient_id, '')",
+}
+
+# Indexes on the exact sort expressions (alone, and within a patient), by name, so every sorted
+# page is an index range scan; SQLite appends the rowid tie-breaker to each index
+SORT_INDEXES = {
+    **{f"results_sorted_by_{sort}": expression
+       for sort, expression in SORT_KEYS.items() if sort != 'timestamp'},
+    **{f"results_of_patient_sorted_by_{sort}": f"patient_id, {expression}"
+       for sort, expression in SORT_KEYS.items() if sort != 'timestamp'},
+}
+
+# Result fields that can be answered from the index alone, by column
+INDEXED_RESULT_FIELDS = {
+    'file_id': 'result_id', 'timestamp': 'timestamp', 'source_filename': 'source_filename',
+    'patient_id': 'patient_id', 'user_id': 'user_id', 'session_id': 'session_id',
+}
+
+
+def encode_cursor(sort: str, descending: bool, row: Dict) -> str:
+    """Opaque cursor pointing just after `row` in a query sorted by `sort`."""
+    payload = json.dumps([sort, descending, row['sort_key'], row['rowid']], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str, sort: str, descending: bool) -> Tuple[Any, int]:
+    """(sort key, rowid) of a cursor; raises ValueError if it is malformed or from another sort order."""
+    try:
+        cursor_sort, cursor_descending, sort_key, rowid = json.loads(base64.urlsafe_b64decode(cursor))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+    if (cursor_sort, cursor_descending) != (sort, descending):
+        raise ValueError("Cursor belongs to a query with a different sort order")
+    return sort_key, int(rowid)
+
+
+def project_result(result: Dict, fields: Optional[List[str]] = None,
+                   exclude: Optional[List[str]] = None) -> Dict:
+    """
+    Project a result dict onto top-level `fields` and drop the dotted `exclude` paths.
+
+    In exclude paths, ``*`` matches every key at its level, e.g. ``analytics.*.contractions``
+    drops the contraction list of every channel.
+    """
+    projected = {key: result[key] for key in fields if key in result} if fields else dict(result)
+    for path in exclude or []:
+        projected = _drop_path(projected, path.split('.'))
+    return projected
+
+
+def _drop_path(node: Any, keys: List[str]) -> Any:
+    if not isinstance(node, dict):
+        return node
+    head, rest = keys[0], keys[1:]
+    matched = list(node) if head == '*' else [head] if head in node else []
+    if not matched:
+        return node
+    node = dict(node)  # copy along the path only
+    for key in matched:
+        if rest:
+            node[key] = _drop_path(node[key], rest)
+        else:
+            del node[key]
+    return node
+
+
+def row_from_result(result: Dict, result_path: Path, upload_path: Optional[Path] = None,
+                    content_sha256: Optional[str] = None, result_sha256: Optional[str] = None) -> Dict:
+    """
+    Index row of a result (EMGAnalysisResult as a dict) stored at `result_path`;
+    result_sha256 is the hash of the stored JSON. content_sha256 defaults to the one
+    recorded in the result.
+    """
+    metadata = result.get('metadata') or {}
+    return {
+        'result_id': result['file_id'],
+        'patient_id': result.get('patient_id'),
+        'user_id': result.get('user_id'),
+        'therapist_id': metadata.get('therapist_id'),
+        'session_id': result.get('session_id'),
+        'game_name': metadata.get('game_name'),
+        'level': metadata.get('level'),
+        'score': metadata.get('score'),
+        'timestamp': result['timestamp'],
+        'session_timestamp': session_timestamp(metadata.get('time'), result['timestamp']),
+        'source_filename': result.get('source_filename'),
+        'result_path': str(result_path),
+        'upload_path': str(upload_path) if upload_path is not None else None,
+        'content_sha256': content_sha256 or result.get('content_sha256'),
+        'result_sha256': result_sha256,
+        'channels': {
+            channel: {key: analytics.get(key)
+                      for key in ('contraction_count', 'good_contraction_count') + TREND_METRICS}
+            for channel, analytics in (result.get('analytics') or {}).items()
+        },
+    }
+
+
+def session_timestamp(session_time: Optional[str], timestamp: str) -> str:
+    """When a session was played (YYYYMMDD_HHMMSS), from its metadata time; else the processing timestamp."""
+    if session_time:
+        for parse in (datetime.fromisoformat, lambda value: datetime.strptime(value, "%Y%m%d_%H%M%S")):
+            try:
+                return parse(session_time.strip()).strftime("%Y%m%d_%H%M%S")
+            except ValueError:
+                pass
+    return timestamp
+
+
+def _period_starts(timestamp: str) -> Dict[str, str]:
+    """Day and ISO week (Monday) of a result timestamp (YYYYMMDD_HHMMSS) as ISO dates."""
+    day = datetime.strptime(timestamp[:8], "%Y%m%d").date()
+    return {'day': day.isoformat(), 'week': (day - timedelta(days=day.weekday())).isoformat()}
+
+
+class ResultsIndex:
+    """SQLite (WAL) index of stored results, keyed by result ID."""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        conn = self._connection()
+        conn.executescript(SCHEMA)
+        # Indexes created before uploads were content-addressed (or results versioned, or
+        # sessions dated) lack the columns
+        existing = {column[1] for column in conn.execute("PRAGMA table_info(results)")}
+        for column in ('content_sha256', 'result_sha256', 'session_timestamp'):
+            if column not in existing:
+                conn.execute(f"ALTER TABLE results ADD COLUMN {column} TEXT")
+        conn.execute("CREATE INDEX IF NOT EXISTS results_by_content ON results (content_sha256)")
+        # Sort indexes on an outdated expression (e.g. level sorted as text) are recreated
+        for name, sql in conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index'").fetchall():
+            if name in SORT_INDEXES and sql != f"CREATE INDEX {name} ON results ({SORT_INDEXES[name]})":
+                conn.execute(f"DROP INDEX {name}")
+        for name, columns in SORT_INDEXES.items():
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON results ({columns})")
+
+    @property
+    def needs_rebuild(self) -> bool:
+        """Whether the index predates SCHEMA_VERSION (or is new) and should be rebuilt from the result files."""
+        return self._connection().execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit mode: transactions are opened explicitly in transaction()
+            conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Run a write transaction; it is rolled back if the block raises.
+
+        Nested calls (e.g., put() inside a caller's transaction) join the outer transaction.
+        """
+        conn = self._connection()
+        if conn.in_transaction:
+            yield conn
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+    # --- Writes ---
+
+    def put(self, row: Dict) -> None:
+        """
+        Insert or update a result row (see row_from_result) and its trend rollups.
+
+        A missing upload_path or content_sha256 keeps the stored one.
+        """
+        placeholders = ', '.join(f':{column}' for column in COLUMNS)
+        updates = ', '.join(
+            f'{column} = COALESCE(excluded.{column}, results.{column})' if column in KEEP_IF_MISSING
+            else f'{column} = excluded.{column}'
+            for column in COLUMNS if column != 'result_id')
+        with self.transaction() as conn:
+            conn.execute(
+                f"INSERT INTO results ({', '.join(COLUMNS)}) VALUES ({placeholders}) "
+                f"ON CONFLICT (result_id) DO UPDATE SET {updates}",
+                {column: row.get(column) for column in COLUMNS})
+            self._remove_channel_metrics(conn, row['result_id'])
+            if row['patient_id'] is not None:
+                self._add_channel_metrics(conn, row)
+
+    def delete(self, result_id: str) -> bool:
+        """Remove a result row and its contribution to the rollups; returns whether it existed."""
+        with self.transaction() as conn:
+            self._remove_channel_metrics(conn, result_id)
+            return conn.execute("DELETE FROM results WHERE result_id = ?", (result_id,)).rowcount > 0
+
+    # --- Longitudinal rollups ---
+
+    def _add_channel_metrics(self, conn: sqlite3.Connection, row: Dict) -> None:
+        periods = _period_starts(row.get('session_timestamp') or row['timestamp'])
+        for channel, metrics in row.get('channels', {}).items():
+            conn.execute(
+                f"INSERT INTO channel_metrics (result_id, channel, patient_id, day, week, "
+                f"contraction_count, good_contraction_count, {', '.join(TREND_METRICS)}) "
+                f"VALUES (?, ?, ?, ?, ?, ?, ?, {', '.join('?' * len(TREND_METRICS))})",
+                (row['result_id'], channel, row['patient_id'], periods['day'], periods['week'],
+                 metrics.get('contraction_count'), metrics.get('good_contraction_count'),
+                 *(metrics.get(metric) for metric in TREND_METRICS)))
+            self._apply_to_rollups(conn, row['patient_id'], channel, periods, metrics, sign=1)
+
+    def _remove_channel_metrics(self, conn: sqlite3.Connection, result_id: str) -> None:
+        previous = conn.execute("SELECT * FROM channel_metrics WHERE result_id = ?", (result_id,)).fetchall()
+        for metrics in map(dict, previous):
+            periods = {period: metrics[period] for period in ROLLUP_PERIODS}
+            self._apply_to_rollups(conn, metrics['patient_id'], metrics['channel'], periods, metrics, sign=-1)
+        conn.execute("DELETE FROM channel_metrics WHERE result_id = ?", (result_id,))
+
+    @staticmethod
+    def _apply_to_rollups(conn: sqlite3.Connection, patient_id: str, channel: str,
+                          periods: Dict[str, str], metrics: Dict, sign: int) -> None:
+        """Add (sign=1) or subtract (sign=-1) one session's channel metrics to its day and week buckets."""
+        count = metrics.get('contraction_count') or 0
+        good = metrics.get('good_contraction_count')
+        deltas = {
+            'sessions': sign,
+            'contraction_count': sign * count,
+            'good_contraction_count': sign * (good or 0),
+            # Contractions of sessions that were scored against an MVC threshold
+            'scored_contraction_count': sign * (count if good is not None else 0),
+        }
+        for metric in TREND_METRICS:
+            value = metrics.get(metric)
+            deltas[f'{metric}_sum'] = sign * (value or 0.0)
+            deltas[f'{metric}_n'] = sign * (value is not None)
+        columns = ', '.join(deltas)
+        updates = ', '.join(f'{column} = {column} + excluded.{column}' for column in deltas)
+        for period in ROLLUP_PERIODS:
+            key = (patient_id, period, periods[period], channel)
+            conn.execute(
+                f"INSERT INTO rollups (patient_id, period, period_start, channel, {columns}) "
+                f"VALUES (?, ?, ?, ?, {', '.join('?' * len(deltas))}) "
+                f"ON CONFLICT (patient_id, period, channel, period_start) DO UPDATE SET {updates}",
+                (*key, *deltas.values()))
+            if sign < 0:
+                # Drop the bucket once its last session is gone (a primary key lookup)
+                conn.execute("DELETE FROM rollups WHERE patient_id = ? AND period = ? AND period_start = ? "
+                             "AND channel = ? AND sessions <= 0", key)
+
+    def trends(self, patient_id: str, period: str = 'week', channel: Optional[str] = None,
+               start: Optional[str] = None, end: Optional[str] = None) -> Dict[str, List[Dict]]:
+        """
+        Daily or weekly aggregates of a patient's sessions, per channel, oldest bucket first.
+
+        Args:
+            patient_id: Patient whose rollups to read.
+            period: 'day' or 'week'.
+            channel: Only this base channel (default: all).
+            start, end: Inclusive ISO-date bounds on the bucket start.
+
+        Returns:
+            {channel: [{'period_start', 'sessions', 'contraction_count', 'good_contraction_count',
+                        'good_contraction_ratio', 'avg_<metric>' for each of TREND_METRICS}]}
+        """
+        if period not in ROLLUP_PERIODS:
+            raise ValueError(f"Unknown period '{period}', expected one of {ROLLUP_PERIODS}")
+        clauses, params = ["patient_id = ?", "period = ?"], [patient_id, period]
+        for value, clause in ((channel, "channel = ?"), (start, "period_start >= ?"), (end, "period_start <= ?")):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        rows = self._connection().execute(
+            f"SELECT * FROM rollups WHERE {' AND '.join(clauses)} ORDER BY channel, period_start", params)
+
+        trends: Dict[str, List[Dict]] = {}
+        for row in rows:
+            point = {
+                'period_start': row['period_start'],
+                'sessions': row['sessions'],
+                'contraction_count': row['contraction_count'],
+                'good_contraction_count': row['good_contraction_count'],
+                'good_contraction_ratio': (row['good_contraction_count'] / row['scored_contraction_count']
+                                           if row['scored_contraction_count'] > 0 else None),
+            }
+            for metric in TREND_METRICS:
+                n = row[f'{metric}_n']
+                point[f'avg_{metric}'] = row[f'{metric}_sum'] / n if n > 0 else None
+            trends.setdefault(row['channel'], []).append(point)
+        return trends
+
+    # --- Queries ---
+
+    def get(self, result_id: str) -> Optional[Dict]:
+        row = self._connection().execute(
+            "SELECT * FROM results WHERE result_id = ?", (result_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def list_results(self) -> List[Dict]:
+        """All result rows, oldest first."""
+        rows = self._connection().execute("SELECT * FROM results ORDER BY timestamp, rowid")
+        return [dict(row) for row in rows]
+
+    def patients(self) -> List[str]:
+        rows = self._connection().execute(
+            "SELECT DISTINCT patient_id FROM results WHERE patient_id IS NOT NULL ORDER BY patient_id")
+        return [row[0] for row in rows]
+
+    def patient_results(self, patient_id: str) -> List[Dict]:
+        """Result rows of one patient, oldest first."""
+        rows = self._connection().execute(
+            "SELECT * FROM results WHERE patient_id = ? ORDER BY timestamp, rowid", (patient_id,))
+        return [dict(row) for row in rows]
+
+    def query(self, filters: Dict[str, Any], sort: str = 'timestamp', descending: bool = False,
+              limit: int = 50, after: Optional[Tuple[Any, int]] = None) -> List[Dict]:
+        """
+        Result rows matching `filters`, ordered by a sort key and paged by keyset.
+
+        Args:
+            filters: Column equality filters (FILTER_COLUMNS) plus the ranges
+                     timestamp_from / timestamp_to (on the session date, session_timestamp)
+                     and score_min / score_max (inclusive). None values are ignored.
+            sort: A key of SORT_KEYS; ties are broken by insertion order.
+            descending: Sort direction.
+            limit: Maximum number of rows.
+            after: (sort key, rowid) of the last row of the previous page (see decode_cursor).
+
+        Returns:
+            Row dicts, each with its 'sort_key' and 'rowid' for building the next cursor.
+        """
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Unknown sort key '{sort}', expected one of {sorted(SORT_KEYS)}")
+        sort_expr = SORT_KEYS[sort]
+        clauses, params = [], []
+        for column in FILTER_COLUMNS:
+            if filters.get(column) is not None:
+                clauses.append(f"{column} = ?")
+                params.append(filters[column])
+        for key, clause in (('timestamp_from', "session_timestamp >= ?"),
+                            ('timestamp_to', "session_timestamp <= ?"),
+                            ('score_min', "score >= ?"), ('score_max', "score <= ?")):
+            if filters.get(key) is not None:
+                clauses.append(clause)
+                params.append(filters[key])
+        if after is not None:
+            clauses.append(f"({sort_expr}, rowid) {'<' if descending else '>'} (?, ?)")
+            params.extend(after)
+
+        direction = 'DESC' if descending else 'ASC'
+        rows = self._connection().execute(
+            f"SELECT rowid, {sort_expr} AS sort_key, * FROM results "
+            f"{'WHERE ' + ' AND '.join(clauses) if clauses else ''} "
+            f"ORDER BY {sort_expr} {direction}, rowid {direction} LIMIT ?",
+            (*params, limit))
+        return [dict(row) for row in rows]
+
+    def content_references(self, content_sha256: str) -> int:
+        """Number of indexed results computed from the uploaded file with this hash."""
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM results WHERE content_sha256 = ?", (content_sha256,)).fetchone()[0]
+
+    def count(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    # --- Migration ---
+
+    def rebuild(self, results_dir: Path, upload_dir: Path,
+                upload_path_for: Optional[Callable[[str], Path]] = None) -> int:
+        """
+        Index every result JSON file in `results_dir` (for results stored before the index,
+        or before its current SCHEMA_VERSION, existed).
+
+        A result that records its content_sha256 is linked to that file of the upload
+        store (`upload_path_for`, e.g. UploadStore.path_for); older results are matched
+        by the ``{timestamp}_{result_id}_{filename}`` naming of the legacy /upload.
+        Returns the number of results indexed.
+        """
+        uploads = {}
+        for upload_path in Path(upload_dir).glob("*.c3d"):
+            parts = upload_path.name.split('_', 3)
+            if len(parts) == 4:
+                uploads[parts[2]] = upload_path
+
+        indexed = 0
+        with self.transaction() as conn:
+            for result_path in Path(results_dir).glob("*_result.json"):
+                try:
+                    result_json = result_path.read_bytes()
+                    result = json.loads(result_json)
+                    upload_path = uploads.get(result['file_id'])
+                    content_sha256 = result.get('content_sha256')
+                    if content_sha256 and upload_path_for is not None:
+                        upload_path = upload_path_for(content_sha256)
+                    self.put(row_from_result(result, result_path.resolve(),
+                                             upload_path.resolve() if upload_path else None,
+                                             result_sha256=hashlib.sha256(result_json).hexdigest()))
+                    indexed += 1
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"Warning: Skipping unreadable result {result_path.name}: {e}")
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        return indexed
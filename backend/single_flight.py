@@ -0,0 +1,68 @@
+"""
+GHOSTLY+ Single-Flight Coalescing
+=================================
+
+Runs at most one computation per key at a time. Callers that ask for a key
+while its computation is in flight wait for it and share its outcome (result
+or exception) instead of repeating the work, e.g. a double-submitted upload
+or two therapists opening the plot of the same session.
+
+Only in-flight calls are shared; once a computation finishes its key is
+forgotten, and later callers rely on the regular caches (result markers,
+plot files) for reuse.
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: BaseException = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one (thread-safe)."""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0  # calls that were answered by another caller's computation
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs) -> Tuple[Any, bool]:
+        """
+        Return `fn(*args, **kwargs)`, or the outcome of the call already running for `key`.
+
+        Returns (value, shared), where shared tells whether the value came from another
+        caller's computation. Exceptions are raised in every waiting caller.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value, True
+
+        try:
+            call.value = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value, False
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
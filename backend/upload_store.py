@@ -0,0 +1,84 @@
+"""
+GHOSTLY+ Upload Store
+=====================
+
+Content-addressed storage of uploaded C3D files. Every distinct file is kept
+once, under its SHA-256, however many results were computed from it:
+
+    {root}/{sha256[:2]}/{sha256}.c3d
+
+Uploads are streamed into ``{root}/tmp`` and renamed into place (atomically,
+same filesystem) once their hash is known; a file whose bytes are already
+stored is simply dropped.
+
+REFERENCE COUNTING:
+===================
+A stored file is referenced by the results computed from it (the
+``content_sha256`` column of the results index) and by uploads still being
+processed (pending references held here). remove_if_unreferenced() deletes a
+file only when both counts are zero; both are checked under one lock, and
+pending references are released only after the result has been indexed.
+"""
+
+import os
+import uuid
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Callable
+
+
+class UploadStore:
+    """Deduplicated, content-addressed store of uploaded C3D files."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.tmp_dir = self.root / "tmp"
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+        self._pending: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def path_for(self, content_sha256: str) -> Path:
+        return self.root / content_sha256[:2] / f"{content_sha256}.c3d"
+
+    def temporary_path(self) -> Path:
+        """A unique path to stream a new upload to before its hash is known."""
+        return self.tmp_dir / f"{uuid.uuid4().hex}.tmp"
+
+    def commit(self, tmp_path: Path, content_sha256: str) -> Path:
+        """
+        Move a spooled upload into the store (or drop it if the content is already stored)
+        and take a pending reference on it. Returns the stored path.
+        """
+        path = self.path_for(content_sha256)
+        with self._lock:
+            if path.exists():
+                tmp_path.unlink(missing_ok=True)
+            else:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(tmp_path, path)
+            self._pending[content_sha256] += 1
+        return path
+
+    def release(self, content_sha256: str) -> None:
+        """Drop a pending reference taken by commit() (once the result is indexed, or on failure)."""
+        with self._lock:
+            self._pending[content_sha256] -= 1
+            if self._pending[content_sha256] <= 0:
+                del self._pending[content_sha256]
+
+    def remove_if_unreferenced(self, content_sha256: str, count_references: Callable[[str], int]) -> bool:
+        """
+        Delete a stored file if no result (`count_references`) and no pending upload refers to it.
+
+        Returns whether the file was deleted.
+        """
+        with self._lock:
+            if self._pending[content_sha256] > 0 or count_references(content_sha256) > 0:
+                return False
+            self._pending.pop(content_sha256, None)
+            path = self.path_for(content_sha256)
+            if not path.exists():
+                return False
+            path.unlink()
+            return True
@@ -0,0 +1,169 @@
+"""
+GHOSTLY+ Waveform Pyramid
+=========================
+
+Multi-resolution min/max summaries of the raw EMG channels, so a chart can
+zoom and pan over a long session with a constant payload: a request for a
+time window and a number of points is answered from the coarsest level that
+still has at least one bucket per two points.
+
+LEVELS:
+=======
+Level k splits a channel into buckets of BASE_BUCKET * LEVEL_FACTOR**k
+samples and keeps, per bucket, the minimum and maximum and where in the
+bucket they occur. Levels are added until one has at most MIN_TOP_BUCKETS
+buckets. Drawing the minimum and maximum of every bucket in sample order
+keeps every peak of the signal, which plain subsampling would drop.
+
+STORAGE:
+========
+    {results_dir}/{result_id}_result_waveform.bin
+
+A RawEMGStore file (memory-mapped, see emg_store.py) with four arrays per
+channel and level, named "{channel}|{bucket size}|{lo,hi,lo_at,hi_at}", where
+*_at are sample offsets within the bucket. Reading a window touches only the
+pages it covers, whatever the length of the session. Results stored without
+a pyramid are decimated from the raw signal on request instead.
+"""
+
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .emg_store import RawEMGStore
+
+BASE_BUCKET = 8
+LEVEL_FACTOR = 4
+MIN_TOP_BUCKETS = 256
+
+WAVEFORM_PYRAMID_SUFFIX = "_result_waveform.bin"
+
+
+def waveform_pyramid_path(results_dir: Path, result_id: str) -> Path:
+    return results_dir / f"{result_id}{WAVEFORM_PYRAMID_SUFFIX}"
+
+
+def _coarsen(lo: np.ndarray, hi: np.ndarray, lo_at: np.ndarray, hi_at: np.ndarray,
+             child_size: int, factor: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Merge every `factor` consecutive buckets of `child_size` samples (the last group may be partial)."""
+    count = -(-lo.size // factor)
+    pad = count * factor - lo.size
+    lo = np.concatenate([lo, np.full(pad, np.inf, dtype=lo.dtype)]).reshape(count, factor)
+    hi = np.concatenate([hi, np.full(pad, -np.inf, dtype=hi.dtype)]).reshape(count, factor)
+    lo_at = np.concatenate([lo_at, np.zeros(pad, dtype=lo_at.dtype)]).reshape(count, factor)
+    hi_at = np.concatenate([hi_at, np.zeros(pad, dtype=hi_at.dtype)]).reshape(count, factor)
+
+    lo_child = lo.argmin(axis=1)[:, np.newaxis]
+    hi_child = hi.argmax(axis=1)[:, np.newaxis]
+    return (np.take_along_axis(lo, lo_child, axis=1)[:, 0],
+            np.take_along_axis(hi, hi_child, axis=1)[:, 0],
+            (lo_child[:, 0] * child_size + np.take_along_axis(lo_at, lo_child, axis=1)[:, 0]).astype(np.float32),
+            (hi_child[:, 0] * child_size + np.take_along_axis(hi_at, hi_child, axis=1)[:, 0]).astype(np.float32))
+
+
+def _bucket_extrema(signal: np.ndarray, bucket: int):
+    """(lo, hi, lo_at, hi_at) of consecutive `bucket`-sample buckets of a signal."""
+    signal = np.asarray(signal)
+    if signal.dtype.kind != 'f':
+        signal = signal.astype(np.float64)
+    offsets = np.zeros(signal.size, dtype=np.float32)
+    return _coarsen(signal, signal, offsets, offsets, 1, bucket)
+
+
+def build_levels(signal: np.ndarray) -> Dict[int, Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+    """All pyramid levels of one channel, keyed by bucket size (samples)."""
+    levels = {}
+    if np.asarray(signal).size <= BASE_BUCKET * MIN_TOP_BUCKETS:
+        return levels  # short enough to always be served sample by sample
+    bucket, level = BASE_BUCKET, _bucket_extrema(signal, BASE_BUCKET)
+    levels[bucket] = level
+    while level[0].size > MIN_TOP_BUCKETS:
+        level = _coarsen(*level, bucket, LEVEL_FACTOR)
+        bucket *= LEVEL_FACTOR
+        levels[bucket] = level
+    return levels
+
+
+def write_waveform_pyramid(path: Path, emg_data: Dict[str, Dict]) -> RawEMGStore:
+    """Build the pyramid of every channel of `emg_data` (processor layout) and store it."""
+    arrays = {}
+    for channel, entry in emg_data.items():
+        sampling_rate = float(entry['sampling_rate'])
+        for bucket, level in build_levels(entry['data']).items():
+            for part, values in zip(('lo', 'hi', 'lo_at', 'hi_at'), level):
+                arrays[f"{channel}|{bucket}|{part}"] = {'data': values, 'sampling_rate': sampling_rate / bucket}
+    return RawEMGStore.write(path, arrays)
+
+
+class WaveformPyramid:
+    """Read access to the stored pyramid of one result."""
+
+    def __init__(self, store: RawEMGStore):
+        self.store = store
+        self._buckets: Optional[Dict[str, List[int]]] = None
+
+    @classmethod
+    def open(cls, results_dir: Path, result_id: str) -> Optional["WaveformPyramid"]:
+        path = waveform_pyramid_path(results_dir, result_id)
+        return cls(RawEMGStore(path)) if path.exists() else None
+
+    def buckets(self, channel: str) -> List[int]:
+        """Bucket sizes stored for a channel, finest first."""
+        if self._buckets is None:
+            self._buckets = {}
+            for name in self.store.channels:
+                base, bucket, part = name.rsplit('|', 2)
+                if part == 'lo':
+                    self._buckets.setdefault(base, []).append(int(bucket))
+            for sizes in self._buckets.values():
+                sizes.sort()
+        return self._buckets.get(channel, [])
+
+    def level(self, channel: str, bucket: int) -> Tuple[np.ndarray, ...]:
+        return tuple(self.store.get_signal(f"{channel}|{bucket}|{part}") for part in ('lo', 'hi', 'lo_at', 'hi_at'))
+
+
+def _points(lo, hi, lo_at, hi_at, first_sample: int, bucket: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Interleave the extrema of consecutive buckets (starting at `first_sample`) in sample order."""
+    starts = first_sample + np.arange(len(lo), dtype=np.int64) * bucket
+    indices = np.stack([starts + np.asarray(lo_at, dtype=np.int64), starts + np.asarray(hi_at, dtype=np.int64)], axis=1)
+    values = np.stack([np.asarray(lo), np.asarray(hi)], axis=1)
+    order = np.argsort(indices, axis=1, kind='stable')
+    return np.take_along_axis(indices, order, axis=1).ravel(), np.take_along_axis(values, order, axis=1).ravel()
+
+
+def decimate_window(signal: np.ndarray, start: int, stop: int, max_points: int,
+                    pyramid: Optional[WaveformPyramid] = None,
+                    channel: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray, int]:
+    """
+    At most `max_points` points of `signal[start:stop]`.
+
+    Returns (sample indices, values, bucket size); a bucket size of 1 means every sample of the
+    window is returned. Otherwise each bucket contributes its minimum and maximum. Full
+    buckets come from the coarsest fitting pyramid level, when one is given; the partial
+    buckets at the window edges (and windows without a pyramid) are reduced from `signal`.
+    """
+    length = stop - start
+    if length <= max_points:
+        return np.arange(start, stop, dtype=np.int64), np.asarray(signal[start:stop]), 1
+
+    buckets_wanted = max(1, max_points // 2)
+    stored = pyramid.buckets(channel) if pyramid is not None and channel is not None else []
+    # Finest stored level whose buckets (plus two partial edge buckets) fit in the budget
+    bucket = next((size for size in stored if length // size + 2 <= buckets_wanted), None)
+
+    if bucket is None:
+        # No fitting level: reduce the window itself into evenly sized buckets
+        bucket = -(-length // buckets_wanted)
+        return (*_points(*_bucket_extrema(signal[start:stop], bucket), start, bucket), bucket)
+
+    first, last = -(-start // bucket), stop // bucket  # full buckets inside the window
+    parts = []
+    if start < first * bucket:
+        parts.append(_points(*_bucket_extrema(signal[start:first * bucket], bucket), start, bucket))
+    lo, hi, lo_at, hi_at = pyramid.level(channel, bucket)
+    parts.append(_points(lo[first:last], hi[first:last], lo_at[first:last], hi_at[first:last], first * bucket, bucket))
+    if last * bucket < stop:
+        parts.append(_points(*_bucket_extrema(signal[last * bucket:stop], bucket), last * bucket, bucket))
+    return np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts]), bucket
@@ -0,0 +1,130 @@
+"""
+GHOSTLY+ Binary Wire Formats
+============================
+
+Binary encodings of raw channel data for /raw-data, as alternatives to JSON
+float lists:
+
+- npy:   application/octet-stream (or application/x-npy), a NumPy .npy file
+         holding one channel (np.load(io.BytesIO(body)) on the client)
+- arrow: application/vnd.apache.arrow.stream, an Arrow IPC stream with one
+         column per channel (requires the optional pyarrow package)
+
+Bodies are built from the stored arrays without per-sample Python work: the
+.npy body is a small header followed by the bytes of the (memory-mapped)
+array, sent in chunks. Both support single HTTP byte ranges
+("Range: bytes=start-end"), so clients can fetch slices of a body.
+"""
+
+import io
+import re
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from fastapi.responses import Response, StreamingResponse
+
+try:
+    import pyarrow as pa
+except ImportError:  # Arrow responses are optional
+    pa = None
+
+NPY_MEDIA_TYPE = "application/octet-stream"
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+MEDIA_TYPES = {
+    'npy': (NPY_MEDIA_TYPE, "application/x-npy"),
+    'arrow': (ARROW_STREAM_MEDIA_TYPE,),
+}
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+BYTE_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangeNotSatisfiable(ValueError):
+    """The requested byte range lies outside the body."""
+
+
+def negotiate(accept: str, requested: Optional[str] = None) -> str:
+    """The wire format ('json', 'npy' or 'arrow') of a request, from ?format= or the Accept header."""
+    if requested:
+        return requested
+    accept = accept.lower()
+    for name, media_types in MEDIA_TYPES.items():
+        if any(media_type in accept for media_type in media_types):
+            return name
+    return 'json'
+
+
+def npy_body(array: np.ndarray) -> List[memoryview]:
+    """The parts of a .npy file of a 1-D array: its header and a view of its data (not copied)."""
+    array = np.ascontiguousarray(array)
+    header = io.BytesIO()
+    np.lib.format.write_array_header_1_0(
+        header, {'descr': np.lib.format.dtype_to_descr(array.dtype), 'fortran_order': False, 'shape': array.shape})
+    return [header.getbuffer(), memoryview(array).cast('B')]
+
+
+def arrow_body(columns: Dict[str, np.ndarray]) -> List[memoryview]:
+    """An Arrow IPC stream holding one column per array (all of the same length)."""
+    if pa is None:
+        raise RuntimeError("Arrow responses require the pyarrow package")
+    table = pa.table({name: pa.array(np.asarray(values)) for name, values in columns.items()})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return [memoryview(sink.getvalue())]
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    The (first, last) byte positions, inclusive, of a single-range Range header.
+
+    Returns None when the whole body should be sent (no header, or a form not supported
+    here such as multiple ranges); raises RangeNotSatisfiable for a range outside the body,
+    which is any range of an empty body.
+    """
+    match = BYTE_RANGE.match(header.strip()) if header else None
+    if match is None or not any(match.groups()):
+        return None
+    if size == 0:
+        raise RangeNotSatisfiable(header)
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise RangeNotSatisfiable(header)
+        return max(0, size - length), size - 1
+    first = int(first)
+    last = min(int(last), size - 1) if last else size - 1
+    if first >= size or last < first:
+        raise RangeNotSatisfiable(header)
+    return first, last
+
+
+def _iter_range(parts: List[memoryview], first: int, last: int) -> Iterator[bytes]:
+    offset = 0
+    for part in parts:
+        start, stop = max(first - offset, 0), min(last + 1 - offset, len(part))
+        for chunk_start in range(start, stop, STREAM_CHUNK_SIZE):
+            yield bytes(part[chunk_start:min(chunk_start + STREAM_CHUNK_SIZE, stop)])
+        offset += len(part)
+
+
+def binary_response(parts: List[memoryview], media_type: str, range_header: Optional[str],
+                    headers: Optional[Dict[str, str]] = None) -> Response:
+    """Stream a body made of `parts`, honoring a single byte range (206) when requested."""
+    size = sum(len(part) for part in parts)
+    headers = {"Accept-Ranges": "bytes", **(headers or {})}
+    try:
+        byte_range = parse_range(range_header, size)
+    except RangeNotSatisfiable:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    if byte_range is None:
+        first, last, status_code = 0, size - 1, 200
+    else:
+        (first, last), status_code = byte_range, 206
+        headers["Content-Range"] = f"bytes {first}-{last}/{size}"
+    headers["Content-Length"] = str(last - first + 1)
+    return StreamingResponse(_iter_range(parts, first, last), status_code=status_code,
+                             media_type=media_type, headers=headers)
@@ -0,0 +1,101 @@
+import hashlib
+import numpy as np
+
+from backend.analysis_cache import AnalysisCache
+from backend.models import ProcessingOptions, GameSessionParameters
+
+
+def keys(cache, file_hash="abc", opts=None, **session_kwargs):
+    return cache.keys_for(file_hash, opts or ProcessingOptions(), GameSessionParameters(**session_kwargs),
+                          ['mav', 'mpf'], patient_id='p1', user_id=None, session_id=None)
+
+
+def test_each_layer_key_covers_only_its_own_inputs(tmp_path):
+    cache = AnalysisCache(tmp_path)
+    base = keys(cache)
+
+    rescored = keys(cache, session_mvc_threshold_percentage=40.0)
+    assert rescored['signals'] == base['signals'] and rescored['contractions'] == base['contractions']
+    assert rescored['scores'] != base['scores']
+
+    redetected = keys(cache, opts=ProcessingOptions(smoothing_window=50))
+    assert redetected['signals'] == base['signals']
+    assert redetected['contractions'] != base['contractions']
+
+    assert keys(cache, file_hash="def")['signals'] != base['signals']
+
+
+def test_score_key_includes_every_session_parameter(tmp_path):
+    cache = AnalysisCache(tmp_path)
+    base = keys(cache)['scores']
+    for changed in ({'session_mvc_values': {'CH1': 1.0}},
+                    {'session_expected_long_left': 3},
+                    {'channel_muscle_mapping': {'CH1': 'Left Quadriceps'}},
+                    {'contraction_duration_threshold': 500}):
+        assert keys(cache, **changed)['scores'] != base, changed
+    # Canonical: equal values give equal keys regardless of how they were spelled
+    assert keys(cache, session_mvc_value=1)['scores'] == keys(cache, session_mvc_value=1.0)['scores']
+
+
+def test_layers_roundtrip(tmp_path):
+    cache = AnalysisCache(tmp_path)
+    emg_data = {'CH1 Raw': {'data': np.arange(5.0), 'sampling_rate': 1000.0}}
+    cache.save_signals('s', emg_data, {'level': '2'})
+    store, metadata = cache.load_signals('s')
+    np.testing.assert_array_equal(store.get_signal('CH1 Raw'), np.arange(5.0))
+    assert metadata == {'level': '2'}
+
+    detections = {'CH1': {'analytics': {'mav': 0.5}, 'contraction_stats': None}}
+    cache.save_detections('d', 's', detections, {'CH1': {'duration_ms': np.array([100.0])}})
+    loaded, tables = cache.load_detections('d', 's')
+    assert loaded == detections
+    assert tables['CH1']['duration_ms'].tolist() == [100.0]
+
+    result_path = tmp_path / "r_result.json"
+    result_path.write_bytes(b'{"file_id": "r"}')
+    cache.save_result('k', 's', result_path, hashlib.sha256(b'{"file_id": "r"}').hexdigest())
+    assert cache.load_result('k', 's') == {'file_id': 'r'}
+    result_path.unlink()
+    assert cache.load_result('k', 's') is None
+    assert cache.load_signals('missing') is None and cache.load_detections('missing', 's') is None
+
+
+def test_rewritten_results_are_a_miss(tmp_path):
+    cache = AnalysisCache(tmp_path)
+    result_path = tmp_path / "r_result.json"
+    result_path.write_bytes(b'{"score": 1}')
+    cache.save_result('k', 's', result_path, hashlib.sha256(b'{"score": 1}').hexdigest())
+
+    result_path.write_bytes(b'{"score": 2}')  # e.g. rescored with other parameters
+
+    assert cache.load_result_bytes('k', 's') is None
+    assert not (tmp_path / "scores" / "s" / "k").exists()
+
+
+def test_discard_content_removes_every_derived_entry(tmp_path):
+    cache = AnalysisCache(tmp_path)
+    base = keys(cache)
+    other = keys(cache, file_hash="def")
+    for layer_keys in (base, other):
+        cache.save_signals(layer_keys['signals'], {'CH1 Raw': {'data': np.arange(5.0), 'sampling_rate': 1000.0}}, {})
+        cache.save_detections(layer_keys['contractions'], layer_keys['signals'], {}, {})
+        cache.save_result(layer_keys['scores'], layer_keys['signals'], tmp_path / "r_result.json", "0" * 64)
+
+    cache.discard_content("abc")
+
+    assert cache.load_signals(base['signals']) is None
+    assert cache.load_detections(base['contractions'], base['signals']) is None
+    assert not (tmp_path / "scores" / base['signals']).exists()
+    assert cache.load_signals(other['signals']) is not None
+    assert cache.load_detections(other['contractions'], other['signals']) is not None
+
+
+def test_entries_of_the_ungrouped_layout_are_removed(tmp_path):
+    (tmp_path / "contractions").mkdir()
+    (tmp_path / "contractions" / "d.json").write_text('{}')
+    (tmp_path / "scores").mkdir()
+    (tmp_path / "scores" / "k").write_text('/results/r_result.json')
+
+    AnalysisCache(tmp_path)
+
+    assert not any((tmp_path / "contractions").iterdir()) and not any((tmp_path / "scores").iterdir())
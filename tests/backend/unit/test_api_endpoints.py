@@ -0,0 +1,678 @@
+import io
+import json
+import time
+import asyncio
+import builtins
+import hashlib
+import threading
+import pytest
+from datetime import datetime
+import numpy as np
+import ezc3d
+import httpx
+from unittest.mock import patch
+from concurrent.futures import ThreadPoolExecutor
+from starlette.datastructures import UploadFile
+from fastapi.testclient import TestClient
+
+from backend import api
+from backend.processor import GHOSTLYC3DProcessor, SignalContextCache, ParsedC3DCache
+from backend.analysis_cache import AnalysisCache
+from backend.results_index import ResultsIndex
+from backend.upload_store import UploadStore
+from backend.job_queue import JobQueue
+from backend.single_flight import SingleFlight
+
+
+def write_c3d(path, seconds=10, seed=0):
+    """Write a small GHOSTLY-like C3D file with CH1/CH2 Raw and activated channels."""
+    rng = np.random.default_rng(seed)
+    n_samples = int(seconds * 1000)
+    t = np.arange(n_samples) / 1000
+    c3d = ezc3d.c3d()
+    c3d['parameters']['POINT']['RATE']['value'] = [100]
+    c3d['parameters']['POINT']['LABELS']['value'] = ('M',)
+    c3d['parameters']['ANALOG']['RATE']['value'] = [1000.0]
+    c3d['parameters']['ANALOG']['LABELS']['value'] = ('CH1 Raw', 'CH1 activated', 'CH2 Raw', 'CH2 activated')
+    channels = []
+    for phase in (0.0, 1.0):
+        active = (np.sin(2 * np.pi * 0.2 * t + phase) > 0.6).astype(float)
+        raw = rng.standard_normal(n_samples) * (0.05 + active)
+        channels += [raw, np.abs(raw) * active]
+    points = np.zeros((4, 1, n_samples // 10))
+    points[3] = 1
+    c3d['data']['points'] = points
+    c3d['data']['analogs'] = np.stack(channels)[np.newaxis, :, :]
+    c3d.add_parameter('INFO', 'GAME_NAME', ['Test Game'])
+    c3d.add_parameter('INFO', 'GAME_LEVEL', ['1'])
+    c3d.write(str(path))
+    return path
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """An API client whose storage directories live in a temporary directory."""
+    for name in ('UPLOAD_DIR', 'RESULTS_DIR', 'PLOTS_DIR', 'CACHE_DIR'):
+        directory = tmp_path / name.lower()
+        directory.mkdir()
+        monkeypatch.setattr(api, name, directory)
+    monkeypatch.setattr(api, 'SIGNAL_CONTEXTS', SignalContextCache())
+    monkeypatch.setattr(api, 'PARSED_C3D', ParsedC3DCache())
+    monkeypatch.setattr(api, 'ANALYSIS_CACHE', AnalysisCache(tmp_path / 'cache_dir'))
+    monkeypatch.setattr(api, 'RESULTS_INDEX', ResultsIndex(tmp_path / 'results_index.sqlite3'))
+    monkeypatch.setattr(api, 'UPLOAD_STORE', UploadStore(tmp_path / 'upload_dir' / 'store'))
+    monkeypatch.setattr(api, 'JOBS', JobQueue(max_workers=1, max_queued=1))
+    monkeypatch.setattr(api, 'UPLOAD_FLIGHTS', SingleFlight())
+    monkeypatch.setattr(api, 'RENDER_FLIGHTS', SingleFlight())
+    return TestClient(api.app)
+
+
+@pytest.fixture
+def c3d_files(tmp_path):
+    return [write_c3d(tmp_path / f"session{i}.c3d", seed=i) for i in range(2)]
+
+
+def upload(client, path, **form):
+    with open(path, 'rb') as f:
+        response = client.post('/upload', files={'file': (path.name, f)}, data=form)
+    assert response.status_code == 200
+    return response.json()
+
+
+class TestLayeredCache:
+
+    def test_changing_scoring_parameters_only_rescores(self, client, c3d_files):
+        first = upload(client, c3d_files[0], session_mvc_value='1.0')
+
+        with patch('backend.processor.ezc3d.c3d') as parse, \
+                patch.object(GHOSTLYC3DProcessor, 'detect_channels') as detect:
+            rescored = upload(client, c3d_files[0], session_mvc_value='1.0',
+                              session_mvc_threshold_percentage='40')
+        parse.assert_not_called()
+        detect.assert_not_called()
+
+        assert rescored['file_id'] != first['file_id']
+        ch1_first, ch1_rescored = first['analytics']['CH1'], rescored['analytics']['CH1']
+        assert ch1_rescored['contraction_count'] == ch1_first['contraction_count']
+        # Without per-channel MVC values, each channel's MVC is initialized to its max amplitude
+        assert ch1_first['mvc_threshold_actual_value'] == pytest.approx(ch1_first['max_amplitude'] * 0.75)
+        assert ch1_rescored['mvc_threshold_actual_value'] == pytest.approx(ch1_first['max_amplitude'] * 0.4)
+
+    def test_cached_layers_reproduce_a_full_processing_run(self, client, c3d_files, tmp_path):
+        upload(client, c3d_files[0], session_mvc_value='1.0')
+        # Different detection parameters: reuses only the parsed signals
+        with patch('backend.processor.ezc3d.c3d') as parse:
+            layered = upload(client, c3d_files[0], threshold_factor='0.4', session_mvc_value='2.0')
+        parse.assert_not_called()
+
+        fresh_client_cache = AnalysisCache(tmp_path / 'fresh_cache')
+        with patch.object(api, 'ANALYSIS_CACHE', fresh_client_cache):
+            fresh = upload(client, c3d_files[0], threshold_factor='0.4', session_mvc_value='2.0')
+
+        assert layered['analytics'] == fresh['analytics']
+        assert layered['metadata']['session_parameters_used'] == fresh['metadata']['session_parameters_used']
+
+    def test_per_channel_scoring_inputs_are_part_of_the_key(self, client, c3d_files):
+        first = upload(client, c3d_files[0])
+        assert upload(client, c3d_files[0])['file_id'] == first['file_id']
+
+        response = client.post('/upload', files={'file': (c3d_files[0].name, c3d_files[0].read_bytes())},
+                               data={'session_expected_contractions_ch1': '4'})
+        assert response.json()['file_id'] != first['file_id']
+
+    def test_rescored_results_are_not_served_for_the_original_parameters(self, client, c3d_files):
+        first = upload(client, c3d_files[0], session_mvc_value='1.0')
+        client.post('/recalculate-scores', data={'result_id': first['file_id'], 'session_mvc_value': '1000'})
+
+        again = upload(client, c3d_files[0], session_mvc_value='1.0')
+
+        assert again['file_id'] != first['file_id']
+        assert again['analytics']['CH1']['good_contraction_count'] == first['analytics']['CH1']['good_contraction_count']
+
+
+class TestStreamedUpload:
+
+    def test_upload_is_read_in_chunks_and_renamed_into_place(self, client, c3d_files, monkeypatch):
+        monkeypatch.setattr(api, 'UPLOAD_CHUNK_SIZE', 4096)
+        read_sizes = []
+        original_read = UploadFile.read
+
+        async def recording_read(self, size=-1):
+            read_sizes.append(size)
+            return await original_read(self, size)
+
+        with patch.object(UploadFile, 'read', recording_read):
+            result = upload(client, c3d_files[0])
+            cached = upload(client, c3d_files[0])
+
+        assert read_sizes and set(read_sizes) == {4096}
+        assert cached['file_id'] == result['file_id']
+        content = c3d_files[0].read_bytes()
+        stored = list(api.UPLOAD_STORE.root.rglob("*.c3d"))
+        assert stored == [api.UPLOAD_STORE.path_for(hashlib.sha256(content).hexdigest())]
+        assert stored[0].read_bytes() == content
+        assert not list(api.UPLOAD_STORE.tmp_dir.iterdir())
+
+    def test_a_result_that_cannot_be_stored_fails_the_upload(self, client, c3d_files, monkeypatch):
+        def failing_put(row):
+            raise OSError("disk full")
+
+        monkeypatch.setattr(api.RESULTS_INDEX, 'put', failing_put)
+        with open(c3d_files[0], 'rb') as f:
+            response = client.post('/upload', files={'file': (c3d_files[0].name, f)})
+
+        assert response.status_code == 500
+        # Nothing refers to the stored upload, so it is not kept
+        assert not list(api.UPLOAD_STORE.root.rglob("*.c3d"))
+        assert not list(api.RESULTS_DIR.glob("*_result.json"))
+        assert api.RESULTS_INDEX.count() == 0
+
+    def test_identical_uploads_share_one_stored_file_until_the_last_result_is_deleted(self, client, c3d_files):
+        first = upload(client, c3d_files[0], session_mvc_value='1.0')
+        second = upload(client, c3d_files[0], session_mvc_value='2.0')
+        other = upload(client, c3d_files[1])
+        stored_path = api.UPLOAD_STORE.path_for(hashlib.sha256(c3d_files[0].read_bytes()).hexdigest())
+
+        assert first['file_id'] != second['file_id']
+        assert second['content_sha256'] == stored_path.stem  # recorded for rebuilding the index
+        assert len(list(api.UPLOAD_STORE.root.rglob("*.c3d"))) == 2
+        assert api.RESULTS_INDEX.get(second['file_id'])['upload_path'] == str(stored_path.resolve())
+
+        assert client.delete(f"/results/{first['file_id']}").status_code == 200
+        assert stored_path.exists()
+        signals_dir = api.ANALYSIS_CACHE.signals_dir
+        assert len(list(signals_dir.iterdir())) == 4
+        assert client.delete(f"/results/{second['file_id']}").status_code == 200
+        assert not stored_path.exists()
+        # Only the cache entries of the remaining upload are left
+        assert len(list(signals_dir.iterdir())) == 2
+        assert len(list(api.ANALYSIS_CACHE.contractions_dir.iterdir())) == 1
+        assert len(list(api.ANALYSIS_CACHE.scores_dir.iterdir())) == 1
+        assert api.RESULTS_INDEX.get(other['file_id'])['content_sha256'] is not None
+
+
+class TestBatchUpload:
+
+    def post_batch(self, client, files, **form):
+        response = client.post('/upload/batch', files=[('files', file) for file in files], data=form)
+        assert response.status_code == 200
+        assert response.headers['content-type'].startswith('application/x-ndjson')
+        return {entry['index']: entry for entry in map(json.loads, response.text.splitlines())}
+
+    def test_streams_one_line_per_file_and_isolates_failures(self, client, c3d_files):
+        files = [(path.name, path.read_bytes()) for path in c3d_files]
+        files += [('broken.c3d', b'not a c3d file'), ('notes.txt', b'hello')]
+
+        entries = self.post_batch(client, files, patient_id='p1', session_mvc_value='1.0')
+
+        assert [entries[i]['status'] for i in range(4)] == ['ok', 'ok', 'error', 'error']
+        assert entries[2]['detail'].startswith('Error processing file')
+        assert entries[3]['detail'] == "File must be a C3D file"
+        for entry in (entries[0], entries[1]):
+            assert entry['result']['patient_id'] == 'p1'
+            assert entry['result']['analytics']['CH1']['contraction_count'] > 0
+            assert (api.RESULTS_DIR / f"{entry['result']['file_id']}_result.json").exists()
+
+    def test_repeated_files_are_served_from_the_upload_cache(self, client, c3d_files):
+        first = upload(client, c3d_files[0], patient_id='p1')
+
+        entries = self.post_batch(client, [(c3d_files[0].name, c3d_files[0].read_bytes())], patient_id='p1')
+
+        assert entries[0]['status'] == 'cached'
+        assert entries[0]['result']['file_id'] == first['file_id']
+
+
+class TestAsyncUpload:
+
+    def post_async(self, client, path, **form):
+        with open(path, 'rb') as f:
+            return client.post('/upload', params={'async': 'true'}, files={'file': (path.name, f)}, data=form)
+
+    def wait_for(self, client, job_id, timeout=30):
+        deadline = time.time() + timeout
+        while True:
+            job = client.get(f"/jobs/{job_id}").json()
+            if job['state'] in ('succeeded', 'failed') or time.time() > deadline:
+                return job
+            time.sleep(0.05)
+
+    def test_job_reports_stage_timings_and_the_result(self, client, c3d_files):
+        response = self.post_async(client, c3d_files[0], patient_id='p1')
+        assert response.status_code == 202
+        job_id = response.json()['job_id']
+        assert response.headers['location'] == f"/jobs/{job_id}"
+
+        job = self.wait_for(client, job_id)
+
+        assert job['state'] == 'succeeded', job['error']
+        assert {'upload', 'queued', 'signals', 'contractions', 'scores', 'store'} <= set(job['timings'])
+        assert job['result']['patient_id'] == 'p1'
+        assert client.get(f"/results/{job['result']['file_id']}").status_code == 200
+        # The same file again is answered from the upload cache, already complete
+        cached = self.post_async(client, c3d_files[0], patient_id='p1').json()
+        assert cached['state'] == 'succeeded' and cached['result']['file_id'] == job['result']['file_id']
+        assert client.get("/jobs/unknown").status_code == 404
+
+    def test_full_queue_is_refused_with_retry_after(self, client, c3d_files):
+        release = threading.Event()
+        original = api._process_upload
+
+        def blocked(*args, **kwargs):
+            release.wait(30)
+            return original(*args, **kwargs)
+
+        with patch.object(api, '_process_upload', blocked):
+            accepted = [self.post_async(client, path) for path in c3d_files]
+            refused = self.post_async(client, c3d_files[0], session_mvc_value='3.0')
+            release.set()
+
+        assert [response.status_code for response in accepted] == [202, 202]
+        assert refused.status_code == 429
+        assert int(refused.headers['retry-after']) >= 1
+        for response in accepted:
+            assert self.wait_for(client, response.json()['job_id'])['state'] == 'succeeded'
+
+
+class TestCoalescing:
+
+    def send_together(self, flights, send, count, release):
+        """Send `count` requests at once and let the computation finish once the others wait on it."""
+        with ThreadPoolExecutor(max_workers=count) as pool:
+            futures = [pool.submit(send) for _ in range(count)]
+            deadline = time.time() + 30
+            while flights.coalesced < count - 1 and time.time() < deadline:
+                time.sleep(0.01)
+            release.set()
+            return [future.result() for future in futures]
+
+    def test_identical_concurrent_uploads_are_processed_once(self, client, c3d_files):
+        original, release, processed = api._process_upload, threading.Event(), []
+
+        def held(*args, **kwargs):
+            processed.append(args[1])
+            release.wait(30)
+            return original(*args, **kwargs)
+
+        with patch.object(api, '_process_upload', held):
+            results = self.send_together(api.UPLOAD_FLIGHTS, lambda: upload(client, c3d_files[0], patient_id='p1'),
+                                         3, release)
+
+        assert len(processed) == 1
+        assert {result['file_id'] for result in results} == set(processed)
+        assert api.RESULTS_INDEX.count() == 1
+        assert not list(api.UPLOAD_STORE.tmp_dir.iterdir())
+
+    def test_identical_concurrent_plot_requests_render_once(self, client, c3d_files):
+        result = upload(client, c3d_files[0])
+        release, rendered = threading.Event(), []
+
+        def plot(self, channel, save_path):
+            rendered.append(channel)
+            release.wait(30)
+            with open(save_path, 'wb') as f:
+                f.write(b'png')
+
+        with patch.object(GHOSTLYC3DProcessor, 'plot_emg_with_contractions', plot, create=True):
+            responses = self.send_together(
+                api.RENDER_FLIGHTS,
+                lambda: client.get(f"/plot/{result['file_id']}/CH1", params={'regenerate': 'true'}), 2, release)
+
+        assert [response.status_code for response in responses] == [200, 200]
+        assert rendered == ['CH1']
+
+
+def test_results_are_served_as_the_stored_json(client, c3d_files):
+    with open(c3d_files[0], 'rb') as f:
+        uploaded = client.post('/upload', files={'file': (c3d_files[0].name, f)}, data={'session_mvc_value': '1.0'})
+    result_id = uploaded.json()['file_id']
+    stored = (api.RESULTS_DIR / f"{result_id}_result.json").read_bytes()
+
+    assert uploaded.content == stored
+    fetched = client.get(f"/results/{result_id}")
+    assert fetched.headers['content-type'] == 'application/json' and fetched.content == stored
+    with open(c3d_files[0], 'rb') as f:
+        cached = client.post('/upload', files={'file': (c3d_files[0].name, f)}, data={'session_mvc_value': '1.0'})
+    assert cached.content == stored
+
+    recalculated = client.post('/recalculate-scores', data={'result_id': result_id, 'session_mvc_value': '2.0'})
+    assert recalculated.content == (api.RESULTS_DIR / f"{result_id}_result.json").read_bytes() != stored
+    assert api.EMGAnalysisResult.model_validate_json(recalculated.content).file_id == result_id
+
+
+class TestHTTPCaching:
+
+    def test_results_are_revalidated_by_version(self, client, c3d_files):
+        result_id = upload(client, c3d_files[0], patient_id='p1', session_mvc_value='1.0')['file_id']
+        first = client.get(f"/results/{result_id}", headers={'Accept-Encoding': 'identity'})
+        etag = first.headers['etag']
+        assert first.headers['cache-control'] == 'no-cache'
+        assert first.headers['x-result-version'] == hashlib.sha256(first.content).hexdigest()
+
+        unchanged = client.get(f"/results/{result_id}", headers={'If-None-Match': etag})
+        assert unchanged.status_code == 304 and unchanged.content == b''
+
+        compressed = client.get(f"/results/{result_id}", headers={'Accept-Encoding': 'gzip'})
+        assert compressed.headers['content-encoding'] == 'gzip'
+        assert compressed.headers['etag'] == etag[:-1] + '-gzip"'
+        assert compressed.content == first.content
+        assert client.get(f"/results/{result_id}",
+                          headers={'If-None-Match': compressed.headers['etag']}).status_code == 304
+        # NDJSON streams stay uncompressed so that each line is sent as soon as it is produced
+        stream = client.get("/patients/p1/results", params={'stream': True}, headers={'Accept-Encoding': 'gzip'})
+        assert stream.status_code == 200 and 'content-encoding' not in stream.headers
+
+        client.post('/recalculate-scores', data={'result_id': result_id, 'session_mvc_value': '2.0'})
+        changed = client.get(f"/results/{result_id}", headers={'If-None-Match': etag})
+        assert changed.status_code == 200 and changed.headers['etag'] != etag
+
+    def test_raw_data_etag_depends_on_the_request(self, client, c3d_files):
+        result_id = upload(client, c3d_files[0])['file_id']
+        url = f"/raw-data/{result_id}/CH1"
+        full = client.get(url)
+        window = client.get(url, params={'max_points': 200})
+        npy = client.get(url, params={'format': 'npy'})
+        assert len({full.headers['etag'], window.headers['etag'], npy.headers['etag']}) == 3
+        assert 'content-encoding' not in npy.headers
+        for response, params in ((full, {}), (window, {'max_points': 200}), (npy, {'format': 'npy'})):
+            revalidated = client.get(url, params=params, headers={'If-None-Match': response.headers['etag']})
+            assert revalidated.status_code == 304
+            # The format is negotiated from Accept, so every response varies on it
+            assert all('Accept' in r.headers['vary'].split(', ') for r in (response, revalidated))
+        for response in (client.get(url, params={'format': 'npy'}, headers={'Range': 'bytes=999999999-'}),
+                         client.get(url, params={'format': 'npy', 'max_points': 100}),
+                         client.get("/raw-data/missing/CH1")):
+            assert response.status_code in (416, 400, 404) and 'Accept' in response.headers['vary'].split(', ')
+
+    def test_plots_are_immutable_per_version(self, client, c3d_files):
+        result_id = upload(client, c3d_files[0])['file_id']
+        renders = []
+
+        def plot(self, channel, save_path):
+            renders.append(save_path)
+            with open(save_path, 'wb') as f:
+                f.write(b'png')
+
+        with patch.object(GHOSTLYC3DProcessor, 'plot_emg_with_contractions', plot, create=True):
+            latest = client.get(f"/plot/{result_id}/CH1")
+            version = latest.headers['x-result-version']
+            assert latest.headers['cache-control'] == 'no-cache'
+            pinned = client.get(f"/plot/{result_id}/CH1", params={'version': version})
+            assert pinned.headers['cache-control'] == 'public, max-age=31536000, immutable'
+            assert client.get(f"/plot/{result_id}/CH1",
+                              headers={'If-None-Match': latest.headers['etag']}).status_code == 304
+
+            client.post('/recalculate-scores', data={'result_id': result_id, 'session_mvc_value': '2.0'})
+            rerendered = client.get(f"/plot/{result_id}/CH1", params={'version': version})
+
+        assert rerendered.headers['x-result-version'] != version
+        assert rerendered.headers['cache-control'] == 'no-cache'
+        assert len(renders) == 2 and renders[0] != renders[1]
+
+
+def test_raw_data_windows_are_decimated_from_the_waveform_pyramid(client, c3d_files):
+    result = upload(client, c3d_files[0], session_mvc_value='1.0')
+    result_id = result['file_id']
+    assert (api.RESULTS_DIR / f"{result_id}_result_waveform.bin").exists()
+    full = client.get(f"/raw-data/{result_id}/CH1").json()
+    assert full['samples_per_bucket'] is None and len(full['data']) == 10000
+
+    overview = client.get(f"/raw-data/{result_id}/CH1", params={'max_points': 500}).json()
+    assert len(overview['data']) <= 500 and overview['samples_per_bucket'] > 1
+    assert max(overview['data']) == max(full['data']) and min(overview['data']) == min(full['data'])
+    assert len(overview['activated_data']) == len(overview['data'])
+
+    zoomed = client.get(f"/raw-data/{result_id}/CH1",
+                        params={'start_ms': 2000, 'end_ms': 2300, 'max_points': 500}).json()
+    assert zoomed['samples_per_bucket'] == 1
+    assert zoomed['data'] == full['data'][2000:2300]
+    assert zoomed['time_axis'][0] == pytest.approx(2.0)
+    assert all(c['end_time_ms'] >= 2000 and c['start_time_ms'] <= 2300 for c in zoomed['contractions'])
+    assert len(zoomed['contractions']) < len(full['contractions'])
+
+    assert client.get(f"/raw-data/{result_id}/CH1", params={'start_ms': 500, 'end_ms': 100}).status_code == 400
+    assert client.get(f"/raw-data/{result_id}/CH1", params={'max_points': 1}).status_code == 422
+
+
+def test_raw_data_is_served_as_npy_with_range_requests(client, c3d_files, monkeypatch):
+    result_id = upload(client, c3d_files[0])['file_id']
+    url = f"/raw-data/{result_id}/CH1"
+    signal = np.asarray(client.get(url).json()['data'])
+
+    response = client.get(url, headers={'Accept': 'application/octet-stream'})
+    assert response.status_code == 200 and response.headers['accept-ranges'] == 'bytes'
+    assert response.headers['x-channel-name'] == 'CH1 Raw' and float(response.headers['x-sampling-rate']) == 1000.0
+    np.testing.assert_array_equal(np.load(io.BytesIO(response.content)), signal)
+
+    window = client.get(url, params={'format': 'npy', 'start_ms': 2000, 'end_ms': 2500})
+    assert window.headers['x-start-sample'] == '2000'
+    np.testing.assert_array_equal(np.load(io.BytesIO(window.content)), signal[2000:2500])
+
+    tail = client.get(url, params={'format': 'npy'}, headers={'Range': 'bytes=-800'})
+    assert tail.status_code == 206
+    assert tail.headers['content-range'] == f"bytes {len(response.content) - 800}-{len(response.content) - 1}/{len(response.content)}"
+    assert tail.content == response.content[-800:]
+    assert client.get(url, params={'format': 'npy'}, headers={'Range': 'bytes=999999999-'}).status_code == 416
+    assert client.get(url, params={'format': 'npy', 'max_points': 100}).status_code == 400
+
+    monkeypatch.setattr(api, 'pa', None)
+    assert client.get(url, headers={'Accept': 'application/vnd.apache.arrow.stream'}).status_code == 406
+
+
+def test_sweep_reports_every_grid_point(client, c3d_files):
+    result = upload(client, c3d_files[0], session_mvc_value='1.0')
+    grid = {'threshold_factors': [0.3, 0.5], 'min_durations_ms': [50, 100, 200], 'smoothing_windows': [25]}
+
+    response = client.post(f"/sweep/{result['file_id']}", json=grid)
+
+    assert response.status_code == 200
+    channels = response.json()['channels']
+    assert set(channels) == {'CH1', 'CH2'}
+    assert len(channels['CH1']['grid']) == 6
+    # The upload used the default detection parameters (0.3, 50 ms, 25 samples)
+    default_point = next(point for point in channels['CH1']['grid']
+                         if point['threshold_factor'] == 0.3 and point['min_duration_ms'] == 50)
+    assert default_point['stats']['contraction_count'] == result['analytics']['CH1']['contraction_count']
+    assert channels['CH1']['mvc_threshold_actual_value'] == result['analytics']['CH1']['mvc_threshold_actual_value']
+    assert client.post('/sweep/missing', json=grid).status_code == 404
+
+
+def test_plots_reports_and_debug_views_share_one_parse(client, c3d_files):
+    result = upload(client, c3d_files[0])
+    result_id = result['file_id']
+
+    def fake_plot(self, save_path, channel=None):
+        assert self.emg_data and self.c3d is not None
+        with open(save_path, 'wb') as f:
+            f.write(b'png')
+
+    with patch.object(GHOSTLYC3DProcessor, 'load_file', autospec=True,
+                      side_effect=GHOSTLYC3DProcessor.load_file) as parse, \
+            patch.object(GHOSTLYC3DProcessor, 'plot_emg_with_contractions', fake_plot), \
+            patch.object(GHOSTLYC3DProcessor, 'plot_ghostly_report', fake_plot):
+        for channel in ('CH1 Raw', 'CH2 Raw', 'CH1 activated'):
+            assert client.get(f"/plot/{result_id}/{channel}").status_code == 200
+        assert client.get(f"/report/{result_id}").status_code == 200
+        content_sha256 = api.RESULTS_INDEX.get(result_id)['content_sha256']
+        assert 'ANALOG' in client.get(f"/debug/file-structure/{content_sha256}.c3d").json()
+
+    assert parse.call_count == 1
+    stats = client.get("/debug/parsed-c3d-cache").json()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (4, 1, 1)
+
+    artifacts = [api.RESULTS_DIR / f"{result_id}{suffix}" for suffix in (
+        "_result.json", "_result_raw_emg.bin", "_result_waveform.bin", "_result_contractions.npz")]
+    assert all(path.exists() for path in artifacts)
+
+    assert client.delete(f"/results/{result_id}").status_code == 200
+    assert content_sha256 not in api.PARSED_C3D
+    assert client.get(f"/plot/{result_id}/CH1 Raw").status_code == 404
+    assert not any(path.exists() for path in artifacts)
+    assert not (api.PLOTS_DIR / result_id).exists()
+
+
+class TestResultsIndex:
+
+    def test_lookups_are_served_from_the_index(self, client, c3d_files):
+        first = upload(client, c3d_files[0], patient_id='p1', session_id='s1')
+        second = upload(client, c3d_files[1], patient_id='p1', session_id='s2')
+        other = upload(client, c3d_files[0], patient_id='p2')
+
+        with patch.object(type(api.RESULTS_DIR), 'glob', side_effect=AssertionError("directory scan")):
+            assert sorted(client.get("/patients").json()) == ['p1', 'p2']
+            history = client.get("/patients/p1/results").json()
+            assert [r['session_id'] for r in history] == ['s1', 's2']
+            assert client.get(f"/results/{second['file_id']}").json()['patient_id'] == 'p1'
+            assert len(client.get("/results").json()) == 3
+            assert client.get("/results/missing").status_code == 404
+
+        assert client.delete(f"/results/{other['file_id']}").status_code == 200
+        assert client.get("/patients").json() == ['p1']
+        assert not (api.RESULTS_DIR / f"{other['file_id']}_result.json").exists()
+        assert client.delete(f"/results/{other['file_id']}").status_code == 404
+        assert api.RESULTS_INDEX.get(first['file_id'])['upload_path'].endswith('.c3d')
+
+    def test_query_filters_pages_and_projects(self, client, c3d_files):
+        ids = [upload(client, c3d_files[i % 2], patient_id='p1', session_id=f's{i}')['file_id'] for i in range(3)]
+        upload(client, c3d_files[0], patient_id='p2')
+
+        query = {'patient_id': 'p1', 'order': 'desc', 'limit': 2, 'exclude': 'analytics.*.contractions'}
+        first = client.get("/results/query", params=query).json()
+        second = client.get("/results/query", params={**query, 'cursor': first['next_cursor']}).json()
+
+        assert [item['file_id'] for item in first['items'] + second['items']] == ids[::-1]
+        assert second['next_cursor'] is None
+        channel = first['items'][0]['analytics']['CH1']
+        assert 'contractions' not in channel and channel['contraction_count'] > 0
+
+        ids_only = client.get("/results/query", params={'fields': 'file_id,session_id', 'game_name': 'Test Game'})
+        assert [set(item) for item in ids_only.json()['items']] == [{'file_id', 'session_id'}] * 4
+
+        today = datetime.now().date().isoformat()
+        assert len(client.get("/results/query", params={'date_from': today, 'date_to': today}).json()['items']) == 4
+        assert client.get("/results/query", params={'date_to': '2000-01-01'}).json()['items'] == []
+        assert client.get("/results/query", params={'date_from': 'yesterday'}).status_code == 400
+        assert client.get("/results/query", params={'sort': 'score', 'cursor': first['next_cursor']}).status_code == 400
+
+    def test_patient_history_streams_one_session_per_line(self, client, c3d_files, monkeypatch):
+        monkeypatch.setattr(api, 'HISTORY_PAGE_SIZE', 2)
+        ids = [upload(client, c3d_files[i % 2], patient_id='p1', session_id=f's{i}')['file_id'] for i in range(3)]
+
+        response = client.get("/patients/p1/results", params={'stream': 'true', 'summary': 'true'})
+
+        assert response.headers['content-type'].startswith('application/x-ndjson')
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line['file_id'] for line in lines] == ids
+        assert all('contractions' not in channel for line in lines for channel in line['analytics'].values())
+
+        full = client.get("/patients/p1/results", headers={'Accept': 'application/x-ndjson'}).text.splitlines()
+        assert json.loads(full[0])['analytics']['CH1']['contractions']
+        assert client.get("/patients/p1/results").json() == [json.loads(line) for line in full]
+
+    def test_trends_are_updated_by_uploads_and_recalculations(self, client, c3d_files):
+        first = upload(client, c3d_files[0], patient_id='p1', session_mvc_value='1.0')
+        second = upload(client, c3d_files[1], patient_id='p1', session_mvc_value='1.0')
+
+        trends = client.get("/patients/p1/trends", params={'period': 'day'}).json()
+        ch1 = trends['channels']['CH1']
+        assert len(ch1) == 1 and ch1[0]['sessions'] == 2
+        sessions = [first['analytics']['CH1'], second['analytics']['CH1']]
+        assert ch1[0]['contraction_count'] == sum(s['contraction_count'] for s in sessions)
+        assert ch1[0]['avg_rms'] == pytest.approx(sum(s['rms'] for s in sessions) / 2)
+
+        recalculated = client.post("/recalculate-scores", data={'result_id': first['file_id'],
+                                                                'session_mvc_value': '1000'}).json()
+        assert recalculated['analytics']['CH1']['good_contraction_count'] == 0
+        week = client.get("/patients/p1/trends", params={'channel': 'CH1'}).json()['channels']['CH1'][0]
+        assert week['good_contraction_count'] == second['analytics']['CH1']['good_contraction_count'] > 0
+        assert client.get("/patients/p1/trends", params={'period': 'month'}).status_code == 422
+
+    def test_recalculation_updates_the_index_entry(self, client, c3d_files):
+        result = upload(client, c3d_files[0], patient_id='p1')
+        upload_path = api.RESULTS_INDEX.get(result['file_id'])['upload_path']
+
+        response = client.post("/recalculate-scores", data={'result_id': result['file_id'], 'session_mvc_value': '2.0'})
+
+        assert response.status_code == 200
+        row = api.RESULTS_INDEX.get(result['file_id'])
+        assert row['upload_path'] == upload_path and row['patient_id'] == 'p1'
+
+
+# Every file open, stat and results index call in the loop-lag test takes this long;
+# a single one on the event loop exceeds the budget
+SLOW_CALL_S = 0.2
+MAX_LOOP_LAG_S = 0.1
+# The results index methods called by endpoints
+INDEX_METHODS = ('transaction', 'put', 'delete', 'trends', 'get', 'list_results', 'patients',
+                 'patient_results', 'query', 'content_references', 'count')
+
+
+def test_concurrent_requests_never_block_the_event_loop(client, c3d_files, tmp_path, monkeypatch):
+    kept = upload(client, c3d_files[0], patient_id='p1', session_mvc_value='1.0')['file_id']
+    rescored = upload(client, c3d_files[1], patient_id='p2')['file_id']
+    deleted = upload(client, write_c3d(tmp_path / "session2.c3d", seed=2), patient_id='p2')['file_id']
+    content_sha256 = api.RESULTS_INDEX.get(kept)['content_sha256']
+    c3d_content = c3d_files[0].read_bytes()
+
+    loop_thread, on_loop = None, []
+
+    def slowed(name, fn, applies=lambda *args: True):
+        def slow(*args, **kwargs):
+            if applies(*args):
+                if threading.get_ident() == loop_thread:
+                    on_loop.append(name)
+                time.sleep(SLOW_CALL_S)
+            return fn(*args, **kwargs)
+        return slow
+
+    slow_open = slowed('open', io.open)
+    monkeypatch.setattr(builtins, 'open', slow_open)
+    monkeypatch.setattr(io, 'open', slow_open)
+    # Path.exists/stat and os.path.exists/getsize all go through os.stat; only the API's
+    # storage is slowed down (not e.g. the source files read for tracebacks and warnings)
+    monkeypatch.setattr(api.os, 'stat', slowed('stat', api.os.stat,
+                                               lambda path, *args: str(path).startswith(str(tmp_path))))
+    for name in INDEX_METHODS:
+        monkeypatch.setattr(api.RESULTS_INDEX, name, slowed(f'RESULTS_INDEX.{name}', getattr(api.RESULTS_INDEX, name)))
+
+    async def send_all():
+        nonlocal loop_thread
+        loop_thread = threading.get_ident()
+        lag, done = 0.0, asyncio.Event()
+
+        async def heartbeat():
+            nonlocal lag
+            while not done.is_set():
+                before = time.perf_counter()
+                await asyncio.sleep(0.005)
+                lag = max(lag, time.perf_counter() - before - 0.005)
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app), base_url="http://test") as http:
+            beat = asyncio.create_task(heartbeat())
+            responses = await asyncio.gather(
+                http.get(f"/results/{kept}"),
+                http.get(f"/raw-data/{kept}/CH1"),
+                http.get(f"/raw-data/{kept}/CH1", params={'start_ms': 1000, 'end_ms': 9000, 'max_points': 200}),
+                http.get(f"/raw-data/{kept}/CH1", params={'format': 'npy'}, headers={'Range': 'bytes=0-99'}),
+                http.get("/results/query", params={'patient_id': 'p1', 'fields': 'file_id,analytics'}),
+                http.get("/results"),
+                http.get("/patients/p1/results"),
+                http.get("/patients/p1/results", params={'stream': True}),
+                http.get("/patients/p1/trends"),
+                http.post(f"/sweep/{kept}", json={'threshold_factors': [0.3], 'min_durations_ms': [50],
+                                                  'smoothing_windows': [25]}),
+                http.post("/recalculate-scores", data={'result_id': rescored, 'session_mvc_value': '2.0'}),
+                http.delete(f"/results/{deleted}"),
+                http.get(f"/debug/file-structure/{content_sha256}"),
+                # Served from the analysis cache once spooled
+                http.post("/upload", files={'file': ("session0.c3d", c3d_content)},
+                          data={'patient_id': 'p1', 'session_mvc_value': '1.0'}),
+            )
+            done.set()
+            await beat
+        return lag, responses
+
+    lag, responses = asyncio.run(send_all())
+
+    assert [response.status_code for response in responses] == [200] * 3 + [206] + [200] * 10
+    assert not on_loop, f"blocking calls on the event loop: {sorted(set(on_loop))}"
+    assert lag < MAX_LOOP_LAG_S, f"event loop blocked for {lag * 1000:.0f} ms"
@@ -0,0 +1,253 @@
+import tracemalloc
+import pytest
+import numpy as np
+from unittest.mock import patch
+
+from backend import emg_analysis
+from backend.emg_analysis import (
+    ANALYSIS_FUNCTIONS,
+    SignalContext,
+    run_analysis_function,
+    calculate_mpf,
+    calculate_mdf,
+    calculate_fatigue_index_fi_nsm5,
+)
+
+
+@pytest.fixture
+def emg_signal():
+    rng = np.random.default_rng(7)
+    t = np.arange(5000) / 1000
+    return np.sin(2 * np.pi * 60 * t) + 0.5 * rng.standard_normal(t.size)
+
+
+class TestSignalContext:
+
+    def test_registry_shares_one_psd_per_signal(self, emg_signal):
+        """MPF, MDF and FI_nsm5 reuse a single Welch estimate through the context."""
+        context = SignalContext(emg_signal, 1000)
+        with patch.object(emg_analysis, 'welch', wraps=emg_analysis.welch) as welch:
+            for func in ANALYSIS_FUNCTIONS.values():
+                run_analysis_function(func, emg_signal, 1000, context=context)
+        assert welch.call_count == 1
+
+    def test_context_results_match_standalone_calls(self, emg_signal):
+        context = SignalContext(emg_signal, 1000)
+        for func in (calculate_mpf, calculate_mdf, calculate_fatigue_index_fi_nsm5):
+            assert func(emg_signal, 1000, context=context) == func(emg_signal, 1000)
+
+    def test_unmarked_functions_keep_plain_signature(self, emg_signal):
+        def peak(signal, sampling_rate):
+            return {"peak": float(np.max(signal))}
+
+        result = run_analysis_function(peak, emg_signal, 1000, context=SignalContext(emg_signal, 1000))
+        assert result == {"peak": float(np.max(emg_signal))}
+
+    def test_envelopes_are_memoized_per_window(self, emg_signal):
+        context = SignalContext(emg_signal, 1000)
+        assert context.envelope(25) is context.envelope(25)
+        assert context.envelope(25) is not context.envelope(50)
+        assert context.cached_windows == [25, 50]
+        assert not context.envelope(25).flags.writeable
+
+    def test_envelope_memo_is_bounded_in_bytes(self, emg_signal):
+        context = SignalContext(emg_signal, 1000, max_envelope_bytes=2 * emg_signal.nbytes)
+        detection_envelope = context.envelope(25)
+        for window in (10, 50):
+            context.envelope(window)
+        assert context.cached_windows == [10, 50]
+
+        context.envelope(10)  # recently used windows are kept
+        context.envelope(100)
+        assert context.cached_windows == [10, 100]
+        assert context.envelope(25) is not detection_envelope
+        assert context.nbytes == 3 * emg_signal.nbytes  # two envelopes and the rectified signal
+
+    @pytest.mark.parametrize("window", [1, 2, 25, 100, 4999, 5000])
+    def test_cumulative_sum_envelope_matches_convolution(self, emg_signal, window):
+        rectified = np.abs(emg_signal)
+        expected = np.convolve(rectified, np.ones(window) / window, mode='same')
+        np.testing.assert_allclose(emg_analysis.moving_average_envelope(rectified, window), expected,
+                                   rtol=0, atol=1e-12)
+
+    def test_sweep_reuses_context_envelopes(self, emg_signal):
+        context = SignalContext(emg_signal, 1000)
+        detection_envelope = context.envelope(25)
+        with patch.object(emg_analysis, 'moving_average_envelope',
+                          wraps=emg_analysis.moving_average_envelope) as envelope:
+            emg_analysis.sweep_contraction_parameters(emg_signal, 1000, [0.3], [50], [25, 50], context=context)
+        assert envelope.call_count == 1
+        assert context.envelope(25) is detection_envelope
+
+
+def _legacy_bursts(above_threshold, min_duration_samples, merge_threshold_samples, refractory_period_samples):
+    """Loop-based reference for steps 4-6 of analyze_contractions, as originally written."""
+    diff = np.diff(above_threshold.astype(int))
+    starts = np.where(diff == 1)[0] + 1
+    ends = np.where(diff == -1)[0] + 1
+    if above_threshold[0]:
+        starts = np.insert(starts, 0, 0)
+    if above_threshold[-1] and (len(ends) == 0 or ends[-1] < len(above_threshold) - 1):
+        ends = np.append(ends, len(above_threshold) - 1)
+
+    valid = []
+    for i, (start_idx, end_idx) in enumerate(zip(starts, ends)):
+        if end_idx - start_idx >= min_duration_samples:
+            if refractory_period_samples > 0 and i > 0:
+                last_end = valid[-1][1] if valid else 0
+                if start_idx - last_end < refractory_period_samples:
+                    continue
+            valid.append((start_idx, end_idx))
+
+    if merge_threshold_samples > 0 and valid:
+        merged = [valid[0]]
+        for current_start, current_end in valid[1:]:
+            prev_start, prev_end = merged[-1]
+            if current_start - prev_end <= merge_threshold_samples:
+                merged[-1] = (prev_start, current_end)
+            else:
+                merged.append((current_start, current_end))
+        valid = merged
+    return valid
+
+
+class TestBurstDetection:
+
+    @pytest.mark.parametrize("seed", range(5))
+    @pytest.mark.parametrize("min_duration, merge, refractory", [
+        (0, 0, 0), (5, 0, 0), (5, 20, 0), (3, 10, 15), (1, 0, 40),
+    ])
+    def test_matches_loop_reference_on_noisy_masks(self, seed, min_duration, merge, refractory):
+        rng = np.random.default_rng(seed)
+        above_threshold = rng.random(20000) > rng.uniform(0.3, 0.7)
+        above_threshold[0] = seed % 2 == 0
+        above_threshold[-1] = seed % 3 == 0
+
+        starts, ends = emg_analysis._find_bursts(above_threshold)
+        starts, ends = emg_analysis._filter_bursts(starts, ends, min_duration, refractory)
+        if merge > 0:
+            starts, ends = emg_analysis._merge_bursts(starts, ends, merge)
+
+        expected = _legacy_bursts(above_threshold, min_duration, merge, refractory)
+        assert list(zip(starts.tolist(), ends.tolist())) == [(int(s), int(e)) for s, e in expected]
+
+    @pytest.mark.parametrize("mask, expected", [
+        ([False, False, False], []),
+        ([True, True, True], [(0, 2)]),
+        ([False, True, True, False, True], [(1, 3), (4, 4)]),
+    ])
+    def test_boundary_runs(self, mask, expected):
+        starts, ends = emg_analysis._find_bursts(np.array(mask))
+        assert list(zip(starts.tolist(), ends.tolist())) == expected
+
+
+class TestContractionFeatures:
+
+    def test_batched_features_match_per_segment_slicing(self):
+        rng = np.random.default_rng(3)
+        rectified = np.abs(rng.standard_normal(2000))
+        envelope = np.convolve(rectified, np.ones(25) / 25, mode='same')
+        starts = np.array([0, 150, 900, 1990])
+        ends = np.array([100, 400, 901, 1999])
+
+        features = emg_analysis.extract_contraction_features(rectified, envelope, starts, ends, 1000)
+
+        for i, (start, end) in enumerate(zip(starts, ends)):
+            segment = rectified[start:end + 1]
+            segment_envelope = envelope[start:end + 1]
+            assert features['max_amplitude'][i] == pytest.approx(np.max(segment))
+            assert features['mean_amplitude'][i] == pytest.approx(np.mean(segment))
+            assert features['rms'][i] == pytest.approx(np.sqrt(np.mean(segment ** 2)))
+            assert features['area_under_envelope'][i] == pytest.approx(np.sum(segment_envelope) / 1000)
+            assert features['time_to_peak_ms'][i] == np.argmax(segment_envelope)
+            assert features['duration_ms'][i] == end - start
+
+    def test_rise_and_fall_times_of_a_triangle(self):
+        envelope = np.concatenate([np.linspace(0, 1, 101), np.linspace(1, 0, 201)[1:]])
+        features = emg_analysis.extract_contraction_features(
+            envelope, envelope, np.array([0]), np.array([len(envelope) - 1]), 1000)
+
+        assert features['time_to_peak_ms'][0] == 100
+        assert features['rise_time_ms'][0] == pytest.approx(80, abs=1)
+        assert features['fall_time_ms'][0] == pytest.approx(160, abs=1)
+
+    def test_analyze_contractions_returns_plain_python_values(self):
+        signal = np.zeros(3000)
+        signal[500:900] = 1.0
+        signal[2000:2300] = 0.5
+
+        result = emg_analysis.analyze_contractions(
+            signal, 1000, threshold_factor=0.3, min_duration_ms=50,
+            smoothing_window=25, mvc_amplitude_threshold=0.8)
+
+        assert result['contraction_count'] == 2
+        assert result['good_contraction_count'] == 1
+        assert [c['is_good'] for c in result['contractions']] == [True, False]
+        for contraction in result['contractions']:
+            assert all(type(value) in (float, bool) for value in contraction.values())
+
+
+def test_score_contractions_is_vectorized_over_the_table():
+    table = {
+        'duration_ms': np.array([100.0, 250.0, 600.0]),
+        'max_amplitude': np.array([0.9, 0.4, 1.2]),
+    }
+    scores = emg_analysis.score_contractions(table, mvc_amplitude_threshold=0.8, duration_threshold_ms=250)
+
+    assert scores['is_good'].tolist() == [True, False, True]
+    assert scores['is_long'].tolist() == [False, True, True]
+    assert scores['good_contraction_count'] == 2
+    assert (scores['long_contraction_count'], scores['short_contraction_count']) == (2, 1)
+    assert (scores['good_long_contraction_count'], scores['good_short_contraction_count']) == (1, 1)
+
+    no_thresholds = emg_analysis.score_contractions(table, None, None)
+    assert no_thresholds == {'is_good': None, 'is_long': None}
+
+
+class TestParameterSweep:
+
+    def test_every_grid_point_matches_analyze_contractions(self):
+        rng = np.random.default_rng(11)
+        t = np.arange(20000) / 1000
+        signal = rng.standard_normal(t.size) * (0.1 + (np.sin(2 * np.pi * 0.4 * t) > 0.2))
+        factors, durations, windows = [0.2, 0.35, 0.5], [0, 50, 300], [10, 25, 60]
+
+        grid = emg_analysis.sweep_contraction_parameters(
+            signal, 1000, factors, durations, windows, mvc_amplitude_threshold=2.0)
+
+        assert len(grid) == 27
+        for point in grid:
+            expected = emg_analysis.analyze_contractions(
+                signal, 1000, point['threshold_factor'], point['min_duration_ms'],
+                point['smoothing_window'], mvc_amplitude_threshold=2.0)
+            for name, value in point['stats'].items():
+                assert value == pytest.approx(expected[name]), (point['smoothing_window'], name)
+
+    def test_large_threshold_grids_stay_within_a_memory_budget(self):
+        rng = np.random.default_rng(3)
+        t = np.arange(200000) / 1000
+        signal = rng.standard_normal(t.size) * (0.1 + (np.sin(2 * np.pi * 0.4 * t) > 0.2))
+        factors = np.linspace(0.05, 0.95, 2000).tolist()
+        context = emg_analysis.SignalContext(signal, 1000)
+        context.envelope(25)
+
+        tracemalloc.start()
+        try:
+            grid = emg_analysis.sweep_contraction_parameters(signal, 1000, factors, [50], [25], context=context)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        # A single (thresholds x samples) matrix would take 400 MB
+        assert peak < 32 * 1024 * 1024
+        assert len(grid) == 2000
+        expected = emg_analysis.analyze_contractions(signal, 1000, factors[700], 50, 25)
+        assert grid[700]['stats']['contraction_count'] == expected['contraction_count']
+
+    def test_flat_signal_has_no_contractions(self):
+        grid = emg_analysis.sweep_contraction_parameters(np.zeros(1000), 1000, [0.3], [50], [25])
+        assert grid == [{
+            'smoothing_window': 25, 'threshold_factor': 0.3, 'min_duration_ms': 50,
+            'stats': {name: (None if name == 'good_contraction_count' else 0)
+                      for name in emg_analysis.SWEEP_STAT_FIELDS},
+        }]
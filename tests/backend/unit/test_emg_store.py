@@ -0,0 +1,78 @@
+import json
+import pytest
+import numpy as np
+
+from backend.emg_store import RawEMGStore, ALIGNMENT, save_contraction_tables, load_contraction_tables
+
+
+@pytest.fixture
+def emg_data():
+    """Two channels with different dtypes, as extracted by the processor."""
+    rng = np.random.default_rng(0)
+    return {
+        'CH1 Raw': {'data': rng.standard_normal(5000), 'sampling_rate': 1000.0},
+        'CH1 activated': {'data': rng.random(5000).astype(np.float32), 'sampling_rate': 1000.0},
+        'CH2 Raw': {'data': [0.1, 0.2, 0.3], 'sampling_rate': 2000.0},
+    }
+
+
+class TestRawEMGStore:
+
+    def test_roundtrip_is_memory_mapped(self, tmp_path, emg_data):
+        """Channels are read back bit-exact through np.memmap views."""
+        store = RawEMGStore.write(tmp_path / "abc_result_raw_emg.bin", emg_data)
+
+        assert store.channels == list(emg_data.keys())
+        for name, channel in emg_data.items():
+            signal = store.get_signal(name)
+            assert isinstance(signal, np.memmap)
+            np.testing.assert_array_equal(signal, np.asarray(channel['data']))
+            assert store.sampling_rate(name) == channel['sampling_rate']
+
+        assert store.get_signal('CH1 activated').dtype == np.float32
+        assert store.get_signal('CH2 Raw').dtype == np.float64
+
+    def test_channels_are_aligned(self, tmp_path, emg_data):
+        store = RawEMGStore.write(tmp_path / "abc_result_raw_emg.bin", emg_data)
+        for name in store.channels:
+            assert store.get_signal(name).offset % ALIGNMENT == 0
+
+    def test_time_axis_is_derived(self, tmp_path, emg_data):
+        store = RawEMGStore.write(tmp_path / "abc_result_raw_emg.bin", emg_data)
+        channel = store.get_channel('CH2 Raw')
+        np.testing.assert_allclose(channel['time_axis'], [0.0, 0.0005, 0.001])
+
+    def test_open_prefers_binary_and_falls_back_to_legacy_json(self, tmp_path, emg_data):
+        legacy = {
+            'CH1 Raw': {'data': [1.0, -2.0], 'time_axis': [0.0, 0.001], 'sampling_rate': 1000.0}
+        }
+        (tmp_path / "old_result_raw_emg.json").write_text(json.dumps(legacy))
+
+        store = RawEMGStore.open(tmp_path, "old")
+        assert store.channels == ['CH1 Raw']
+        np.testing.assert_array_equal(store.get_signal('CH1 Raw'), [1.0, -2.0])
+
+        RawEMGStore.write(tmp_path / "old_result_raw_emg.bin", emg_data)
+        assert RawEMGStore.open(tmp_path, "old").path.suffix == '.bin'
+
+        assert RawEMGStore.open(tmp_path, "missing") is None
+
+    def test_rejects_foreign_files(self, tmp_path):
+        path = tmp_path / "bad_result_raw_emg.bin"
+        path.write_bytes(b"not a store at all")
+        with pytest.raises(ValueError):
+            RawEMGStore(path).channels
+
+
+def test_contraction_tables_roundtrip(tmp_path):
+    tables = {
+        'CH1': {'duration_ms': np.array([100.0, 400.0]), 'max_amplitude': np.array([0.5, 1.5])},
+        'CH.2': {'duration_ms': np.empty(0), 'max_amplitude': np.empty(0)},
+    }
+    path = tmp_path / "abc_result_contractions.npz"
+    save_contraction_tables(path, tables)
+
+    loaded = load_contraction_tables(path)
+    assert set(loaded) == {'CH1', 'CH.2'}
+    np.testing.assert_array_equal(loaded['CH1']['max_amplitude'], [0.5, 1.5])
+    assert loaded['CH.2']['duration_ms'].size == 0
@@ -0,0 +1,246 @@
+import pytest
+import numpy as np
+from unittest.mock import patch
+
+from backend.processor import GHOSTLYC3DProcessor, SignalContextCache, ParsedC3D, ParsedC3DCache
+from backend.channel_executor import shutdown_process_pool
+from backend.models import ProcessingOptions, GameSessionParameters
+from backend.emg_analysis import SignalContext
+
+
+@pytest.fixture
+def mock_c3d_data():
+    """A mock C3D structure with two Raw/activated channel pairs."""
+    rng = np.random.default_rng(42)
+    n_samples = 4000
+    analogs = np.zeros((1, 4, n_samples))
+
+    # CH1: two bursts, CH2: one long burst
+    for ch, bursts in ((0, [(500, 900), (2000, 2600)]), (2, [(1000, 3000)])):
+        analogs[0, ch, :] = rng.standard_normal(n_samples) * 0.05
+        for start, end in bursts:
+            analogs[0, ch, start:end] = rng.standard_normal(end - start)
+            analogs[0, ch + 1, start:end] = np.abs(analogs[0, ch, start:end])
+
+    return {
+        'parameters': {
+            'INFO': {'GAME_NAME': {'value': ['Test Game']}, 'GAME_LEVEL': {'value': ['2']}},
+            'ANALOG': {
+                'LABELS': {'value': ['CH1 Raw', 'CH1 activated', 'CH2 Raw', 'CH2 activated']},
+                'RATE': {'value': [1000.0]},
+            },
+        },
+        'data': {'analogs': analogs},
+    }
+
+
+@pytest.fixture
+def processor(mock_c3d_data):
+    with patch('backend.processor.ezc3d.c3d', return_value=mock_c3d_data):
+        processor = GHOSTLYC3DProcessor("test_file.c3d")
+        processor.load_file()
+        yield processor
+
+
+def process(processor, **session_kwargs):
+    return processor.process_file(
+        processing_opts=ProcessingOptions(threshold_factor=0.3, min_duration_ms=50, smoothing_window=25),
+        session_game_params=GameSessionParameters(**session_kwargs),
+    )
+
+
+def process_analytics(processor, **session_kwargs):
+    return processor.calculate_analytics(0.3, 50, 25, GameSessionParameters(**session_kwargs))
+
+
+class TestSignalExtraction:
+
+    def test_channels_are_views_into_the_analog_block(self, processor, mock_c3d_data):
+        emg_data = processor.extract_emg_data()
+        analogs = mock_c3d_data['data']['analogs']
+
+        assert list(emg_data) == ['CH1 Raw', 'CH1 activated', 'CH2 Raw', 'CH2 activated']
+        for i, channel in enumerate(emg_data.values()):
+            assert isinstance(channel['data'], np.ndarray)
+            assert np.shares_memory(channel['data'], analogs)
+            assert not channel['data'].flags.writeable
+            assert channel['sampling_rate'] == 1000.0
+            np.testing.assert_array_equal(channel['data'], analogs[0, i, :])
+
+    def test_time_axis_is_derived_on_demand(self, processor):
+        processor.extract_emg_data()
+        assert 'time_axis' not in processor.emg_data['CH1 Raw']
+
+        time_axis = processor.get_time_axis('CH1 Raw')
+        assert len(time_axis) == 4000
+        assert time_axis[1] == pytest.approx(0.001)
+
+
+class TestProcessFile:
+
+    def test_detects_contractions_per_channel(self, processor):
+        result = process(processor)
+
+        assert result['available_channels'] == ['CH1 Raw', 'CH1 activated', 'CH2 Raw', 'CH2 activated']
+        assert result['analytics']['CH1']['contraction_count'] == 2
+        assert result['analytics']['CH2']['contraction_count'] == 1
+        assert result['analytics']['CH1']['mpf'] is not None
+
+
+class TestRecalculateScores:
+
+    def test_rescoring_uses_contraction_table_and_classifies_duration(self, processor):
+        result = process(processor)
+        tables = processor.contraction_tables
+        assert set(tables) == {'CH1', 'CH2'}
+
+        session = GameSessionParameters(
+            session_mvc_values={'CH1': 1.0, 'CH2': 1.0},
+            session_mvc_threshold_percentages={'CH1': 100.0, 'CH2': 100.0},
+            contraction_duration_threshold=1000,
+            session_expected_long_left=3,
+            session_expected_short_right=4,
+        )
+        updated = GHOSTLYC3DProcessor(None).recalculate_scores(result, session, contraction_tables=tables)
+
+        ch1, ch2 = updated['analytics']['CH1'], updated['analytics']['CH2']
+        assert ch1['long_contraction_count'] == 0 and ch1['short_contraction_count'] == 2
+        assert ch2['long_contraction_count'] == 1 and ch2['short_contraction_count'] == 0
+        assert ch1['expected_long_contractions'] == 3
+        assert ch2['expected_short_contractions'] == 4
+        assert ch1['good_contraction_count'] == int(np.sum(tables['CH1']['max_amplitude'] >= 1.0))
+        assert [c['is_long'] for c in ch2['contractions']] == [True]
+
+    def test_rescoring_without_tables_matches(self, processor):
+        result = process(processor)
+        session = GameSessionParameters(session_mvc_value=1.5, contraction_duration_threshold=300)
+
+        with_tables = GHOSTLYC3DProcessor(None).recalculate_scores(
+            result, session.model_copy(deep=True), contraction_tables=processor.contraction_tables)
+        without_tables = GHOSTLYC3DProcessor(None).recalculate_scores(result, session.model_copy(deep=True))
+
+        assert with_tables['analytics'] == without_tables['analytics']
+
+    def test_channel_muscle_mapping_decides_side(self):
+        session = GameSessionParameters(channel_muscle_mapping={'CH1': 'Right Quadriceps'})
+        assert GHOSTLYC3DProcessor._channel_side('CH1', 0, session) == 'right'
+        assert GHOSTLYC3DProcessor._channel_side('CH2', 1, session) == 'right'
+        assert GHOSTLYC3DProcessor._channel_side('CH3', 2, session) is None
+
+
+def test_sweep_uses_the_contraction_channel_of_each_base_name(processor):
+    processor.extract_emg_data()
+    sweeps = processor.sweep_detection_parameters([0.3], [50, 1500], [25], mvc_thresholds={'CH1': 0.1},
+                                                  channels=['CH1'])
+
+    assert list(sweeps) == ['CH1']
+    assert sweeps['CH1']['source_channel'] == 'CH1 activated'
+    counts = [point['stats']['contraction_count'] for point in sweeps['CH1']['grid']]
+    assert counts == [2, 0]
+    assert sweeps['CH1']['grid'][0]['stats']['good_contraction_count'] == 2
+
+
+def test_shared_signal_contexts_outlive_the_processor(processor):
+    cache = SignalContextCache(max_results=2)
+    processor.signal_contexts = cache.get('r1')
+    process(processor)
+    envelope = processor.get_envelope('CH1 activated', 25)
+
+    later = GHOSTLYC3DProcessor(None, signal_contexts=cache.get('r1'))
+    later.emg_data = processor.emg_data
+    assert later.get_envelope('CH1 activated', 25) is envelope
+
+    cache.get('r2')
+    cache.get('r3')
+    assert 'r1' not in cache and 'r3' in cache
+
+
+def test_plot_overlays_reuse_the_detection_envelope(processor, tmp_path):
+    cache = SignalContextCache()
+    processor.signal_contexts = cache.get('r1')
+    process(processor)
+    plotted = {}
+
+    def plot(**kwargs):
+        plotted.update(kwargs)
+
+    # A later plot request of the same result, on a new processor sharing its contexts
+    later = GHOSTLYC3DProcessor(None, signal_contexts=cache.get('r1'))
+    later.emg_data = processor.emg_data
+    with patch('backend.processor.plot_emg_with_contractions', plot, create=True), \
+            patch('backend.emg_analysis.moving_average_envelope', side_effect=AssertionError("envelope recomputed")):
+        later.plot_emg_with_contractions('CH1 Raw', str(tmp_path / 'CH1.png'))
+
+    assert plotted['envelope'] is processor.get_envelope('CH1 activated', 25)
+
+
+def test_signal_context_cache_evicts_by_memoized_bytes():
+    signal = np.ones(1000)
+    cache = SignalContextCache(max_results=8, max_bytes=3 * signal.nbytes)
+    for result_id in ('r1', 'r2'):
+        cache.get(result_id)['CH1'] = SignalContext(signal, 1000)
+        cache.get(result_id)['CH1'].envelope(25)  # plus the rectified signal: 2 arrays
+    assert 'r1' in cache  # looked up before r2 grew
+
+    cache.get('r2')
+    assert 'r1' not in cache and 'r2' in cache
+    assert cache.nbytes == 2 * signal.nbytes
+
+
+def test_parsed_c3d_cache_evicts_by_size(mock_c3d_data):
+    with patch('backend.processor.ezc3d.c3d', return_value=mock_c3d_data):
+        parsed = ParsedC3D.load("test_file.c3d")
+    assert parsed.nbytes == mock_c3d_data['data']['analogs'].nbytes
+    assert parsed.emg_data['CH1 Raw']['data'].base is not None  # a view, not a copy
+
+    cache = ParsedC3DCache(max_bytes=2 * parsed.nbytes)
+    for result_id in ('r1', 'r2', 'r3'):
+        cache.put(result_id, parsed)
+        cache.get('r1')  # keep r1 recently used
+    assert 'r1' in cache and 'r2' not in cache and 'r3' in cache
+    assert cache.stats()['bytes'] == 2 * parsed.nbytes and cache.evictions == 1
+
+    # Files larger than the whole budget are not kept
+    small = ParsedC3DCache(max_bytes=parsed.nbytes - 1)
+    small.put('r1', parsed)
+    assert small.get('r1') is None and small.stats()['bytes'] == 0
+
+    processor = GHOSTLYC3DProcessor(parsed.file_path)
+    processor.use_parsed(parsed)
+    assert processor.get_base_names() == ['CH1', 'CH2']
+
+
+class TestProcessExecutor:
+
+    @pytest.fixture(autouse=True)
+    def stop_pool(self):
+        yield
+        shutdown_process_pool()
+
+    def test_process_mode_matches_serial(self, processor):
+        serial = process(processor)
+
+        parallel_processor = GHOSTLYC3DProcessor(None, executor='process', max_workers=2)
+        parallel_processor.emg_data = processor.emg_data
+        parallel = process_analytics(parallel_processor)
+
+        assert parallel == serial['analytics']
+        # The worker's detection envelope seeds the local context cache
+        np.testing.assert_allclose(parallel_processor.signal_contexts['CH1 activated'].envelope(25),
+                                   processor.get_envelope('CH1 activated', 25))
+
+    def test_unpicklable_metrics_fall_back_to_serial(self, processor, capsys):
+        processor.extract_emg_data()
+        parallel_processor = GHOSTLYC3DProcessor(
+            None, analysis_functions={'peak': lambda signal, sampling_rate: {'peak': float(np.max(signal))}},
+            executor='process')
+        parallel_processor.emg_data = processor.emg_data
+
+        analytics = process_analytics(parallel_processor)
+
+        assert analytics['CH1']['peak'] == float(np.max(processor.emg_data['CH1 Raw']['data']))
+        assert "analyzing channels serially" in capsys.readouterr().out
+
+    def test_rejects_unknown_executor(self):
+        with pytest.raises(ValueError):
+            GHOSTLYC3DProcessor(None, executor='threads')
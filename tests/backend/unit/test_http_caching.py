@@ -0,0 +1,101 @@
+import gzip
+
+import anyio
+import pytest
+from starlette.requests import Request
+
+from backend.http_caching import CompressionMiddleware, make_etag, matches, negotiate_coding
+
+
+def request_with(if_none_match=None):
+    headers = [(b'if-none-match', if_none_match.encode())] if if_none_match else []
+    return Request({'type': 'http', 'headers': headers})
+
+
+def test_etags_follow_the_version_and_the_selectors():
+    version = 'a' * 64
+    assert make_etag(version) == f'"{"a" * 32}"'
+    assert make_etag(version, 'plot', 'CH1') == make_etag(version, 'plot', 'CH1')
+    assert make_etag(version, 'plot', 'CH1') != make_etag(version, 'plot', 'CH2')
+    assert make_etag(version, 'plot', 'CH1') != make_etag('b' * 64, 'plot', 'CH1')
+
+
+def test_if_none_match_accepts_lists_weak_and_encoded_tags():
+    etag = '"abc"'
+    assert matches(request_with('"abc"'), etag)
+    assert matches(request_with('"x", W/"abc"'), etag)
+    assert matches(request_with('"abc-gzip"'), etag)
+    assert matches(request_with('"abc-zstd"'), etag)
+    assert matches(request_with('*'), etag)
+    assert not matches(request_with('"abcd"'), etag)
+    assert not matches(request_with(), etag)
+
+
+def test_content_coding_negotiation(monkeypatch):
+    monkeypatch.setattr('backend.http_caching.CONTENT_CODINGS', ('zstd', 'gzip'))
+    assert negotiate_coding('gzip, deflate, br, zstd') == 'zstd'
+    assert negotiate_coding('zstd;q=0, gzip;q=0.5') == 'gzip'
+    assert negotiate_coding('br') is None and negotiate_coding('') is None
+
+
+def send_through(lines, content_type, accept_encoding, **options):
+    """
+    Send `lines` as the body messages of one response through a CompressionMiddleware.
+
+    Each line is only produced once the previous one has left the middleware, so a
+    middleware that buffers the stream never finishes.
+    """
+    messages = []
+
+    async def run():
+        sent = [anyio.Event() for _ in lines]
+
+        async def app(scope, receive, send):
+            await send({'type': 'http.response.start', 'status': 200,
+                        'headers': [(b'content-type', content_type.encode())]})
+            for i, line in enumerate(lines):
+                if i:
+                    await sent[i - 1].wait()
+                await send({'type': 'http.response.body', 'body': line, 'more_body': i < len(lines) - 1})
+
+        async def send(message):
+            messages.append(message)
+            if message['type'] == 'http.response.body':
+                for event in sent:
+                    if not event.is_set():
+                        event.set()
+                        break
+
+        scope = {'type': 'http', 'headers': [(b'accept-encoding', accept_encoding.encode())]}
+        with anyio.fail_after(5):
+            await CompressionMiddleware(app, **options)(scope, None, send)
+
+    anyio.run(run)
+    return dict(messages[0]['headers']), [message['body'] for message in messages[1:]]
+
+
+def test_ndjson_streams_are_sent_line_by_line():
+    lines = [b'{"n": %d}\n' % i for i in range(3)]
+    headers, bodies = send_through(lines, 'application/x-ndjson', 'gzip',
+                                   excluded_content_types=('application/x-ndjson',))
+    assert bodies == lines and b'content-encoding' not in headers
+
+
+def test_streamed_and_small_bodies_are_gzipped_when_worth_it():
+    lines = [b'x' * 2000, b'y' * 2000]
+    headers, bodies = send_through(lines, 'application/json', 'gzip')
+    assert headers[b'content-encoding'] == b'gzip' and b'content-length' not in headers
+    assert len(bodies) == 2 and gzip.decompress(b''.join(bodies)) == b''.join(lines)
+
+    headers, bodies = send_through([b'{}'], 'application/json', 'gzip')
+    assert bodies == [b'{}'] and b'content-encoding' not in headers
+
+
+def test_zstd_is_preferred_when_available(monkeypatch):
+    zstandard = pytest.importorskip("zstandard")
+    monkeypatch.setattr('backend.http_caching.CONTENT_CODINGS', ('zstd', 'gzip'))
+    body = b'[%s]' % b','.join(b'1.0' for _ in range(1000))
+    headers, bodies = send_through([body], 'application/json', 'gzip, zstd')
+
+    assert headers[b'content-encoding'] == b'zstd' and int(headers[b'content-length']) == len(bodies[0])
+    assert zstandard.ZstdDecompressor().decompressobj().decompress(bodies[0]) == body
@@ -0,0 +1,62 @@
+import time
+
+import pytest
+
+from backend.job_queue import JobQueue, JobQueueFull, SUCCEEDED, FAILED, QUEUED
+
+
+def wait(queue, job, timeout=10):
+    deadline = time.time() + timeout
+    while queue.get(job.job_id).finished_at is None:
+        assert time.time() < deadline, "job did not finish"
+        time.sleep(0.01)
+    return queue.get(job.job_id)
+
+
+def test_jobs_run_with_timings_and_record_failures():
+    queue = JobQueue(max_workers=1, max_queued=2)
+
+    def work(x, timings):
+        timings['compute'] = 0.5
+        return x * 2
+
+    def fail(timings):
+        raise ValueError("bad file")
+
+    ok, bad = queue.create(), queue.create()
+    assert ok.state == QUEUED
+    queue.run(ok, work, 21)
+    queue.run(bad, fail)
+
+    ok, bad = wait(queue, ok), wait(queue, bad)
+    assert (ok.state, ok.result) == (SUCCEEDED, 42)
+    assert set(ok.timings) == {'queued', 'compute'}
+    assert (bad.state, bad.error) == (FAILED, "bad file")
+    assert ok.to_dict()['started_at'] is not None
+    queue.shutdown()
+
+
+def test_capacity_counts_queued_and_running_jobs():
+    queue = JobQueue(max_workers=1, max_queued=1)
+    first, second = queue.create(), queue.create()
+    with pytest.raises(JobQueueFull) as excinfo:
+        queue.create()
+    assert excinfo.value.retry_after >= 1
+
+    queue.finish(first, result='cached')
+    assert queue.get(first.job_id).state == SUCCEEDED
+    third = queue.create()
+    queue.finish(second, error="bad upload")
+    queue.finish(third)
+    assert queue.get(second.job_id).state == FAILED
+    queue.shutdown()
+
+
+def test_oldest_finished_jobs_are_dropped_beyond_retention():
+    queue = JobQueue(max_workers=1, max_queued=10, max_retained=2)
+    jobs = [queue.create() for _ in range(3)]
+    for job in jobs:
+        queue.finish(job)
+    assert queue.get(jobs[0].job_id) is None
+    assert all(queue.get(job.job_id) is not None for job in jobs[1:])
+    queue.shutdown()
@@ -0,0 +1,202 @@
+import json
+import hashlib
+import pytest
+
+from backend.results_index import (ResultsIndex, SORT_KEYS, row_from_result, project_result,
+                                   encode_cursor, decode_cursor)
+
+
+def make_result(result_id, patient_id='p1', timestamp='20250101_120000', score=None, analytics=None):
+    return {'file_id': result_id, 'timestamp': timestamp, 'source_filename': 'session.c3d',
+            'patient_id': patient_id, 'metadata': {'game_name': 'Test Game', 'level': '2', 'score': score},
+            'analytics': analytics or {}}
+
+
+def channel(count, good=None, rms=None, mpf=None):
+    return {'contraction_count': count, 'good_contraction_count': good, 'rms': rms, 'mpf': mpf}
+
+
+@pytest.fixture
+def index(tmp_path):
+    return ResultsIndex(tmp_path / "index.sqlite3")
+
+
+def test_put_and_query(index, tmp_path):
+    index.put(row_from_result(make_result('b', timestamp='20250102_000000'), tmp_path / 'b.json', tmp_path / 'b.c3d'))
+    index.put(row_from_result(make_result('a', score=12.5), tmp_path / 'a.json'))
+    index.put(row_from_result(make_result('c', patient_id=None), tmp_path / 'c.json'))
+
+    assert index.get('a')['score'] == 12.5 and index.get('a')['game_name'] == 'Test Game'
+    assert [row['result_id'] for row in index.patient_results('p1')] == ['a', 'b']
+    assert index.patients() == ['p1']
+    assert index.count() == 3
+    assert index.get('missing') is None
+
+
+def test_update_keeps_the_upload_path(index, tmp_path):
+    index.put(row_from_result(make_result('a'), tmp_path / 'a.json', tmp_path / 'a.c3d', 'f' * 64))
+    index.put(row_from_result(make_result('b'), tmp_path / 'b.json', tmp_path / 'a.c3d', 'f' * 64))
+    index.put(row_from_result(make_result('a', patient_id='p2'), tmp_path / 'a.json'))
+
+    row = index.get('a')
+    assert row['patient_id'] == 'p2' and row['upload_path'] == str(tmp_path / 'a.c3d')
+    assert index.content_references('f' * 64) == 2
+    index.delete('b')
+    assert index.content_references('f' * 64) == 1
+
+
+def test_failed_transaction_leaves_no_row(index, tmp_path):
+    with pytest.raises(OSError):
+        with index.transaction():
+            index.put(row_from_result(make_result('a'), tmp_path / 'a.json'))
+            raise OSError("disk full")
+    assert index.get('a') is None
+
+    index.put(row_from_result(make_result('a'), tmp_path / 'a.json'))
+    assert index.delete('a') and not index.delete('a')
+
+
+def test_rebuild_indexes_existing_result_files(index, tmp_path):
+    results_dir, upload_dir = tmp_path / 'results', tmp_path / 'uploads'
+    results_dir.mkdir()
+    upload_dir.mkdir()
+    (results_dir / 'r1_result.json').write_text(json.dumps(make_result('r1')))
+    (results_dir / 'broken_result.json').write_text('{')
+    (upload_dir / '20250101_120000_r1_session.c3d').write_bytes(b'')
+    # Uploads of the content-addressed store are found by the hash recorded in the result
+    (results_dir / 'r2_result.json').write_text(json.dumps(dict(make_result('r2'), content_sha256='f' * 64)))
+
+    assert index.rebuild(results_dir, upload_dir, lambda sha256: upload_dir / 'store' / f'{sha256}.c3d') == 2
+    assert index.get('r1')['upload_path'].endswith('20250101_120000_r1_session.c3d')
+    assert index.get('r1')['result_sha256'] == hashlib.sha256((results_dir / 'r1_result.json').read_bytes()).hexdigest()
+    assert index.get('r2')['upload_path'] == str((upload_dir / 'store' / f'{"f" * 64}.c3d').resolve())
+    assert index.content_references('f' * 64) == 1
+
+
+def test_query_pages_by_cursor_in_sort_order(index, tmp_path):
+    for i, score in enumerate([3.0, None, 1.0, 3.0, 2.0]):
+        index.put(row_from_result(make_result(f'r{i}', timestamp=f'2025010{i + 1}_000000', score=score),
+                                  tmp_path / f'r{i}.json'))
+
+    pages, after = [], None
+    while True:
+        rows = index.query({}, sort='score', descending=True, limit=2, after=after)
+        pages.append([row['result_id'] for row in rows])
+        if len(rows) < 2:
+            break
+        after = decode_cursor(encode_cursor('score', True, rows[-1]), 'score', True)
+
+    # Ties keep insertion order reversed; a missing score sorts last when descending
+    assert sum(pages, []) == ['r3', 'r0', 'r4', 'r2', 'r1']
+    assert [row['result_id'] for row in index.query({'score_min': 2.0, 'timestamp_to': '20250104_000000'})] == ['r0', 'r3']
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor('score', True, rows[-1]), 'timestamp', True)
+    with pytest.raises(ValueError):
+        index.query({}, sort='result_path')
+
+
+def test_levels_are_paged_in_numeric_order(index, tmp_path):
+    for result_id, level in (('a', '10'), ('b', '2'), ('c', None), ('d', '1'), ('e', '2')):
+        result = make_result(result_id)
+        result['metadata']['level'] = level
+        index.put(row_from_result(result, tmp_path / f'{result_id}.json'))
+
+    pages, after = [], None
+    while True:
+        rows = index.query({}, sort='level', limit=2, after=after)
+        pages.append([row['result_id'] for row in rows])
+        if len(rows) < 2:
+            break
+        after = decode_cursor(encode_cursor('level', False, rows[-1]), 'level', False)
+
+    assert pages == [['c', 'd'], ['b', 'e'], ['a']]
+
+
+def test_sort_indexes_on_outdated_expressions_are_recreated(tmp_path):
+    ResultsIndex(tmp_path / "index.sqlite3")._connection().executescript(
+        "DROP INDEX results_sorted_by_level; CREATE INDEX results_sorted_by_level ON results (IFNULL(level, ''))")
+
+    sql = ResultsIndex(tmp_path / "index.sqlite3")._connection().execute(
+        "SELECT sql FROM sqlite_master WHERE name = 'results_sorted_by_level'").fetchone()[0]
+    assert 'CAST(level AS INTEGER)' in sql
+
+
+def test_date_filters_use_the_session_date(index, tmp_path):
+    # Both processed today; only 'old' was played in 2024
+    for result_id, played in (('old', '2024-11-04 10:00:00'), ('new', '2025-01-05 10:00:00')):
+        result = make_result(result_id, timestamp='20250106_090000')
+        result['metadata']['time'] = played
+        index.put(row_from_result(result, tmp_path / f'{result_id}.json'))
+
+    assert [row['result_id'] for row in index.query({'timestamp_to': '20241231_235959'})] == ['old']
+    assert [row['result_id'] for row in index.query({'timestamp_from': '20250101_000000'})] == ['new']
+
+
+@pytest.mark.parametrize('sort', list(SORT_KEYS))
+@pytest.mark.parametrize('filters', [{}, {'patient_id': 'p1'}])
+@pytest.mark.parametrize('after', [None, ('x', 1)])
+def test_sorted_pages_are_read_in_index_order(index, sort, filters, after):
+    conn = index._connection()
+    statements = []
+    conn.set_trace_callback(statements.append)
+    index.query(filters, sort=sort, descending=True, after=after)
+    conn.set_trace_callback(None)
+
+    plan = ' | '.join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {statements[-1]}"))
+    assert 'TEMP B-TREE' not in plan, plan
+
+
+def test_project_result_drops_wildcard_paths():
+    result = {'file_id': 'a', 'analytics': {'CH1': {'rms': 1.0, 'contractions': [1]}, 'CH2': {'contractions': []}}}
+
+    projected = project_result(result, exclude=['analytics.*.contractions', 'missing.path'])
+
+    assert projected == {'file_id': 'a', 'analytics': {'CH1': {'rms': 1.0}, 'CH2': {}}}
+    assert result['analytics']['CH1']['contractions'] == [1]  # the input is not modified
+    assert project_result(result, fields=['file_id', 'unknown']) == {'file_id': 'a'}
+
+
+class TestTrends:
+
+    def put(self, index, tmp_path, result_id, timestamp, **analytics):
+        index.put(row_from_result(make_result(result_id, timestamp=timestamp, analytics=analytics),
+                                  tmp_path / f'{result_id}.json'))
+
+    def test_rollups_follow_uploads_recalculations_and_deletes(self, index, tmp_path):
+        # 2025-01-06 is a Monday; the first two sessions share a day, the third is in the same week
+        self.put(index, tmp_path, 'a', '20250106_090000', CH1=channel(10, good=5, rms=1.0, mpf=80.0))
+        self.put(index, tmp_path, 'b', '20250106_170000', CH1=channel(6, rms=3.0), CH2=channel(4, good=4))
+        self.put(index, tmp_path, 'c', '20250109_100000', CH1=channel(4, good=1, rms=2.0))
+        self.put(index, tmp_path, 'd', '20250113_100000', CH1=channel(2, good=2))
+
+        weeks = index.trends('p1')['CH1']
+        assert [(week['period_start'], week['sessions']) for week in weeks] == [('2025-01-06', 3), ('2025-01-13', 1)]
+        assert weeks[0]['contraction_count'] == 20 and weeks[0]['good_contraction_count'] == 6
+        assert weeks[0]['good_contraction_ratio'] == pytest.approx(6 / 14)  # session b was not scored
+        assert weeks[0]['avg_rms'] == pytest.approx(2.0) and weeks[0]['avg_mpf'] == pytest.approx(80.0)
+        assert weeks[1]['avg_rms'] is None
+
+        days = index.trends('p1', period='day', channel='CH1', start='2025-01-07', end='2025-01-12')
+        assert [day['period_start'] for day in days['CH1']] == ['2025-01-09']
+
+        # Recalculation replaces the session's contribution; delete removes it
+        self.put(index, tmp_path, 'a', '20250106_090000', CH1=channel(10, good=9, rms=1.0, mpf=80.0))
+        index.delete('b')
+        week = index.trends('p1')['CH1'][0]
+        assert (week['sessions'], week['contraction_count'], week['good_contraction_count']) == (2, 14, 10)
+        assert week['avg_rms'] == pytest.approx(1.5)
+        assert 'CH2' not in index.trends('p1')
+        with pytest.raises(ValueError):
+            index.trends('p1', period='month')
+
+    def test_sessions_are_bucketed_by_the_day_they_were_played(self, index, tmp_path):
+        # Months of history imported on one day
+        for result_id, played in (('a', '2024-11-04 10:00:00'), ('b', '2024-12-02 10:00:00'), ('c', None)):
+            result = make_result(result_id, timestamp='20250106_090000', analytics={'CH1': channel(3)})
+            result['metadata']['time'] = played
+            index.put(row_from_result(result, tmp_path / f'{result_id}.json'))
+
+        weeks = index.trends('p1')['CH1']
+        assert [week['period_start'] for week in weeks] == ['2024-11-04', '2024-12-02', '2025-01-06']
+        assert index.get('a')['session_timestamp'] == '20241104_100000'
+        assert index.get('c')['session_timestamp'] == '20250106_090000'  # no session time: processing time
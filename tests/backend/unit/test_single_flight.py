@@ -0,0 +1,57 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from backend.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_computation():
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def compute(value):
+        calls.append(value)
+        started.set()
+        release.wait(10)
+        return value * 2
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        leader = pool.submit(flights.do, 'k', compute, 21)
+        started.wait(10)
+        followers = [pool.submit(flights.do, 'k', compute, 21) for _ in range(2)]
+        while flights.coalesced < 2:
+            time.sleep(0.01)
+        release.set()
+
+    assert leader.result() == (42, False)
+    assert [f.result() for f in followers] == [(42, True), (42, True)]
+    assert calls == [21]
+    assert flights.in_flight() == 0
+    # Finished keys are forgotten: the next call computes again
+    assert flights.do('k', compute, 1) == (2, False)
+
+
+def test_errors_reach_every_waiter_and_keys_are_independent():
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def fail():
+        started.set()
+        release.wait(10)
+        raise ValueError("bad file")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(flights.do, 'k', fail)
+        started.wait(10)
+        follower = pool.submit(flights.do, 'k', fail)
+        assert flights.do('other', lambda: 'independent') == ('independent', False)
+        while flights.coalesced < 1:
+            time.sleep(0.01)
+        release.set()
+
+    for future in (leader, follower):
+        with pytest.raises(ValueError, match="bad file"):
+            future.result()
@@ -0,0 +1,37 @@
+import hashlib
+
+from backend.upload_store import UploadStore
+
+
+def spool(store, content):
+    tmp_path = store.temporary_path()
+    tmp_path.write_bytes(content)
+    return tmp_path, hashlib.sha256(content).hexdigest()
+
+
+def test_identical_content_is_stored_once(tmp_path):
+    store = UploadStore(tmp_path)
+    first = store.commit(*spool(store, b'c3d bytes'))
+    second = store.commit(*spool(store, b'c3d bytes'))
+
+    assert first == second and first.read_bytes() == b'c3d bytes'
+    assert first.parent.name == first.stem[:2]
+    assert list(store.tmp_dir.iterdir()) == []
+
+
+def test_files_are_removed_only_without_references(tmp_path):
+    store = UploadStore(tmp_path)
+    tmp, content_sha256 = spool(store, b'c3d bytes')
+    path = store.commit(tmp, content_sha256)
+    references = {content_sha256: 0}
+
+    # Still being processed: the pending reference protects the file
+    assert not store.remove_if_unreferenced(content_sha256, references.get)
+    references[content_sha256] = 1
+    store.release(content_sha256)
+    assert not store.remove_if_unreferenced(content_sha256, references.get)
+
+    references[content_sha256] = 0
+    assert store.remove_if_unreferenced(content_sha256, references.get)
+    assert not path.exists()
+    assert not store.remove_if_unreferenced(content_sha256, references.get)
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from backend.emg_store import RawEMGStore
+from backend.waveform_pyramid import (
+    WaveformPyramid, build_levels, decimate_window, write_waveform_pyramid, BASE_BUCKET, MIN_TOP_BUCKETS
+)
+
+
+@pytest.fixture
+def signal():
+    rng = np.random.default_rng(0)
+    signal = rng.standard_normal(200_000)
+    signal[123_457] = 25.0  # a single-sample spike must survive any decimation
+    return signal
+
+
+@pytest.fixture
+def pyramid(tmp_path, signal):
+    write_waveform_pyramid(tmp_path / "r_result_waveform.bin", {'CH1 Raw': {'data': signal, 'sampling_rate': 1000.0}})
+    return WaveformPyramid(RawEMGStore(tmp_path / "r_result_waveform.bin"))
+
+
+def test_levels_hold_bucket_extrema_and_their_positions(signal):
+    levels = build_levels(signal)
+    assert min(levels) == BASE_BUCKET and levels[max(levels)][0].size <= MIN_TOP_BUCKETS
+    for bucket, (lo, hi, lo_at, hi_at) in levels.items():
+        starts = np.arange(lo.size) * bucket
+        np.testing.assert_array_equal(signal[starts + lo_at.astype(int)], lo)
+        np.testing.assert_array_equal(signal[starts + hi_at.astype(int)], hi)
+        full = signal.size // bucket
+        np.testing.assert_array_equal(hi[:full], signal[:full * bucket].reshape(full, bucket).max(axis=1))
+    assert build_levels(signal[:100]) == {}
+
+
+@pytest.mark.parametrize("start,stop,max_points", [(0, 200_000, 1000), (3, 150_001, 2000), (120_000, 130_003, 500)])
+def test_windows_fit_the_budget_and_keep_every_extreme(signal, pyramid, start, stop, max_points):
+    indices, values, bucket = decimate_window(signal, start, stop, max_points, pyramid, 'CH1 Raw')
+
+    assert bucket > 1 and len(values) <= max_points
+    assert indices.min() >= start and indices.max() < stop
+    assert np.all(np.diff(indices) >= 0)
+    np.testing.assert_array_equal(signal[indices], values)
+    assert values.max() == signal[start:stop].max() and values.min() == signal[start:stop].min()
+    # The same window without a pyramid is reduced from the signal, with the same guarantees
+    fallback_indices, fallback_values, _ = decimate_window(signal, start, stop, max_points)
+    assert len(fallback_values) <= max_points and fallback_values.max() == values.max()
+
+
+def test_short_windows_are_returned_sample_by_sample(signal, pyramid):
+    indices, values, bucket = decimate_window(signal, 1000, 1400, 1000, pyramid, 'CH1 Raw')
+    assert bucket == 1
+    np.testing.assert_array_equal(indices, np.arange(1000, 1400))
+    np.testing.assert_array_equal(values, signal[1000:1400])
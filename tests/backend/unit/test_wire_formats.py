@@ -0,0 +1,55 @@
+import io
+
+import numpy as np
+import pytest
+
+from backend.wire_formats import RangeNotSatisfiable, negotiate, npy_body, arrow_body, parse_range, _iter_range
+
+
+def test_negotiation_prefers_the_format_parameter():
+    assert negotiate("application/octet-stream") == 'npy'
+    assert negotiate("application/x-npy;q=0.9, */*;q=0.1") == 'npy'
+    assert negotiate("application/vnd.apache.arrow.stream") == 'arrow'
+    assert negotiate("application/json, */*") == 'json'
+    assert negotiate("application/octet-stream", requested='json') == 'json'
+
+
+def test_npy_body_is_a_loadable_view_of_the_array():
+    array = np.arange(1000, dtype='<f4')
+    parts = npy_body(array[100:200])
+    assert np.shares_memory(np.frombuffer(parts[1], dtype='<f4'), array)  # not copied
+    np.testing.assert_array_equal(np.load(io.BytesIO(b''.join(_iter_range(parts, 0, 10_000)))), array[100:200])
+
+
+@pytest.mark.parametrize("header,expected", [
+    (None, None), ("bytes=0-99", (0, 99)), ("bytes=900-", (900, 999)), ("bytes=-100", (900, 999)),
+    ("bytes=950-2000", (950, 999)), ("bytes=0-1,5-6", None), ("items=0-1", None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=10-5", "bytes=-0"])
+def test_unsatisfiable_ranges(header):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range(header, 1000)
+
+
+@pytest.mark.parametrize("header", ["bytes=0-", "bytes=0-99", "bytes=-100"])
+def test_no_range_of_an_empty_body_is_satisfiable(header):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range(header, 0)
+    assert parse_range(None, 0) is None
+
+
+def test_ranges_span_parts():
+    parts = [memoryview(b'abc'), memoryview(b'defgh')]
+    assert b''.join(_iter_range(parts, 2, 5)) == b'cdef'
+
+
+def test_arrow_body_is_an_ipc_stream():
+    pa = pytest.importorskip("pyarrow")
+    data = b''.join(_iter_range(arrow_body({'CH1 Raw': np.arange(5.0), 'CH1 activated': np.ones(5)}), 0, 10**9))
+    table = pa.ipc.open_stream(data).read_all()
+    assert table.column_names == ['CH1 Raw', 'CH1 activated']
+    assert table.column('CH1 Raw').to_pylist() == [0.0, 1.0, 2.0, 3.0, 4.0]